@@ -0,0 +1,17 @@
+"""原生异步只读接口，挂载在 /api/async/ 下，路径与响应同对应的同步接口"""
+from django.urls import path
+
+from accounts import async_views as accounts_views
+from SparePart import async_views as spare_part_views
+from sites import async_views as sites_views
+
+urlpatterns = [
+    path("auth/me/", accounts_views.me, name="async_user_me"),
+    path("spare-parts/", spare_part_views.spare_part_list, name="async_spare_part_list"),
+    path("spare-parts/<int:pk>/", spare_part_views.spare_part_detail, name="async_spare_part_detail"),
+    path("transactions/", spare_part_views.transaction_list, name="async_transaction_list"),
+    path("transactions/statistics/", spare_part_views.transaction_statistics, name="async_transaction_statistics"),
+    path("sites/", sites_views.site_list, name="async_site_list"),
+    # 库存变更事件流（SSE）
+    path("stock-events/", spare_part_views.stock_events, name="async_stock_events"),
+]
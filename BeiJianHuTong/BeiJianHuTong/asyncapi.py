@@ -0,0 +1,79 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Paginator
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from accounts.authentication import ClaimsJWTAuthentication
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def render_json(data, status=200):
+    """与 DRF Response 相同的 JSON 编码（中文不转义，日期/时间按 DRF 格式）"""
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def exception_response(exc):
+    """APIException -> 与 DRF 默认异常处理相同的响应体"""
+    data = exc.detail if isinstance(exc.detail, (dict, list)) else {"detail": exc.detail}
+    return render_json(data, status=exc.status_code)
+
+
+def async_api_view(authentication_class=ClaimsJWTAuthentication, query_token=False):
+    """原生异步只读接口
+
+    只接受 GET/HEAD；用 JWT 认证（aauthenticate，令牌带权限声明时不查库），
+    未认证返回 401；视图收到 DRF Request（query_params、user 与同步视图一致），
+    抛出的 APIException 按 DRF 默认格式返回。
+    query_token=True 时未带 Authorization 头可用 ?token= 传访问令牌（浏览器 EventSource 不能设置请求头）。
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if query_token and 'HTTP_AUTHORIZATION' not in request.META and request.GET.get('token'):
+                request.META['HTTP_AUTHORIZATION'] = f"Bearer {request.GET['token']}"
+            authenticator = authentication_class()
+            try:
+                if request.method not in SAFE_METHODS:
+                    raise exceptions.MethodNotAllowed(request.method)
+                result = await authenticator.aauthenticate(request)
+                if result is None:
+                    raise exceptions.NotAuthenticated()
+                drf_request = Request(request)
+                drf_request.user, drf_request.auth = result
+                return await view(drf_request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                response = exception_response(exc)
+                if response.status_code == 401:
+                    response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+                elif response.status_code == 405:
+                    response['Allow'] = ', '.join(SAFE_METHODS)
+                return response
+        return wrapper
+    return decorator
+
+
+async def apaginate(queryset, request, paginator):
+    """页码分页（参数与校验同 StandardPagination）：acount 统计总数，异步迭代取当前页
+
+    返回 (页码, 本页对象列表, 总数)；页码无效时抛出 NotFound。
+    """
+    page_size = paginator.get_page_size(request)
+    pages = Paginator(queryset, page_size)
+    pages.count = await queryset.acount()
+    try:
+        number = pages.validate_number(request.query_params.get(paginator.page_query_param, 1))
+    except InvalidPage:
+        raise exceptions.NotFound(paginator.invalid_page_message)
+    offset = (number - 1) * page_size
+    items = [obj async for obj in queryset[offset:offset + page_size]]
+    return number, items, pages.count
+
+
+async def delegate(view, request, *args, **kwargs):
+    """交给同步视图处理（异步接口未实现的参数组合，如游标分页）"""
+    return await sync_to_async(view)(request._request, *args, **kwargs)
@@ -0,0 +1,103 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+VERSION_PREFIX = 'version'
+
+# 进程内缓存：版本号的递增其他进程看不到，ETag 无法及时失效
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def get_version_timeout():
+    # 进程内缓存（locmem）无法跨进程失效，版本号定期过期重建以保证最终一致
+    return getattr(settings, 'RESOURCE_VERSION_TIMEOUT', 300)
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def get_version(name):
+    """资源版本号（毫秒时间戳，单调递增），缓存中没有时以当前时间初始化"""
+    key = f'{VERSION_PREFIX}:{name}'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, now_ms(), get_version_timeout())
+        version = cache.get(key) or now_ms()
+    return version
+
+
+async def aget_version(name):
+    """get_version 的异步版本（异步视图中使用异步缓存接口，不阻塞事件循环）"""
+    key = f'{VERSION_PREFIX}:{name}'
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, now_ms(), get_version_timeout())
+        version = await cache.aget(key) or now_ms()
+    return version
+
+
+def bump_version(name):
+    """资源变更后调用，使已发出的 ETag 全部失效"""
+    key = f'{VERSION_PREFIX}:{name}'
+    cache.set(key, max(now_ms(), (cache.get(key) or 0) + 1), get_version_timeout())
+
+
+def make_etag(*parts):
+    return '"%s"' % '-'.join(str(part) for part in parts)
+
+
+def conditional_get_enabled():
+    """条件 GET 依赖缓存中的版本号跨进程失效，默认缓存为进程内缓存时不启用"""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def check_conditions(request, etag, last_modified):
+    """返回 (校验头, 304 响应或 None)"""
+    validators = HttpResponse()
+    validators['ETag'] = etag
+    validators['Last-Modified'] = http_date(last_modified)
+    # 需鉴权的数据：浏览器可缓存但每次都要回源校验
+    validators['Cache-Control'] = 'private, no-cache'
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified, response=validators)
+    return validators, (None if not_modified is validators else not_modified)
+
+
+def add_validators(response, validators):
+    if response.status_code == 200:
+        for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+            response[header] = validators[header]
+    return response
+
+
+def conditional_get(request, etag, last_modified, render):
+    """条件 GET：校验 If-None-Match / If-Modified-Since
+
+    命中时直接返回 304，不调用 render（不查询、不序列化）；
+    否则调用 render() 生成响应并附上 ETag / Last-Modified。
+    last_modified 为秒级时间戳。默认缓存不是共享缓存时直接返回 render()，不带校验头。
+    """
+    if not conditional_get_enabled():
+        return render()
+    validators, not_modified = check_conditions(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    return add_validators(render(), validators)
+
+
+async def aconditional_get(request, etag, last_modified, render):
+    """conditional_get 的异步版本，render 为协程函数"""
+    if not conditional_get_enabled():
+        return await render()
+    validators, not_modified = check_conditions(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    return add_validators(await render(), validators)
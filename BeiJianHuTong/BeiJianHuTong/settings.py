@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,7 +48,7 @@ INSTALLED_APPS = [
 ]
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.ClaimsJWTAuthentication",
     ),
 }
 from datetime import timedelta
@@ -157,7 +158,7 @@ CORS_ALLOWED_ORIGINS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.ClaimsJWTAuthentication",
     ),
 }
 
@@ -166,6 +167,43 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
+# 缓存：默认进程内 locmem；多进程部署需设置 REDIS_URL 使用共享缓存，
+# （需安装 redis 包），否则各进程的失效（用户、列表代数）互不可见，只能等超时；
+# ETag 条件请求依赖版本号即时失效，仅在共享缓存下启用（见 BeiJianHuTong.conditional）
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+            "KEY_PREFIX": "bjht",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "bjht",
+        }
+    }
+# 认证用户缓存时间（秒），用户或场站保存时立即失效
+AUTH_USER_CACHE_TIMEOUT = 60
+# 分类/场站等资源版本号（ETag）在缓存中的保留时间（秒）
+RESOURCE_VERSION_TIMEOUT = 300
+# 备件列表响应缓存时间（秒），0 表示不缓存
+SPARE_PART_LIST_CACHE_TIMEOUT = 300
+# 备件输入联想前缀索引的缓存时间（秒）
+SPARE_PART_SUGGEST_CACHE_TIMEOUT = 600
+# 出入库流水保留月数，更早的由 archive_transactions 命令归档
+TRANSACTION_ARCHIVE_MONTHS = 24
+# 库存快照：daily 每晚记录 / monthly 只记录月末；每日快照保留天数（月末快照长期保留）
+STOCK_SNAPSHOT_INTERVAL = 'daily'
+STOCK_SNAPSHOT_DAILY_RETENTION_DAYS = 90
+# 库存变更事件流（/api/async/stock-events/）：空闲保活间隔（秒）、单个连接最长时长（秒，
+# 到期断开由客户端重连，回收已断开客户端的订阅）、每个订阅者的事件队列长度；
+# 默认进程内推送，多进程部署需以 STOCK_EVENT_BROKER 指定共享代理
+STOCK_EVENT_KEEPALIVE = 15
+STOCK_EVENT_MAX_AGE = 300
+STOCK_EVENT_QUEUE_SIZE = 1000
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_HEADERS = ('*')
@@ -19,6 +19,8 @@ from django.urls import path, include
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    # 原生异步只读接口（ASGI 部署时使用）
+    path("api/async/", include("BeiJianHuTong.async_urls")),
     # 认证相关接口
     path("api/auth/", include("accounts.urls")),
     # ✅ 备件相关接口
@@ -29,6 +31,8 @@ urlpatterns = [
 
 from django.conf import settings
 from django.conf.urls.static import static
+from SparePart.storage import serve_media
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # 内容寻址的备件图片带不可变缓存头
+    urlpatterns += static(settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT)
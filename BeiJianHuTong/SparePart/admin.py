@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Category, SparePart, SparePartTransaction
+from .models import (
+    Category, SparePart, SparePartTransaction, SparePartTransactionArchive, SparePartOpeningBalance,
+    StockMovementDaily, SparePartForecast, StockSnapshot, StockAdjustment,
+)
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -13,17 +16,17 @@ class CategoryAdmin(admin.ModelAdmin):
 @admin.register(SparePart)
 class SparePartAdmin(admin.ModelAdmin):
     """备件管理"""
-    list_display = ['id', 'name', 'model', 'category', 'quantity', 'alarm_qty', 'site', 'status', 'created_at']
+    list_display = ['id', 'name', 'model', 'category', 'quantity', 'alarm_qty', 'is_alarm', 'site', 'status', 'created_at']
     search_fields = ['name', 'model', 'supplier']
-    list_filter = ['status', 'category', 'site', 'created_at']
-    readonly_fields = ['created_at', 'updated_at', 'created_by', 'updated_by']
+    list_filter = ['status', 'is_alarm', 'category', 'site', 'created_at']
+    readonly_fields = ['is_alarm', 'stock_adjustment', 'created_at', 'updated_at', 'created_by', 'updated_by']
     
     fieldsets = (
         ('基本信息', {
             'fields': ('name', 'model', 'description', 'category')
         }),
         ('库存信息', {
-            'fields': ('quantity', 'alarm_qty', 'location', 'image')
+            'fields': ('quantity', 'alarm_qty', 'is_alarm', 'stock_adjustment', 'location', 'image')
         }),
         ('供应商信息', {
             'fields': ('supplier', 'supplier_code', 'procurement_days')
@@ -61,4 +64,93 @@ class SparePartTransactionAdmin(admin.ModelAdmin):
         """自动设置操作人"""
         if not change:  # 创建时
             obj.operator = request.user
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(SparePartTransactionArchive)
+class SparePartTransactionArchiveAdmin(admin.ModelAdmin):
+    """已归档出入库记录（由 archive_transactions 命令迁入，只读）"""
+    list_display = ['id', 'spare_part', 'transaction_type', 'quantity', 'operator', 'created_at']
+    list_filter = ['transaction_type', 'created_at']
+    search_fields = ['spare_part__name', 'reason']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SparePartOpeningBalance)
+class SparePartOpeningBalanceAdmin(admin.ModelAdmin):
+    """期初结余（归档流水的累计，只读）"""
+    list_display = ['spare_part', 'as_of', 'in_count', 'in_qty', 'out_count', 'out_qty', 'updated_at']
+    search_fields = ['spare_part__name']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockAdjustment)
+class StockAdjustmentAdmin(admin.ModelAdmin):
+    """流水外库存调整（保存备件、导入时自动记录，只读，可批量审核）"""
+    list_display = ['created_at', 'spare_part', 'delta', 'source', 'operator', 'approved', 'reviewed_by', 'reviewed_at']
+    list_filter = ['approved', 'source', 'created_at']
+    search_fields = ['spare_part__name']
+    actions = ['approve']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description="审核通过（计入对账应有库存）")
+    def approve(self, request, queryset):
+        count = StockAdjustment.approve(queryset, request.user)
+        self.message_user(request, f"已审核 {count} 条调整记录")
+
+
+@admin.register(StockMovementDaily)
+class StockMovementDailyAdmin(admin.ModelAdmin):
+    """出入库日汇总（由出入库记录自动维护，只读）"""
+    list_display = ['day', 'spare_part', 'site', 'in_count', 'in_qty', 'out_count', 'out_qty']
+    list_filter = ['site', 'day']
+    search_fields = ['spare_part__name']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SparePartForecast)
+class SparePartForecastAdmin(admin.ModelAdmin):
+    """备件消耗预测（由 forecast_stock 命令计算，只读）"""
+    list_display = ['spare_part', 'site', 'daily_usage', 'reorder_point', 'days_to_stockout', 'computed_at']
+    list_filter = ['site']
+    search_fields = ['spare_part__name']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    """备件库存快照（由 snapshot_stock 命令记录，只读）"""
+    list_display = ['day', 'spare_part', 'site', 'quantity', 'is_month_end', 'taken_at']
+    list_filter = ['site', 'is_month_end', 'day']
+    search_fields = ['spare_part__name']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
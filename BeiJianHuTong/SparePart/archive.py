@@ -0,0 +1,125 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import SparePartOpeningBalance, SparePartTransaction, SparePartTransactionArchive
+from .partitions import add_months, drop_partitions_before, supports_partitioning
+
+ARCHIVE_BATCH_SIZE = 5000
+ARCHIVE_FIELDS = [
+    'id', 'spare_part_id', 'transaction_type', 'quantity', 'operator_id', 'reason', 'remark', 'created_at',
+]
+
+
+def get_archive_months():
+    return getattr(settings, 'TRANSACTION_ARCHIVE_MONTHS', 24)
+
+
+def archive_horizon(months=None, today=None):
+    """归档边界：months 个月前的本地月初零点"""
+    today = today or timezone.localdate()
+    month = add_months(today.replace(day=1), -(get_archive_months() if months is None else months))
+    return timezone.make_aware(datetime(month.year, month.month, 1))
+
+
+def fold_into_opening_balances(movements, as_of):
+    """把一批待归档流水按备件聚合（一条 GROUP BY），累加进期初结余"""
+    totals = {
+        row['spare_part_id']: row
+        for row in movements.order_by().values('spare_part_id').annotate(
+            in_count=Count('id', filter=Q(transaction_type='in')),
+            in_qty=Coalesce(Sum('quantity', filter=Q(transaction_type='in')), 0),
+            out_count=Count('id', filter=Q(transaction_type='out')),
+            out_qty=Coalesce(Sum('quantity', filter=Q(transaction_type='out')), 0),
+        )
+    }
+    balances = SparePartOpeningBalance.objects.select_for_update().in_bulk(totals, field_name='spare_part_id')
+
+    updated, created = [], []
+    for spare_part_id, row in totals.items():
+        balance = balances.get(spare_part_id)
+        if balance is None:
+            balance = SparePartOpeningBalance(spare_part_id=spare_part_id, as_of=as_of)
+            created.append(balance)
+        else:
+            balance.as_of = max(balance.as_of, as_of)
+            updated.append(balance)
+        for field in ('in_count', 'in_qty', 'out_count', 'out_qty'):
+            setattr(balance, field, getattr(balance, field) + row[field])
+        balance.updated_at = timezone.now()
+
+    SparePartOpeningBalance.objects.bulk_update(
+        updated, ['as_of', 'in_count', 'in_qty', 'out_count', 'out_qty', 'updated_at']
+    )
+    SparePartOpeningBalance.objects.bulk_create(created)
+
+
+def archive_transactions(before, batch_size=ARCHIVE_BATCH_SIZE):
+    """把 before 之前的出入库流水迁入归档表，返回迁移条数
+
+    每批在一个事务内：先折叠进期初结余，再复制到归档表，最后从流水表删除。
+    MySQL 分区表上全部迁移完成后删除已清空的月分区。
+    """
+    archived = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                SparePartTransaction.objects.filter(created_at__lt=before)
+                .order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            movements = SparePartTransaction.objects.filter(pk__in=ids)
+            fold_into_opening_balances(movements, before)
+            SparePartTransactionArchive.objects.bulk_create([
+                SparePartTransactionArchive(**row) for row in movements.values(*ARCHIVE_FIELDS)
+            ])
+            # 归档的流水仍计入日汇总：直接删除，不触发 post_delete 的日汇总扣回
+            movements._raw_delete(movements.db)
+        archived += len(ids)
+
+    if supports_partitioning(connection):
+        # 分区上界为 UTC 日期
+        drop_partitions_before(
+            connection, SparePartTransaction._meta.db_table, before.astimezone(dt_timezone.utc).date()
+        )
+    return archived
+
+
+class CombinedLedger:
+    """流水表 + 归档表的合并结果，供分页器使用（?include_archive=true）
+
+    分页时用 UNION ALL 只取当前页的 (id, created_at, 是否归档)，再按 ID 分别取回两表的对象。
+    """
+
+    ordered = True
+
+    def __init__(self, live, archived):
+        self.live = live
+        self.archived = archived
+
+    def count(self):
+        return self.live.count() + self.archived.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        keys = (
+            self.live.order_by().annotate(archived=Value(False)).values_list('id', 'created_at', 'archived')
+            .union(
+                self.archived.order_by().annotate(archived=Value(True)).values_list('id', 'created_at', 'archived'),
+                all=True,
+            )
+            .order_by('-created_at', '-id')[item]
+        )
+        keys = list(keys)
+        live = self.live.in_bulk([pk for pk, _, archived in keys if not archived])
+        archived = self.archived.in_bulk([pk for pk, _, archived in keys if archived])
+        return [(archived if is_archived else live)[pk] for pk, _, is_archived in keys]
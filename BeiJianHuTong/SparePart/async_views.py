@@ -0,0 +1,166 @@
+"""备件、出入库的原生异步只读接口（/api/async/...）
+
+参数与响应格式同对应的同步接口，查询使用异步 ORM（acount / aget / 异步迭代），
+ASGI 下不为每个请求占用线程；游标分页、合并归档等少用的参数组合交给同步视图处理。
+另有库存变更事件流 stock-events/（SSE）。
+"""
+import asyncio
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import exceptions
+
+from BeiJianHuTong.asyncapi import apaginate, async_api_view, delegate, render_json
+from BeiJianHuTong.conditional import aconditional_get, aget_version, make_etag
+from .caching import acached_list, visible_site_id
+from .events import RESYNC, get_broker
+from .models import SparePart, SparePartTransaction
+from .pagination import KeysetPagination, StandardPagination
+from .serializers import SparePartListSerializer, SparePartSerializer, SparePartTransactionSerializer
+from .statistics import GROUP_BY_CHOICES, atransaction_statistics, clean_statistics_params
+from .views import SparePartTransactionViewSet, SparePartViewSet
+
+sync_spare_part_list = SparePartViewSet.as_view({'get': 'list'})
+sync_transaction_list = SparePartTransactionViewSet.as_view({'get': 'list'})
+
+
+@async_api_view()
+async def spare_part_list(request):
+    """备件列表（与 /api/spare-parts/ 共用列表缓存）"""
+    if KeysetPagination.is_requested(request):
+        return await delegate(sync_spare_part_list, request)
+
+    async def render():
+        view = SparePartViewSet(request=request, action='list', format_kwarg=None, kwargs={})
+        queryset = view.filter_list_queryset(SparePartListSerializer.setup_eager_loading(SparePart.objects.all()))
+        if request.query_params.get('search', '').strip():
+            queryset = queryset.order_by('-search_rank', '-is_alarm', '-created_at')
+        else:
+            queryset = queryset.order_by('-is_alarm', '-created_at')
+        number, page, total = await apaginate(queryset, request, StandardPagination())
+        return {
+            "code": 0,
+            "message": "success",
+            "data": {
+                "total": total,
+                "page": number,
+                "limit": StandardPagination.page_size,
+                "items": SparePartListSerializer(page, many=True, context={'request': request}).data
+            }
+        }
+
+    return render_json(await acached_list(request, render))
+
+
+@async_api_view()
+async def spare_part_detail(request, pk):
+    """备件详情（ETag 条件请求，未变更时只查询一次 updated_at）"""
+    queryset = SparePartListSerializer.setup_eager_loading(SparePart.objects.all())
+    updated_at = await queryset.filter(pk=pk).values_list('updated_at', flat=True).afirst()
+    if updated_at is None:
+        raise exceptions.NotFound()
+
+    async def render():
+        try:
+            instance = await queryset.aget(pk=pk)
+        except SparePart.DoesNotExist:
+            raise exceptions.NotFound()
+        return render_json({
+            "code": 0,
+            "message": "success",
+            "data": SparePartSerializer(instance, context={'request': request}).data
+        })
+
+    categories_version = await aget_version('categories')
+    sites_version = await aget_version('sites')
+    users_version = await aget_version('users')
+    etag = make_etag(
+        'part', pk, int(updated_at.timestamp() * 1000), categories_version, sites_version, users_version
+    )
+    last_modified = max(
+        int(updated_at.timestamp()), categories_version // 1000, sites_version // 1000, users_version // 1000
+    )
+    return await aconditional_get(request._request, etag, last_modified, render)
+
+
+@async_api_view()
+async def transaction_list(request):
+    """出入库记录列表"""
+    if KeysetPagination.is_requested(request) or request.query_params.get('include_archive'):
+        return await delegate(sync_transaction_list, request)
+
+    view = SparePartTransactionViewSet(request=request, action='list', format_kwarg=None, kwargs={})
+    queryset = view.filter_list_queryset(SparePartTransaction.objects.select_related('spare_part', 'operator'))
+    number, page, total = await apaginate(queryset, request, StandardPagination())
+    return render_json({
+        "code": 0,
+        "message": "success",
+        "data": {
+            "total": total,
+            "page": number,
+            "limit": StandardPagination.page_size,
+            "items": SparePartTransactionSerializer(page, many=True, context={'request': request}).data
+        }
+    })
+
+
+@async_api_view()
+async def transaction_statistics(request):
+    """出入库统计（参数同 /api/transactions/statistics/）"""
+    group_by = request.query_params.get('group_by')
+    if group_by and group_by not in GROUP_BY_CHOICES:
+        return render_json({
+            "code": 1,
+            "message": f"group_by 参数无效，可选值: {', '.join(GROUP_BY_CHOICES)}",
+            "data": None
+        }, status=400)
+    try:
+        params = clean_statistics_params(request.query_params)
+    except ValueError as exc:
+        return render_json({"code": 1, "message": str(exc), "data": None}, status=400)
+
+    return render_json({
+        "code": 0,
+        "message": "success",
+        "data": await atransaction_statistics(params, group_by)
+    })
+
+
+@async_api_view(query_token=True)
+async def stock_events(request):
+    """库存变更事件流（Server-Sent Events）
+
+    按可见场站范围（同列表接口：本场站，或有“查看所有场站”权限时 ?site_id= / 全部）推送
+    event: stock，data 为 {id, site_id, quantity, is_alarm}，备件删除或移出场站时带 deleted: true；
+    event: resync 表示可能有事件丢失，客户端应重新拉取列表：每次连接（含断线重连）订阅后先发送一次，
+    覆盖未连接期间的变更，之后在事件积压溢出时发送。空闲时定期发送注释行保持连接，
+    连接最长保持 STOCK_EVENT_MAX_AGE 秒，之后客户端自动重连。
+    """
+    site_id = visible_site_id(request)
+    keepalive = getattr(settings, 'STOCK_EVENT_KEEPALIVE', 15)
+    max_age = getattr(settings, 'STOCK_EVENT_MAX_AGE', 300)
+    broker = get_broker()
+
+    async def stream():
+        # Django 4.2 的流式响应不监听 http.disconnect，客户端断开后生成器不会被取消；
+        # 限制每个连接的时长，到期结束响应、释放订阅，由客户端按 retry 重连
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_age
+        async with broker.subscribe(site_id) as subscription:
+            yield "retry: 5000\n\n"  # 断线后 5 秒重连
+            # 订阅已生效，此后的变更都会推送；此前（上次连接断开后）的变更由客户端重新拉取
+            yield "event: resync\ndata: {}\n\n"
+            while (remaining := deadline - loop.time()) > 0:
+                event = await subscription.next_event(min(keepalive, remaining))
+                if event is None:
+                    yield ": keepalive\n\n"
+                elif event is RESYNC:
+                    yield "event: resync\ndata: {}\n\n"
+                else:
+                    yield f"event: stock\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # 关闭 nginx 缓冲
+    return response
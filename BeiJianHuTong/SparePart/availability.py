@@ -0,0 +1,73 @@
+from collections import defaultdict
+
+from django.db.models import F
+
+from .models import SparePart
+
+MAX_DONORS = 5
+
+
+def shortage(quantity, alarm_qty):
+    """解除告警（库存高于预警值）还需要的数量"""
+    return max(alarm_qty + 1 - quantity, 0)
+
+
+def transfer_suggestions(needy_parts, max_donors=MAX_DONORS):
+    """为缺货备件查找其他场站的同名同型号备件，按富余量（库存 - 预警值）排序
+
+    needy_parts 为备件查询集；捐出方用一次查询取回（名称、型号 IN + 富余量 > 0），
+    在内存中按 (名称, 型号) 分组，并按富余量依次分配建议调拨数量。
+    """
+    needy = list(needy_parts.values('id', 'name', 'model', 'site_id', 'site__name', 'quantity', 'alarm_qty'))
+    if not needy:
+        return []
+
+    donors = (
+        SparePart.objects
+        .filter(
+            name__in={part['name'] for part in needy},
+            model__in={part['model'] for part in needy},
+            status='active',
+            quantity__gt=F('alarm_qty'),
+        )
+        .annotate(surplus=F('quantity') - F('alarm_qty'))
+        .order_by('-surplus', 'id')
+        .values('id', 'name', 'model', 'site_id', 'site__name', 'quantity', 'alarm_qty', 'surplus')
+    )
+    donors_by_key = defaultdict(list)
+    for donor in donors:
+        donors_by_key[(donor['name'], donor['model'])].append(donor)
+
+    results = []
+    for part in needy:
+        remaining = shortage(part['quantity'], part['alarm_qty'])
+        candidates = []
+        for donor in donors_by_key[(part['name'], part['model'])]:
+            if donor['site_id'] == part['site_id']:
+                continue
+            suggested = min(donor['surplus'], remaining)
+            remaining -= suggested
+            candidates.append({
+                "sparePartId": donor['id'],
+                "siteId": donor['site_id'],
+                "siteName": donor['site__name'],
+                "quantity": donor['quantity'],
+                "alarmQty": donor['alarm_qty'],
+                "surplus": donor['surplus'],
+                "suggestedQty": suggested,
+            })
+            if len(candidates) >= max_donors:
+                break
+        results.append({
+            "sparePartId": part['id'],
+            "name": part['name'],
+            "model": part['model'],
+            "siteId": part['site_id'],
+            "siteName": part['site__name'],
+            "quantity": part['quantity'],
+            "alarmQty": part['alarm_qty'],
+            "shortage": shortage(part['quantity'], part['alarm_qty']),
+            "uncovered": remaining,
+            "donors": candidates,
+        })
+    return results
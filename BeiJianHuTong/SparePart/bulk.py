@@ -0,0 +1,204 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from sites.models import Site
+from .caching import invalidate_spare_part_lists
+from .events import publish_stock_events, stock_event
+from .models import SparePart, Category, SparePartTransaction, StockMovementDaily
+from .search import index_parts
+from .suggest import invalidate_indexes
+
+
+BULK_MODES = ('atomic', 'best_effort')
+BULK_MAX_ITEMS = 1000
+
+
+class BulkTransactionItemSerializer(serializers.Serializer):
+    """批量出入库单条记录（仅做字段校验，备件/场站/分类由批量查询解析）"""
+
+    spare_part = serializers.IntegerField(required=False, allow_null=True)
+    spare_part_name_input = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    spare_part_model = serializers.CharField(required=False, allow_blank=True, max_length=200)
+    spare_part_location = serializers.CharField(required=False, allow_blank=True, max_length=200)
+    spare_part_category_id = serializers.IntegerField(required=False, allow_null=True)
+    spare_part_site_id = serializers.IntegerField(required=False, allow_null=True)
+    transaction_type = serializers.ChoiceField(choices=SparePartTransaction.TRANSACTION_TYPE_CHOICES)
+    quantity = serializers.IntegerField(min_value=1)
+    reason = serializers.CharField(max_length=200)
+    remark = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, attrs):
+        if not attrs.get('spare_part') and not attrs.get('spare_part_name_input'):
+            raise serializers.ValidationError("必须提供 spare_part 或 spare_part_name_input")
+        if not attrs.get('spare_part') and not attrs.get('spare_part_site_id'):
+            raise serializers.ValidationError("必须提供 spare_part 或 spare_part_site_id")
+        return attrs
+
+
+def bulk_create_transactions(items, user, mode='atomic'):
+    """批量出入库
+
+    所有备件、场站、分类用集合查询一次解析，涉及的备件行一次加锁，
+    出入库记录 bulk_create，库存 bulk_update，全部在一个数据库事务内完成。
+    atomic 模式下任一条失败则全部不写入；best_effort 模式写入所有有效记录。
+    返回 (created, errors, parts)。
+    """
+    errors = {}
+    valid = {}
+    for index, item in enumerate(items):
+        serializer = BulkTransactionItemSerializer(data=item)
+        if serializer.is_valid():
+            valid[index] = serializer.validated_data
+        else:
+            errors[index] = serializer.errors
+
+    with transaction.atomic():
+        part_ids = {data['spare_part'] for data in valid.values() if data.get('spare_part')}
+        names = {
+            (data['spare_part_name_input'], data['spare_part_site_id'])
+            for data in valid.values() if not data.get('spare_part')
+        }
+        site_ids = {site_id for _, site_id in names}
+        category_ids = {
+            data['spare_part_category_id']
+            for data in valid.values()
+            if not data.get('spare_part') and data.get('spare_part_category_id')
+        }
+
+        sites = Site.objects.in_bulk(site_ids)
+        categories = Category.objects.in_bulk(category_ids)
+        parts = lock_parts(part_ids, names)
+        parts_by_name = {(part.name, part.site_id): part for part in parts.values()}
+
+        # 按提交顺序模拟库存变化，新建备件初始库存为 0
+        stock = {pk: part.quantity for pk, part in parts.items()}
+        targets = {}
+        for index, data in valid.items():
+            try:
+                key = resolve_target(data, parts, parts_by_name, sites, categories)
+            except serializers.ValidationError as exc:
+                errors[index] = exc.detail
+                continue
+            current = stock.get(key, 0)
+            if data['transaction_type'] == 'out' and data['quantity'] > current:
+                errors[index] = {'quantity': [f"库存不足：当前库存 {current}，出库 {data['quantity']}"]}
+                continue
+            delta = data['quantity'] if data['transaction_type'] == 'in' else -data['quantity']
+            stock[key] = current + delta
+            targets[index] = key
+
+        if errors and mode == 'atomic':
+            return 0, format_errors(errors), []
+
+        # 创建缺失的备件，再一次查询取回（MySQL bulk_create 不返回主键）
+        new_keys = {key for key in targets.values() if not isinstance(key, int)}
+        if new_keys:
+            create_missing_parts(new_keys, valid, targets, categories, user)
+            created_parts = lock_parts(set(), new_keys)
+            index_parts(created_parts.values())
+            invalidate_indexes(site_id for _, site_id in new_keys)
+            parts.update(created_parts)
+            parts_by_name.update({(part.name, part.site_id): part for part in created_parts.values()})
+
+        now = timezone.now()
+        movements = []
+        touched = {}
+        for index, key in sorted(targets.items()):
+            data = valid[index]
+            part = parts[key] if isinstance(key, int) else parts_by_name[key]
+            if data['transaction_type'] == 'in':
+                part.quantity += data['quantity']
+                part.last_purchase_date = now
+            else:
+                part.quantity -= data['quantity']
+                part.last_use_date = now
+            touched[part.pk] = part
+            movements.append(SparePartTransaction(
+                spare_part=part,
+                transaction_type=data['transaction_type'],
+                quantity=data['quantity'],
+                operator=user,
+                reason=data['reason'],
+                remark=data.get('remark', ''),
+            ))
+
+        for part in touched.values():
+            part.is_alarm = part.quantity <= part.alarm_qty
+            part.updated_at = now
+        SparePart.objects.bulk_update(
+            touched.values(),
+            ['quantity', 'is_alarm', 'last_purchase_date', 'last_use_date', 'updated_at'],
+        )
+        SparePartTransaction.objects.bulk_create(movements)
+        StockMovementDaily.record_many(movements, timezone.localdate(now))
+        invalidate_spare_part_lists(part.site_id for part in touched.values())
+        publish_stock_events(stock_event(part) for part in touched.values())
+
+    return len(movements), format_errors(errors), [
+        {"id": part.pk, "name": part.name, "quantity": part.quantity, "is_alarm": part.is_alarm}
+        for part in touched.values()
+    ]
+
+
+def lock_parts(part_ids, names):
+    """按 id 和 (名称, 场站) 一次查询并锁定备件行，按主键排序加锁避免死锁"""
+    if not part_ids and not names:
+        return {}
+    query = SparePart.objects.none()
+    if part_ids:
+        query = SparePart.objects.filter(pk__in=part_ids)
+    if names:
+        query |= SparePart.objects.filter(
+            site_id__in={site_id for _, site_id in names},
+            name__in={name for name, _ in names},
+        )
+    return {part.pk: part for part in query.select_for_update().order_by('pk')}
+
+
+def resolve_target(data, parts, parts_by_name, sites, categories):
+    """返回备件主键，或待新建备件的 (名称, 场站ID)"""
+    if data.get('spare_part'):
+        if data['spare_part'] not in parts:
+            raise serializers.ValidationError({'spare_part': [f"备件 ID {data['spare_part']} 不存在"]})
+        return data['spare_part']
+
+    key = (data['spare_part_name_input'], data['spare_part_site_id'])
+    if key in parts_by_name:
+        return parts_by_name[key].pk
+    if key[1] not in sites:
+        raise serializers.ValidationError({'spare_part_site_id': [f"场站 ID {key[1]} 不存在"]})
+    category_id = data.get('spare_part_category_id')
+    if category_id and category_id not in categories:
+        raise serializers.ValidationError({'spare_part_category_id': [f"分类 ID {category_id} 不存在"]})
+    return key
+
+
+def create_missing_parts(new_keys, valid, targets, categories, user):
+    """按首次出现的记录信息批量新建备件"""
+    first = {}
+    for index, key in sorted(targets.items()):
+        if key in new_keys and key not in first:
+            first[key] = valid[index]
+
+    SparePart.objects.bulk_create([
+        SparePart(
+            name=name,
+            site_id=site_id,
+            model=data.get('spare_part_model') or 'UNKNOWN',
+            location=data.get('spare_part_location') or '未指定',
+            category=categories.get(data.get('spare_part_category_id')),
+            quantity=0,
+            alarm_qty=5,
+            is_alarm=True,
+            status='active',
+            created_by=user,
+            updated_by=user,
+        )
+        for (name, site_id), data in first.items()
+    ], ignore_conflicts=True)
+
+
+def format_errors(errors):
+    """{序号: 错误} -> [{"index": 序号, "errors": 错误}]"""
+    return [{"index": index, "errors": detail} for index, detail in sorted(errors.items())]
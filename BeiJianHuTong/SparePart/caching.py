@@ -0,0 +1,114 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from BeiJianHuTong.conditional import aget_version, bump_version, conditional_get_enabled, get_version
+
+LIST_CACHE_PREFIX = 'spare_parts:list'
+ALL_SITES_GENERATION = 'spare_parts'
+
+
+def get_list_cache_timeout():
+    return getattr(settings, 'SPARE_PART_LIST_CACHE_TIMEOUT', 300)
+
+
+def list_cache_enabled():
+    """列表缓存靠代数跨进程失效，与条件 GET 一样只在共享缓存下启用"""
+    return bool(get_list_cache_timeout()) and conditional_get_enabled()
+
+
+def site_generation(site_id):
+    return f'spare_parts:site:{site_id}'
+
+
+def invalidate_spare_part_lists(site_ids):
+    """备件或库存写入后使相关场站的列表缓存失效
+
+    立即递增一次，事务提交后再递增一次：提交前并发读到旧数据并写入缓存的条目，
+    会在提交后随代数变化一并作废。
+    """
+    site_ids = {site_id for site_id in site_ids if site_id is not None}
+
+    def bump():
+        bump_version(ALL_SITES_GENERATION)
+        for site_id in site_ids:
+            bump_version(site_generation(site_id))
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def visible_site_id(request):
+    """列表实际可见的单个场站，跨场站查询返回 None（与 filter_list_queryset 的权限逻辑一致）"""
+    user = request.user
+    if not user.can_view_all_sites and user.site_id:
+        return user.site_id
+    site_id = request.query_params.get('site_id', '').strip()
+    return int(site_id) if site_id.isdigit() else None
+
+
+def list_cache_versions(request):
+    """列表缓存键的可见范围及参与键名的版本号名称：该范围的代数 + 分类/场站/用户版本
+
+    列表项包含分类、场站名称及创建人/更新人用户名，这些资源变化时缓存同样作废。
+    """
+    site_id = visible_site_id(request)
+    if site_id is None:
+        scope, generation = 'all', ALL_SITES_GENERATION
+    else:
+        scope, generation = f'site{site_id}', site_generation(site_id)
+    return scope, (generation, 'categories', 'sites', 'users')
+
+
+def format_list_cache_key(request, scope, versions):
+    params = sorted(
+        (name, value.strip())
+        for name, values in request.query_params.lists()
+        for value in values
+        if value.strip()
+    )
+    digest = hashlib.md5(repr(params).encode()).hexdigest()
+    return ':'.join([LIST_CACHE_PREFIX, scope, *(str(version) for version in versions), digest])
+
+
+def list_cache_key(request):
+    """列表缓存键：可见范围 + 各版本号 + 规范化的查询参数"""
+    scope, names = list_cache_versions(request)
+    return format_list_cache_key(request, scope, [get_version(name) for name in names])
+
+
+async def alist_cache_key(request):
+    """list_cache_key 的异步版本，与同步列表生成相同的键"""
+    scope, names = list_cache_versions(request)
+    return format_list_cache_key(request, scope, [await aget_version(name) for name in names])
+
+
+def cached_list(request, render):
+    """命中缓存时返回缓存的响应数据，否则调用 render() 并缓存成功的响应"""
+    if not list_cache_enabled():
+        return render()
+
+    key = list_cache_key(request)
+    data = cache.get(key)
+    if data is not None:
+        return Response(data)
+    response = render()
+    if response.status_code == 200:
+        cache.set(key, response.data, get_list_cache_timeout())
+    return response
+
+
+async def acached_list(request, render):
+    """cached_list 的异步版本：render 为协程函数，返回响应数据（与同步列表共用缓存条目，使用异步缓存接口）"""
+    if not list_cache_enabled():
+        return await render()
+
+    key = await alist_cache_key(request)
+    data = await cache.aget(key)
+    if data is None:
+        data = await render()
+        await cache.aset(key, data, get_list_cache_timeout())
+    return data
@@ -0,0 +1,119 @@
+"""备件库存变更推送（SSE）
+
+备件保存（含出入库更新库存）后在事务提交时发布精简事件 {id, site_id, quantity, is_alarm}，
+/api/async/stock-events/ 的订阅者按场站范围接收，前端据此更新本地状态，无需重新拉取列表。
+
+默认使用进程内代理：ASGI 进程内的写入直接推送给同一进程的订阅者，测试无需外部服务。
+多进程部署时各进程的订阅互不可见，可通过 STOCK_EVENT_BROKER 指定实现相同接口的共享代理
+（publish / has_subscribers / subscribe）。
+"""
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# 订阅者队列溢出（消费过慢）时发送的事件，客户端应重新拉取列表
+RESYNC = object()
+
+
+def get_queue_size():
+    return getattr(settings, 'STOCK_EVENT_QUEUE_SIZE', 1000)
+
+
+def stock_event(part):
+    return {"id": part.pk, "site_id": part.site_id, "quantity": part.quantity, "is_alarm": part.is_alarm}
+
+
+def removed_event(part_id, site_id):
+    """备件被删除或移出该场站"""
+    return {"id": part_id, "site_id": site_id, "deleted": True}
+
+
+class LocalSubscription:
+    """单个订阅者：事件经 call_soon_threadsafe 放入订阅者所在事件循环的队列"""
+
+    def __init__(self, loop, site_id):
+        self.loop = loop
+        self.site_id = site_id
+        self.queue = asyncio.Queue(maxsize=get_queue_size())
+        self.overflowed = False
+
+    def deliver(self, events):
+        for event in events:
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.overflowed = True
+                return
+
+    async def next_event(self, timeout):
+        """下一条事件；超时返回 None，溢出后返回 RESYNC 并丢弃积压的事件"""
+        if self.overflowed:
+            self.overflowed = False
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            return RESYNC
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return RESYNC if self.overflowed else None
+
+
+class LocalStockEventBroker:
+    """进程内代理，发布可在任意线程调用"""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def has_subscribers(self):
+        return bool(self.subscribers)
+
+    def publish(self, events):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            matched = [
+                event for event in events
+                if subscriber.site_id is None or event['site_id'] == subscriber.site_id
+            ]
+            if not matched:
+                continue
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.deliver, matched)
+            except RuntimeError:
+                # 事件循环已关闭
+                with self.lock:
+                    self.subscribers.discard(subscriber)
+
+    @asynccontextmanager
+    async def subscribe(self, site_id=None):
+        """订阅 site_id 场站（None 为全部场站）的事件"""
+        subscriber = LocalSubscription(asyncio.get_running_loop(), site_id)
+        with self.lock:
+            self.subscribers.add(subscriber)
+        try:
+            yield subscriber
+        finally:
+            with self.lock:
+                self.subscribers.discard(subscriber)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    backend = getattr(settings, 'STOCK_EVENT_BROKER', None)
+    return import_string(backend)() if backend else LocalStockEventBroker()
+
+
+def publish_stock_events(events):
+    """备件库存/告警变化后调用，事务提交后发布（回滚则不发布）；events 可为生成器，无订阅者时不求值"""
+    broker = get_broker()
+    if not broker.has_subscribers():
+        return
+    events = list(events)
+    if events:
+        transaction.on_commit(lambda: broker.publish(events))
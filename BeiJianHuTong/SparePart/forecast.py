@@ -0,0 +1,150 @@
+import math
+from datetime import timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .export import iterate_in_chunks
+from .models import SparePart, SparePartForecast, StockMovementDaily
+
+FORECAST_WINDOW_DAYS = 90
+DEFAULT_SERVICE_LEVEL = 0.95
+FORECAST_BATCH_SIZE = 5000
+
+FORECAST_FIELDS = [
+    'site', 'daily_usage', 'usage_std', 'lead_days', 'safety_stock', 'reorder_point',
+    'days_to_stockout', 'window_days', 'service_level', 'computed_at',
+]
+
+
+def load_columns(queryset, dtypes, chunk_size):
+    """按主键分批读取 values_list，每批转为 NumPy 数组后拼接（不构造模型对象，不保留整表元组）"""
+    columns = [[] for _ in dtypes]
+    batch = []
+
+    def flush():
+        for column, values, dtype in zip(columns, zip(*batch), dtypes):
+            column.append(np.array(values, dtype=dtype))
+        batch.clear()
+
+    for row in iterate_in_chunks(queryset, chunk_size):
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            flush()
+    if batch:
+        flush()
+    return [
+        np.concatenate(column) if column else np.array([], dtype=dtype)
+        for column, dtype in zip(columns, dtypes)
+    ]
+
+
+def compute_forecast(part_ids, quantity, lead_days, history_days, flow_part_ids, flow_qty, service_level):
+    """对全部备件一次性向量化计算
+
+    part_ids 须升序；flow_* 为统计窗口内各备件每日出库量（无出库的日子不出现，按 0 计）。
+    日均消耗 μ 与方差 σ² 按各备件的实际统计天数计算，
+    补货点 = μ·L + z·σ·√L（L 为采购周期，z 由服务水平确定），可用天数 = 库存 / μ。
+    """
+    count = len(part_ids)
+    position = np.searchsorted(part_ids, flow_part_ids)
+    position = np.minimum(position, max(count - 1, 0))
+    known = (part_ids[position] == flow_part_ids) if count else np.zeros(0, dtype=bool)
+    position, flow_qty = position[known], flow_qty[known].astype(np.float64)
+
+    total = np.bincount(position, weights=flow_qty, minlength=count)
+    total_squares = np.bincount(position, weights=flow_qty ** 2, minlength=count)
+    days = history_days.astype(np.float64)
+
+    daily_usage = total / days
+    # 样本方差（n-1），只有一天历史时记为 0
+    variance = np.where(
+        days > 1,
+        (total_squares - days * daily_usage ** 2) / np.maximum(days - 1, 1),
+        0.0,
+    )
+    usage_std = np.sqrt(np.maximum(variance, 0.0))
+
+    z = NormalDist().inv_cdf(service_level)
+    lead = lead_days.astype(np.float64)
+    safety_stock = np.ceil(z * usage_std * np.sqrt(lead))
+    reorder_point = np.ceil(daily_usage * lead + safety_stock)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_to_stockout = np.where(daily_usage > 0, quantity / daily_usage, np.nan)
+
+    return {
+        'daily_usage': daily_usage,
+        'usage_std': usage_std,
+        'safety_stock': np.maximum(safety_stock, 0).astype(np.int64),
+        'reorder_point': np.maximum(reorder_point, 0).astype(np.int64),
+        'days_to_stockout': days_to_stockout,
+    }
+
+
+def run_forecast(window_days=FORECAST_WINDOW_DAYS, service_level=DEFAULT_SERVICE_LEVEL,
+                 site_id=None, batch_size=FORECAST_BATCH_SIZE):
+    """读取出入库日汇总计算全部备件的消耗预测并批量写入 SparePartForecast，返回写入条数
+
+    统计窗口为截至昨天的 window_days 天；窗口内新建的备件按实际天数计算。
+    """
+    today = timezone.localdate()
+    start = today - timedelta(days=window_days)
+
+    parts = SparePart.objects.all()
+    flows = StockMovementDaily.objects.filter(day__gte=start, day__lt=today, out_qty__gt=0)
+    if site_id is not None:
+        parts = parts.filter(site_id=site_id)
+        flows = flows.filter(site_id=site_id)
+
+    part_ids, site_ids, quantity, lead_days, created = load_columns(
+        parts.values_list('id', 'site_id', 'quantity', 'procurement_days', 'created_at__date'),
+        [np.int64, np.int64, np.float64, np.int64, 'datetime64[D]'],
+        batch_size,
+    )
+    _, flow_part_ids, flow_qty = load_columns(
+        flows.values_list('id', 'spare_part_id', 'out_qty'),
+        [np.int64, np.int64, np.float64],
+        batch_size,
+    )
+
+    history_days = np.clip(
+        (np.datetime64(today, 'D') - created).astype(np.int64), 1, window_days
+    )
+    result = compute_forecast(part_ids, quantity, lead_days, history_days, flow_part_ids, flow_qty, service_level)
+
+    now = timezone.now()
+    conflict_options = {'update_conflicts': True, 'update_fields': FORECAST_FIELDS}
+    if connection.features.supports_update_conflicts_with_target:
+        conflict_options['unique_fields'] = ['spare_part']
+
+    written = 0
+    for offset in range(0, len(part_ids), batch_size):
+        window = slice(offset, offset + batch_size)
+        stockout = result['days_to_stockout'][window]
+        rows = [
+            SparePartForecast(
+                spare_part_id=part_id,
+                site_id=part_site_id,
+                daily_usage=round(daily_usage, 4),
+                usage_std=round(usage_std, 4),
+                lead_days=lead,
+                safety_stock=safety,
+                reorder_point=reorder,
+                days_to_stockout=None if math.isnan(days) else round(days, 1),
+                window_days=history,
+                service_level=service_level,
+                computed_at=now,
+            )
+            for part_id, part_site_id, daily_usage, usage_std, lead, safety, reorder, days, history in zip(
+                part_ids[window].tolist(), site_ids[window].tolist(),
+                result['daily_usage'][window].tolist(), result['usage_std'][window].tolist(),
+                lead_days[window].tolist(), result['safety_stock'][window].tolist(),
+                result['reorder_point'][window].tolist(), stockout.tolist(), history_days[window].tolist(),
+            )
+        ]
+        with transaction.atomic():
+            SparePartForecast.objects.bulk_create(rows, **conflict_options)
+        written += len(rows)
+    return written
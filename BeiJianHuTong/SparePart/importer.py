@@ -0,0 +1,272 @@
+import csv
+import io
+import os
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import F, Case, When, Value
+
+from sites.models import Site
+from .caching import invalidate_spare_part_lists
+from .events import publish_stock_events, stock_event
+from .models import SparePart, Category, StockAdjustment
+from .search import SEARCH_FIELDS, index_parts, uses_fulltext
+from .suggest import invalidate_indexes
+
+
+IMPORT_FORMATS = ('.csv', '.xlsx')
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ERRORS = 1000
+
+# 导入列 -> 可识别的表头（字段名或中文表头）
+IMPORT_COLUMNS = {
+    'name': ('name', '备件名称'),
+    'model': ('model', '备件型号'),
+    'description': ('description', '备件描述'),
+    'category_code': ('category_code', '分类编码'),
+    'site_code': ('site_code', '场站代码'),
+    'quantity': ('quantity', '当前数量'),
+    'alarm_qty': ('alarm_qty', '库存预警数量'),
+    'location': ('location', '备件位置'),
+    'supplier': ('supplier', '供应商名称'),
+    'supplier_code': ('supplier_code', '供应商编码'),
+    'procurement_days': ('procurement_days', '采购周期（天）'),
+    'status': ('status', '状态'),
+}
+HEADER_ALIASES = {alias: column for column, aliases in IMPORT_COLUMNS.items() for alias in aliases}
+
+# 直接写入 SparePart 字段的列
+MODEL_COLUMNS = [
+    'model', 'description', 'quantity', 'alarm_qty', 'location',
+    'supplier', 'supplier_code', 'procurement_days', 'status',
+]
+STATUS_ALIASES = {label: value for value, label in SparePart.STATUS_CHOICES}
+
+
+def cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def open_rows(file, filename):
+    """读取表头，返回 (列名列表, 逐行生成 (行号, {列: 值}) 的迭代器)，不整体载入内存"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.xlsx':
+        from openpyxl import load_workbook
+        sheet = load_workbook(file, read_only=True, data_only=True).active
+        rows = sheet.iter_rows(values_only=True)
+    elif extension == '.csv':
+        rows = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    else:
+        raise ValueError(f"不支持的文件类型，可选: {', '.join(IMPORT_FORMATS)}")
+
+    header = next(rows, None) or []
+    columns = [HEADER_ALIASES.get(cell_text(title)) for title in header]
+    if 'name' not in columns:
+        raise ValueError("缺少“备件名称”(name) 列")
+
+    def iterate():
+        for line, values in enumerate(rows, start=2):
+            texts = [cell_text(value) for value in values]
+            if not any(texts):
+                continue
+            yield line, {column: text for column, text in zip(columns, texts) if column}
+
+    return columns, iterate()
+
+
+def clean_row(raw):
+    """按模型字段校验一行，返回 (字段值, 错误)
+
+    可留空的列为空（或行中缺少该列）时不返回该字段：新建备件取字段默认值，已有备件保持原值。
+    """
+    values, errors = {}, {}
+    for column in ['name', *MODEL_COLUMNS]:
+        value = raw.get(column, '')
+        field = SparePart._meta.get_field(column)
+        if value == '' and (field.has_default() or field.blank):
+            continue
+        if column == 'status':
+            value = STATUS_ALIASES.get(value, value)
+        try:
+            values[column] = field.clean(value, None)
+        except ValidationError as exc:
+            errors[column] = exc.messages
+    return values, errors
+
+
+class SparePartImporter:
+    """备件目录批量导入
+
+    流式解析文件，按批次用 code 集合查询解析分类与场站，
+    以 (name, site) 唯一键 bulk_create(update_conflicts=True) 批量 upsert。
+    """
+
+    def __init__(self, user=None, default_site=None, allowed_site_ids=None, batch_size=IMPORT_BATCH_SIZE):
+        self.user = user
+        self.default_site = default_site
+        self.allowed_site_ids = allowed_site_ids  # None 表示不限制
+        self.batch_size = batch_size
+        self.sites = {}
+        self.categories = {}
+        self.total = 0
+        self.imported = 0
+        self.errors = []
+
+    def run(self, file, filename):
+        columns, rows = open_rows(file, filename)
+        batch = []
+        for line, raw in rows:
+            self.total += 1
+            batch.append((line, raw))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch, columns)
+                batch = []
+        if batch:
+            self.import_batch(batch, columns)
+        return self.report()
+
+    def report(self):
+        return {
+            "total": self.total,
+            "imported": self.imported,
+            "failed": self.total - self.imported,
+            "errors": self.errors[:IMPORT_MAX_ERRORS],
+        }
+
+    def add_error(self, line, errors):
+        self.errors.append({"row": line, "errors": errors})
+
+    def resolve_codes(self, batch):
+        """只查询本批次新出现的场站/分类编码"""
+        site_codes = {raw['site_code'] for _, raw in batch if raw.get('site_code')} - self.sites.keys()
+        if site_codes:
+            self.sites.update({site.code: site for site in Site.objects.filter(code__in=site_codes)})
+        category_codes = {raw['category_code'] for _, raw in batch if raw.get('category_code')} - self.categories.keys()
+        if category_codes:
+            self.categories.update({
+                category.code: category for category in Category.objects.filter(code__in=category_codes)
+            })
+
+    def import_batch(self, batch, columns):
+        self.resolve_codes(batch)
+        parts, blanks = {}, {}
+        for line, raw in batch:
+            values, errors = clean_row(raw)
+
+            site = self.sites.get(raw['site_code']) if raw.get('site_code') else self.default_site
+            if site is None:
+                errors['site_code'] = [f"场站代码 {raw.get('site_code')} 不存在" if raw.get('site_code') else "未指定场站"]
+            elif self.allowed_site_ids is not None and site.id not in self.allowed_site_ids:
+                errors['site_code'] = [f"无权导入到场站 {site.code}"]
+
+            # 文件中有但本行为空的列：已有备件保持原值
+            blank = [column for column in MODEL_COLUMNS if column in columns and column not in values]
+            if 'category_code' in columns and not raw.get('category_code'):
+                blank.append('category_id')
+
+            category = None
+            if raw.get('category_code'):
+                category = self.categories.get(raw['category_code'])
+                if category is None:
+                    errors['category_code'] = [f"分类编码 {raw['category_code']} 不存在"]
+
+            if errors:
+                self.add_error(line, errors)
+                continue
+
+            user_id = self.user.id if self.user else None
+            part = SparePart(
+                site_id=site.id,
+                category_id=category.id if category else None,
+                created_by_id=user_id,
+                updated_by_id=user_id,
+                **values
+            )
+            part.is_alarm = part.quantity <= part.alarm_qty  # 新建行；已存在的行在 upsert 后统一重算
+            part.stock_adjustment = part.quantity  # 新建行的初始数量；已存在的行不更新此列
+            key = (part.name, site.id)
+            if key in parts:
+                self.add_error(parts[key][0], {"name": [f"与第 {line} 行重复，已被覆盖"]})
+            parts[key] = (line, part)
+            blanks[key] = blank
+
+        if not parts:
+            return
+
+        # 只更新文件中出现的列，未出现的列保持原值
+        update_fields = [column for column in MODEL_COLUMNS if column in columns]
+        if 'category_code' in columns:
+            update_fields.append('category')
+        update_fields += ['updated_by', 'updated_at']
+        conflict_options = {'update_conflicts': True, 'update_fields': update_fields}
+        if connection.features.supports_update_conflicts_with_target:
+            conflict_options['unique_fields'] = ['name', 'site']
+
+        with transaction.atomic():
+            current = self.lock_existing(parts)
+            for key, blank in blanks.items():
+                if key in current:
+                    for attname in blank:
+                        setattr(parts[key][1], attname, current[key][attname])
+            SparePart.objects.bulk_create([part for _, part in parts.values()], **conflict_options)
+            # 文件可能只含数量或预警值之一，按库中最终值重算告警标记
+            imported = SparePart.objects.filter(
+                site_id__in={site_id for _, site_id in parts},
+                name__in={name for name, _ in parts},
+            )
+            imported.update(is_alarm=Case(
+                When(quantity__lte=F('alarm_qty'), then=Value(True)),
+                default=Value(False),
+            ))
+            if not uses_fulltext():
+                index_parts(
+                    part for part in imported.only('id', 'site_id', *SEARCH_FIELDS)
+                    if (part.name, part.site_id) in parts
+                )
+            invalidate_spare_part_lists(site_id for _, site_id in parts)
+            publish_stock_events(
+                stock_event(part) for part in imported.only('id', 'name', 'site_id', 'quantity', 'is_alarm')
+                if (part.name, part.site_id) in parts
+            )
+            invalidate_indexes(site_id for _, site_id in parts)
+            if 'quantity' in columns:
+                self.record_stock_adjustments(parts, current, imported)
+        self.imported += len(parts)
+
+    def lock_existing(self, parts):
+        """导入前已有备件的可导入字段值（加锁读取）：{(名称, 场站ID): {字段: 值}}"""
+        existing = SparePart.objects.select_for_update().filter(
+            site_id__in={site_id for _, site_id in parts},
+            name__in={name for name, _ in parts},
+        ).values('name', 'site_id', 'category_id', *MODEL_COLUMNS)
+        return {(row['name'], row['site_id']): row for row in existing}
+
+    def record_stock_adjustments(self, parts, current, imported):
+        """导入的数量不经出入库流水
+
+        新建备件的初始数量已随插入计入 stock_adjustment（stock_adjustment 不在 upsert 的更新列中），
+        记为已审核；已有备件的数量变化记为待审核的调整。
+        """
+        user_id = self.user.id if self.user else None
+        ids = {
+            (name, site_id): pk for pk, name, site_id in imported.values_list('pk', 'name', 'site_id')
+            if (name, site_id) in parts
+        }
+        adjustments = []
+        for key, (_, part) in parts.items():
+            if key not in current:
+                if part.quantity:
+                    adjustments.append(StockAdjustment(
+                        spare_part_id=ids[key], delta=part.quantity, source='initial',
+                        operator_id=user_id, approved=True,
+                    ))
+            elif part.quantity != current[key]['quantity']:
+                adjustments.append(StockAdjustment(
+                    spare_part_id=ids[key], delta=part.quantity - current[key]['quantity'], source='import',
+                    operator_id=user_id,
+                ))
+        StockAdjustment.objects.bulk_create(adjustments)
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from SparePart.archive import ARCHIVE_BATCH_SIZE, archive_horizon, archive_transactions
+from SparePart.models import SparePartTransaction
+
+
+class Command(BaseCommand):
+    """把早于归档边界的出入库流水折叠为期初结余并迁入归档表"""
+
+    help = "归档早期出入库流水（默认保留最近 TRANSACTION_ARCHIVE_MONTHS 个月）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int, help="保留最近多少个月的流水（按月初对齐）")
+        parser.add_argument("--before", help="归档此日期（YYYY-MM-DD，本地时间零点）之前的流水")
+        parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="每批迁移行数")
+        parser.add_argument("--dry-run", action="store_true", help="只统计待归档条数")
+
+    def handle(self, *args, **options):
+        if options["before"]:
+            day = parse_date(options["before"])
+            if day is None:
+                raise CommandError("--before 日期格式应为 YYYY-MM-DD")
+            before = timezone.make_aware(datetime(day.year, day.month, day.day))
+        else:
+            before = archive_horizon(options["months"])
+
+        label = timezone.localtime(before).strftime("%Y-%m-%d")
+        if options["dry_run"]:
+            count = SparePartTransaction.objects.filter(created_at__lt=before).count()
+            self.stdout.write(f"{label} 之前有 {count} 条出入库记录待归档")
+            return
+
+        archived = archive_transactions(before, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"已归档 {label} 之前的 {archived} 条出入库记录"))
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+
+from accounts.serializers import SiteTokenObtainPairSerializer
+from SparePart.models import SparePart
+
+# 名称 -> 同步接口路径（异步接口为 /api/async/ 下的同名路径）
+ENDPOINTS = {
+    'spare-parts': '/api/spare-parts/',
+    'spare-part': '/api/spare-parts/{part_id}/',
+    'transactions': '/api/transactions/',
+    'statistics': '/api/transactions/statistics/?group_by=site',
+    'sites': '/api/sites/',
+    'me': '/api/auth/me/',
+}
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+class Command(BaseCommand):
+    """同一进程内对比同步（WSGI，线程池并发）与异步（ASGI，协程并发）只读接口的吞吐与延迟
+
+    请求经 Django 的 WSGI / ASGI 处理器完整执行（中间件、认证、查询、序列化），不含网络开销；
+    部署环境的对比可用 wrk 等工具分别压测 gunicorn（WSGI）与 uvicorn（ASGI）下的同名路径。
+    """
+
+    help = "对比同步与异步只读接口的吞吐（req/s）与延迟"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="签发访问令牌的用户名")
+        parser.add_argument("--requests", type=int, default=200, help="每个接口每种模式的请求数")
+        parser.add_argument("--concurrency", type=int, default=20, help="并发数（同步为线程数，异步为协程数）")
+        parser.add_argument(
+            "--endpoint", action="append", choices=list(ENDPOINTS), help="只测指定接口，可重复（默认全部）"
+        )
+        parser.add_argument("--no-list-cache", action="store_true", help="关闭备件列表缓存，测量实际查询")
+        parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests 与 --concurrency 必须大于 0")
+        user = get_user_model().objects.filter(username=options["user"]).first()
+        if user is None:
+            raise CommandError(f"用户 {options['user']} 不存在")
+
+        token = SiteTokenObtainPairSerializer.get_token(user).access_token
+        headers = {"Authorization": f"Bearer {token}"}
+        part_id = SparePart.objects.values_list("pk", flat=True).first() or 0
+        names = options["endpoint"] or list(ENDPOINTS)
+        overrides = {"SPARE_PART_LIST_CACHE_TIMEOUT": 0} if options["no_list_cache"] else {}
+
+        results = []
+        with override_settings(**overrides):
+            for name in names:
+                path = ENDPOINTS[name].format(part_id=part_id)
+                sync_result = self.run_sync(path, headers, options["requests"], options["concurrency"])
+                async_path = path.replace("/api/", "/api/async/", 1)
+                async_result = asyncio.run(
+                    self.run_async(async_path, headers, options["requests"], options["concurrency"])
+                )
+                results.append({"endpoint": name, "sync": sync_result, "async": async_result})
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+            return
+        self.stdout.write(f"{'接口':<14}{'模式':<7}{'req/s':>9}{'p50(ms)':>10}{'p95(ms)':>10}")
+        for result in results:
+            for mode in ("sync", "async"):
+                row = result[mode]
+                self.stdout.write(
+                    f"{result['endpoint']:<14}{mode:<7}{row['rps']:>9}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+                )
+
+    def run_sync(self, path, headers, total, concurrency):
+        def worker(count):
+            client = Client()
+            latencies = []
+            try:
+                for _ in range(count):
+                    started = time.perf_counter()
+                    response = client.get(path, headers=headers)
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        raise CommandError(f"{path} 返回 {response.status_code}")
+            finally:
+                connections.close_all()
+            return latencies
+
+        counts = [total // concurrency + (index < total % concurrency) for index in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = [value for values in executor.map(worker, counts) for value in values]
+        return summarize(latencies, time.perf_counter() - started)
+
+    async def run_async(self, path, headers, total, concurrency):
+        client = AsyncClient()
+        latencies = []
+
+        async def worker(count):
+            for _ in range(count):
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(f"{path} 返回 {response.status_code}")
+
+        counts = [total // concurrency + (index < total % concurrency) for index in range(concurrency)]
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(count) for count in counts if count))
+        return summarize(latencies, time.perf_counter() - started)
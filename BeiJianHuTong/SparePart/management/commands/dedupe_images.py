@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from SparePart.caching import invalidate_spare_part_lists
+from SparePart.models import SparePart
+from SparePart.storage import HASHED_NAME
+from SparePart.thumbnails import delete_thumbnails, generate_thumbnails
+
+
+class Command(BaseCommand):
+    """将已有备件图片迁移到内容寻址存储，合并重复文件"""
+
+    help = "将已有备件图片按内容摘要重新存储，重复文件只保留一份"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="只统计，不修改")
+
+    def handle(self, *args, **options):
+        field = SparePart._meta.get_field("image")
+        storage = field.storage
+        names = (
+            SparePart.objects.exclude(image="").exclude(image__isnull=True)
+            .order_by("image").values_list("image", flat=True).distinct()
+        )
+        legacy = [name for name in names.iterator() if not HASHED_NAME.search(name)]
+
+        missing = 0
+        targets = set()
+        for name in legacy:
+            if not storage.exists(name):
+                missing += 1
+                self.stderr.write(f"文件不存在，跳过: {name}")
+                continue
+            with storage.open(name, "rb") as file:
+                new_name = storage.hashed_name(name, storage.content_digest(file))
+                targets.add(new_name)
+                if options["dry_run"]:
+                    continue
+                storage.save(new_name, file)
+            parts = SparePart.objects.filter(image=name)
+            site_ids = set(parts.values_list("site_id", flat=True))
+            parts.update(image=new_name)
+            invalidate_spare_part_lists(site_ids)
+            delete_thumbnails(storage, name)
+            storage.delete(name)
+            generated = generate_thumbnails(field.attr_class(None, field, new_name))
+            SparePart.mark_thumbnails(new_name, generated is not None)
+
+        action = "待迁移" if options["dry_run"] else "已迁移"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {len(legacy) - missing} 个文件，去重后 {len(targets)} 个，缺失 {missing} 个"
+        ))
@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from SparePart.models import Category, SparePart, SparePartTransaction
+
+
+class Command(BaseCommand):
+    """打印各列表接口查询的 EXPLAIN 执行计划，用于在结构变更后检查索引是否命中"""
+
+    help = "打印备件、出入库、分类列表接口查询的 EXPLAIN 执行计划"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--site-id", type=int, default=1, help="场站ID")
+        parser.add_argument("--category-id", type=int, default=1, help="分类ID")
+        parser.add_argument("--status", default="active", help="备件状态")
+        parser.add_argument("--spare-part-id", type=int, default=1, help="备件ID")
+        parser.add_argument("--transaction-type", default="out", help="操作类型 in/out")
+        parser.add_argument("--days", type=int, default=30, help="出入库时间范围（天）")
+        parser.add_argument("--limit", type=int, default=20, help="每页数量")
+        parser.add_argument("--format", dest="explain_format", default=None, help="EXPLAIN 输出格式，如 json/tree")
+        parser.add_argument("--analyze", action="store_true", help="执行 EXPLAIN ANALYZE（会真正运行查询）")
+        parser.add_argument("--sql", action="store_true", help="同时打印 SQL 语句")
+
+    def get_queries(self, options):
+        """与各列表接口一致的查询（筛选条件取命令行参数）"""
+        limit = options["limit"]
+        since = timezone.now() - timedelta(days=options["days"])
+
+        spare_parts = SparePart.objects.select_related("site", "category", "created_by", "updated_by")
+
+        transactions = SparePartTransaction.objects.all()
+
+        return [
+            ("categories: is_active ORDER BY code",
+             Category.objects.filter(is_active=True)),
+            ("spare-parts: site + status",
+             spare_parts.filter(site_id=options["site_id"], status=options["status"])
+             .order_by("-is_alarm", "-created_at")[:limit]),
+            ("spare-parts: site + alarm",
+             spare_parts.filter(site_id=options["site_id"], is_alarm=True)
+             .order_by("-is_alarm", "-created_at")[:limit]),
+            ("spare-parts: category",
+             spare_parts.filter(category_id=options["category_id"])
+             .order_by("-is_alarm", "-created_at")[:limit]),
+            ("transactions: spare_part_id",
+             transactions.filter(spare_part_id=options["spare_part_id"])[:limit]),
+            ("transactions: transaction_type + created_at range",
+             transactions.filter(transaction_type=options["transaction_type"], created_at__gte=since)[:limit]),
+            ("transactions: created_at range",
+             transactions.filter(created_at__gte=since)[:limit]),
+        ]
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if options["explain_format"]:
+            explain_options["format"] = options["explain_format"]
+        if options["analyze"]:
+            explain_options["analyze"] = True
+
+        for title, queryset in self.get_queries(options):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {title}"))
+            if options["sql"]:
+                self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write("")
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from SparePart.caching import invalidate_spare_part_lists
+from SparePart.models import SparePart
+from SparePart.storage import HASHED_NAME
+from SparePart.thumbnails import THUMBNAIL_VARIANTS, generate_thumbnails, legacy_variant_name
+
+
+class Command(BaseCommand):
+    """为已有备件图片补生成缩略图，并记录缩略图是否可用"""
+
+    help = "为已有备件图片生成 small/medium/webp 缩略图（升级后需执行一次）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="重新生成已存在的缩略图")
+
+    def handle(self, *args, **options):
+        field = SparePart._meta.get_field("image")
+        storage = field.storage
+        names = (
+            SparePart.objects.exclude(image="").exclude(image__isnull=True)
+            .order_by("image").values_list("image", flat=True).distinct()
+        )
+        processed = generated = failed = 0
+        site_ids = set()
+        for name in names.iterator():
+            count = generate_thumbnails(field.attr_class(None, field, name), force=options["force"])
+            # 清理旧版命名（不含原图扩展名）的缩略图；摘要文件名不含下划线，旧名不会与现有缩略图重名
+            if HASHED_NAME.search(name):
+                for variant in THUMBNAIL_VARIANTS:
+                    storage.delete(legacy_variant_name(name, variant))
+            parts = SparePart.objects.filter(image=name)
+            site_ids.update(parts.values_list("site_id", flat=True))
+            SparePart.mark_thumbnails(name, count is not None)
+            processed += 1
+            if count is None:
+                failed += 1
+            else:
+                generated += count
+        invalidate_spare_part_lists(site_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"已处理 {processed} 张图片，生成 {generated} 个缩略图，无法解析 {failed} 张"
+        ))
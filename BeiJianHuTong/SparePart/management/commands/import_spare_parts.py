@@ -0,0 +1,41 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from sites.models import Site
+from SparePart.importer import IMPORT_BATCH_SIZE, SparePartImporter
+
+
+class Command(BaseCommand):
+    """从 CSV/XLSX 批量导入备件目录（按 名称+场站 upsert）"""
+
+    help = "从 CSV/XLSX 文件批量导入备件目录"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV 或 XLSX 文件路径")
+        parser.add_argument("--site-code", help="文件无 site_code 列时使用的场站代码")
+        parser.add_argument("--user", help="记录为创建人/更新人的用户名")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="每批 upsert 行数")
+
+    def handle(self, *args, **options):
+        default_site = None
+        if options["site_code"]:
+            default_site = Site.objects.filter(code=options["site_code"]).first()
+            if default_site is None:
+                raise CommandError(f"场站代码 {options['site_code']} 不存在")
+
+        user = None
+        if options["user"]:
+            user = get_user_model().objects.filter(username=options["user"]).first()
+            if user is None:
+                raise CommandError(f"用户 {options['user']} 不存在")
+
+        importer = SparePartImporter(user=user, default_site=default_site, batch_size=options["batch_size"])
+        try:
+            with open(options["path"], "rb") as file:
+                report = importer.run(file, options["path"])
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
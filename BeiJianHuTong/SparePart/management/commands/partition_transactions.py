@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from SparePart.models import SparePartTransaction
+from SparePart.partitions import PARTITION_MONTHS_AHEAD, add_future_partitions, supports_partitioning
+
+
+class Command(BaseCommand):
+    """为出入库流水表预建未来的月分区（仅 MySQL，建议每月定时执行）"""
+
+    help = "从 MAXVALUE 分区拆出未来几个月的月分区"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD, help="预建到几个月后")
+
+    def handle(self, *args, **options):
+        if not supports_partitioning(connection):
+            self.stdout.write("当前数据库不使用分区，无需处理")
+            return
+        created = add_future_partitions(connection, SparePartTransaction._meta.db_table, options["months_ahead"])
+        self.stdout.write(self.style.SUCCESS(
+            f"新增分区: {', '.join(created)}" if created else "分区已覆盖，无需新增"
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from SparePart.export import iterate_in_chunks
+from SparePart.models import SparePart
+from SparePart.search import SEARCH_FIELDS, index_parts, uses_fulltext
+
+
+class Command(BaseCommand):
+    """重建备件搜索倒排索引（MySQL 使用 FULLTEXT 索引，无需重建）"""
+
+    help = "按备件名称、型号、描述、供应商重建搜索词元表（SparePartSearchToken）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="每批处理的备件数")
+
+    def handle(self, *args, **options):
+        if uses_fulltext():
+            self.stdout.write("MySQL 使用 FULLTEXT ngram 索引，由数据库自动维护，无需重建")
+            return
+
+        rows = iterate_in_chunks(SparePart.objects.values_list("id", *SEARCH_FIELDS), options["batch_size"])
+        batch, parts, tokens = [], 0, 0
+        for row in rows:
+            batch.append(SparePart(id=row[0], **dict(zip(SEARCH_FIELDS, row[1:]))))
+            if len(batch) >= options["batch_size"]:
+                tokens += self.index(batch)
+                parts += len(batch)
+                batch = []
+        if batch:
+            tokens += self.index(batch)
+            parts += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"已索引 {parts} 个备件，{tokens} 个词元"))
+
+    @staticmethod
+    def index(batch):
+        with transaction.atomic():
+            return index_parts(batch)
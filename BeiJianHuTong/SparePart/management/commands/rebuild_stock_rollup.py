@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from SparePart.models import StockMovementDaily
+
+
+class Command(BaseCommand):
+    """按出入库流水回填或重建出入库日汇总表"""
+
+    help = "按出入库流水重建出入库日汇总（StockMovementDaily）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start-date", help="起始日期 YYYY-MM-DD（默认最早）")
+        parser.add_argument("--end-date", help="结束日期 YYYY-MM-DD（默认最新）")
+        parser.add_argument("--batch-size", type=int, default=1000, help="每批写入行数")
+
+    def handle(self, *args, **options):
+        start = self.parse(options["start_date"], "--start-date")
+        end = self.parse(options["end_date"], "--end-date")
+        created = StockMovementDaily.rebuild(start=start, end=end, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"已写入 {created} 条日汇总记录"))
+
+    @staticmethod
+    def parse(value, name):
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f"{name} 日期格式应为 YYYY-MM-DD")
+        return day
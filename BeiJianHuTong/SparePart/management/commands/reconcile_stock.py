@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from SparePart.reconcile import RECONCILE_BATCH_SIZE, LedgerReconciler
+
+
+class Command(BaseCommand):
+    """核对备件库存与出入库流水（期初结余 + 流水合计 + 已审核的流水外调整），输出 JSON 对账报告
+
+    未审核的调整记录（后台/接口改库存、导入）随备件列出，在后台“库存调整记录”中审核。
+    """
+
+    help = "核对 SparePart.quantity 与出入库流水，可选以流水为准修正"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repair", action="store_true",
+            help="以流水与调整记录为准修正 status 为 drift 的库存（pending、unexplained 只报告）",
+        )
+        parser.add_argument("--site-id", type=int, help="只核对指定场站")
+        parser.add_argument("--batch-size", type=int, default=RECONCILE_BATCH_SIZE, help="每批核对备件数")
+        parser.add_argument(
+            "--format", dest="report_format", choices=("json", "jsonl"), default="json",
+            help="json 输出单个报告；jsonl 每行一条不一致记录，最后一行为汇总",
+        )
+        parser.add_argument("--output", help="报告写入文件（默认标准输出）")
+        parser.add_argument("--fail-on-drift", action="store_true", help="存在不一致时以非零状态退出")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size 必须大于 0")
+
+        reconciler = LedgerReconciler(
+            repair=options["repair"], site_id=options["site_id"], batch_size=options["batch_size"]
+        )
+        output = open(options["output"], "w", encoding="utf-8") if options["output"] else None
+        write = output.write if output else self.stdout.write
+        try:
+            if options["report_format"] == "jsonl":
+                # 逐条写出，不一致记录再多也不积压在内存中
+                for item in reconciler.run():
+                    write(json.dumps(item, ensure_ascii=False) + "\n")
+                write(json.dumps({"summary": reconciler.summary()}, ensure_ascii=False) + "\n")
+            else:
+                items = list(reconciler.run())
+                write(json.dumps(
+                    {"summary": reconciler.summary(), "items": items}, ensure_ascii=False, indent=2
+                ) + "\n")
+        finally:
+            if output:
+                output.close()
+
+        if options["fail_on_drift"] and reconciler.drifted:
+            raise CommandError(f"{reconciler.drifted} 个备件库存与流水不一致")
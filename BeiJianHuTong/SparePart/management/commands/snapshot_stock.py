@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from SparePart.snapshots import (
+    SNAPSHOT_BATCH_SIZE, SNAPSHOT_INTERVALS, get_snapshot_interval, is_month_end, prune_snapshots, take_snapshots,
+)
+
+
+class Command(BaseCommand):
+    """记录全部备件的库存快照（建议每晚零点后定时执行，默认记录昨天结束时的库存）"""
+
+    help = "记录备件库存快照（StockSnapshot），并清理过期的每日快照"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--day", help="快照日期（YYYY-MM-DD），默认昨天")
+        parser.add_argument(
+            "--interval", choices=SNAPSHOT_INTERVALS,
+            help="daily 每天记录；monthly 只在月末记录（默认 STOCK_SNAPSHOT_INTERVAL）",
+        )
+        parser.add_argument("--site-id", type=int, help="只记录指定场站")
+        parser.add_argument("--batch-size", type=int, default=SNAPSHOT_BATCH_SIZE, help="每批读写行数")
+        parser.add_argument("--no-prune", action="store_true", help="不清理过期的每日快照")
+
+    def handle(self, *args, **options):
+        if options["day"]:
+            day = parse_date(options["day"])
+            if day is None:
+                raise CommandError("--day 日期格式应为 YYYY-MM-DD")
+        else:
+            day = timezone.localdate() - timedelta(days=1)
+
+        interval = options["interval"] or get_snapshot_interval()
+        if interval not in SNAPSHOT_INTERVALS:
+            raise CommandError(f"STOCK_SNAPSHOT_INTERVAL 可选: {', '.join(SNAPSHOT_INTERVALS)}")
+
+        if interval == 'monthly' and not is_month_end(day):
+            self.stdout.write(f"{day} 不是月末，跳过快照")
+        else:
+            written = take_snapshots(day, site_id=options["site_id"], batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"已记录 {written} 个备件 {day} 的库存快照"))
+
+        if not options["no_prune"]:
+            deleted = prune_snapshots()
+            if deleted:
+                self.stdout.write(f"已清理 {deleted} 条过期的每日快照")
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("SparePart", "0004_alter_sparepart_id_alter_sparepart_location"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(
+                fields=["is_active", "code"], name="category_active_code_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sparepart",
+            index=models.Index(
+                fields=["site", "status", "-created_at"],
+                name="sparepart_site_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sparepart",
+            index=models.Index(
+                fields=["category", "-created_at"], name="sparepart_category_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sparepart",
+            index=models.Index(fields=["-created_at"], name="sparepart_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="spareparttransaction",
+            index=models.Index(
+                fields=["spare_part", "-created_at"],
+                name="transaction_part_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="spareparttransaction",
+            index=models.Index(
+                fields=["transaction_type", "created_at"],
+                name="transaction_type_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="spareparttransaction",
+            index=models.Index(fields=["-created_at"], name="transaction_created_idx"),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:48
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_is_alarm(apps, schema_editor):
+    SparePart = apps.get_model("SparePart", "SparePart")
+    SparePart.objects.filter(quantity__lte=F("alarm_qty")).update(is_alarm=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("SparePart", "0005_category_category_active_code_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sparepart",
+            name="is_alarm",
+            field=models.BooleanField(
+                default=False, editable=False, verbose_name="库存告警"
+            ),
+        ),
+        migrations.RunPython(fill_is_alarm, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="sparepart",
+            index=models.Index(
+                fields=["site", "-is_alarm", "-created_at"],
+                name="sparepart_site_alarm_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sparepart",
+            index=models.Index(
+                fields=["-is_alarm", "-created_at"], name="sparepart_alarm_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def fill_daily_movements(apps, schema_editor):
+    SparePartTransaction = apps.get_model("SparePart", "SparePartTransaction")
+    StockMovementDaily = apps.get_model("SparePart", "StockMovementDaily")
+    rows = (
+        SparePartTransaction.objects.annotate(day=TruncDate("created_at"))
+        .order_by()
+        .values("spare_part_id", "spare_part__site_id", "day")
+        .annotate(
+            in_count=Count("id", filter=Q(transaction_type="in")),
+            in_qty=Coalesce(Sum("quantity", filter=Q(transaction_type="in")), 0),
+            out_count=Count("id", filter=Q(transaction_type="out")),
+            out_qty=Coalesce(Sum("quantity", filter=Q(transaction_type="out")), 0),
+        )
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=1000):
+        row["site_id"] = row.pop("spare_part__site_id")
+        batch.append(StockMovementDaily(**row))
+        if len(batch) >= 1000:
+            StockMovementDaily.objects.bulk_create(batch)
+            batch = []
+    StockMovementDaily.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("sites", "0001_initial"),
+        ("SparePart", "0006_sparepart_is_alarm"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockMovementDaily",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="日期")),
+                (
+                    "in_count",
+                    models.PositiveIntegerField(default=0, verbose_name="入库笔数"),
+                ),
+                (
+                    "in_qty",
+                    models.PositiveIntegerField(default=0, verbose_name="入库数量"),
+                ),
+                (
+                    "out_count",
+                    models.PositiveIntegerField(default=0, verbose_name="出库笔数"),
+                ),
+                (
+                    "out_qty",
+                    models.PositiveIntegerField(default=0, verbose_name="出库数量"),
+                ),
+                (
+                    "site",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_movements",
+                        to="sites.site",
+                        verbose_name="所属场站",
+                    ),
+                ),
+                (
+                    "spare_part",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_movements",
+                        to="SparePart.sparepart",
+                        verbose_name="备件",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "出入库日汇总",
+                "verbose_name_plural": "出入库日汇总",
+                "ordering": ["-day"],
+                "indexes": [
+                    models.Index(
+                        fields=["site", "day"], name="movement_daily_site_day_idx"
+                    ),
+                    models.Index(fields=["day"], name="movement_daily_day_idx"),
+                ],
+                "unique_together": {("spare_part", "day")},
+            },
+        ),
+        migrations.RunPython(fill_daily_movements, migrations.RunPython.noop),
+    ]
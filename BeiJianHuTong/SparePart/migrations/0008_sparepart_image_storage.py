@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:00
+
+import SparePart.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("SparePart", "0007_stockmovementdaily"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="sparepart",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                db_index=True,
+                null=True,
+                storage=SparePart.storage.get_image_storage,
+                upload_to="spare_parts/",
+                verbose_name="备件图片",
+            ),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from SparePart.search import FULLTEXT_INDEX_NAME, SEARCH_FIELDS, part_tokens
+
+
+def build_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    SparePart = apps.get_model("SparePart", "SparePart")
+    if connection.vendor == "mysql":
+        table = connection.ops.quote_name(SparePart._meta.db_table)
+        columns = ", ".join(connection.ops.quote_name(field) for field in SEARCH_FIELDS)
+        schema_editor.execute(
+            f"ALTER TABLE {table} ADD FULLTEXT INDEX {FULLTEXT_INDEX_NAME} ({columns}) WITH PARSER ngram"
+        )
+        return
+
+    SparePartSearchToken = apps.get_model("SparePart", "SparePartSearchToken")
+    batch = []
+    for part in SparePart.objects.values("id", *SEARCH_FIELDS).iterator(chunk_size=1000):
+        for token, weight in part_tokens(part).items():
+            batch.append(SparePartSearchToken(spare_part_id=part["id"], token=token, weight=weight))
+        if len(batch) >= 1000:
+            SparePartSearchToken.objects.bulk_create(batch)
+            batch = []
+    SparePartSearchToken.objects.bulk_create(batch)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "mysql":
+        table = connection.ops.quote_name(apps.get_model("SparePart", "SparePart")._meta.db_table)
+        schema_editor.execute(f"ALTER TABLE {table} DROP INDEX {FULLTEXT_INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("SparePart", "0008_sparepart_image_storage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SparePartSearchToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("token", models.CharField(max_length=64, verbose_name="词元")),
+                (
+                    "weight",
+                    models.PositiveSmallIntegerField(default=1, verbose_name="权重"),
+                ),
+                (
+                    "spare_part",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_tokens",
+                        to="SparePart.sparepart",
+                        verbose_name="备件",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "备件搜索词元",
+                "verbose_name_plural": "备件搜索词元",
+                "indexes": [
+                    models.Index(
+                        fields=["token", "spare_part"], name="search_token_idx"
+                    )
+                ],
+                "unique_together": {("spare_part", "token")},
+            },
+        ),
+        migrations.RunPython(build_search_index, drop_search_index),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("sites", "0001_initial"),
+        ("SparePart", "0009_sparepartsearchtoken"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SparePartForecast",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("daily_usage", models.FloatField(default=0, verbose_name="日均消耗")),
+                (
+                    "usage_std",
+                    models.FloatField(default=0, verbose_name="日消耗标准差"),
+                ),
+                (
+                    "lead_days",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="采购周期（天）"
+                    ),
+                ),
+                (
+                    "safety_stock",
+                    models.PositiveIntegerField(default=0, verbose_name="安全库存"),
+                ),
+                (
+                    "reorder_point",
+                    models.PositiveIntegerField(default=0, verbose_name="建议补货点"),
+                ),
+                (
+                    "days_to_stockout",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="预计可用天数"
+                    ),
+                ),
+                (
+                    "window_days",
+                    models.PositiveIntegerField(default=0, verbose_name="统计天数"),
+                ),
+                (
+                    "service_level",
+                    models.FloatField(default=0.95, verbose_name="服务水平"),
+                ),
+                ("computed_at", models.DateTimeField(verbose_name="计算时间")),
+                (
+                    "site",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="forecasts",
+                        to="sites.site",
+                        verbose_name="所属场站",
+                    ),
+                ),
+                (
+                    "spare_part",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="forecast",
+                        to="SparePart.sparepart",
+                        verbose_name="备件",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "备件消耗预测",
+                "verbose_name_plural": "备件消耗预测",
+                "indexes": [
+                    models.Index(
+                        fields=["site", "days_to_stockout"],
+                        name="forecast_site_stockout_idx",
+                    ),
+                    models.Index(
+                        fields=["days_to_stockout"], name="forecast_stockout_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
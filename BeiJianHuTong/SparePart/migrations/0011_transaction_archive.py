@@ -0,0 +1,141 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+from SparePart.partitions import (
+    PARTITION_MONTHS_AHEAD, add_months, partition_table, supports_partitioning, unpartition_table,
+)
+
+
+def partition_transactions(apps, schema_editor):
+    if not supports_partitioning(schema_editor.connection):
+        return
+    SparePartTransaction = apps.get_model("SparePart", "SparePartTransaction")
+    today = timezone.now().date()
+    earliest = SparePartTransaction.objects.order_by("created_at").values_list("created_at", flat=True).first()
+    first_month = (earliest.date() if earliest else today).replace(day=1)
+    last_month = add_months(today.replace(day=1), PARTITION_MONTHS_AHEAD)
+    partition_table(schema_editor, SparePartTransaction._meta.db_table, first_month, last_month)
+
+
+def unpartition_transactions(apps, schema_editor):
+    """回滚：取消分区（MySQL REMOVE PARTITIONING），恢复主键与外键"""
+    if not supports_partitioning(schema_editor.connection):
+        return
+    unpartition_table(schema_editor, apps.get_model("SparePart", "SparePartTransaction"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("SparePart", "0010_sparepartforecast"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SparePartOpeningBalance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("as_of", models.DateTimeField(verbose_name="结余截止时间")),
+                (
+                    "in_count",
+                    models.PositiveIntegerField(default=0, verbose_name="入库笔数"),
+                ),
+                (
+                    "in_qty",
+                    models.PositiveBigIntegerField(default=0, verbose_name="入库数量"),
+                ),
+                (
+                    "out_count",
+                    models.PositiveIntegerField(default=0, verbose_name="出库笔数"),
+                ),
+                (
+                    "out_qty",
+                    models.PositiveBigIntegerField(default=0, verbose_name="出库数量"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+                (
+                    "spare_part",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="opening_balance",
+                        to="SparePart.sparepart",
+                        verbose_name="备件",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "备件期初结余",
+                "verbose_name_plural": "备件期初结余",
+            },
+        ),
+        migrations.CreateModel(
+            name="SparePartTransactionArchive",
+            fields=[
+                (
+                    "id",
+                    models.BigIntegerField(
+                        primary_key=True, serialize=False, verbose_name="原记录ID"
+                    ),
+                ),
+                (
+                    "transaction_type",
+                    models.CharField(
+                        choices=[("in", "入库"), ("out", "出库")],
+                        max_length=10,
+                        verbose_name="操作类型",
+                    ),
+                ),
+                ("quantity", models.PositiveIntegerField(verbose_name="数量")),
+                ("reason", models.CharField(max_length=200, verbose_name="操作原因")),
+                ("remark", models.TextField(blank=True, verbose_name="备注")),
+                ("created_at", models.DateTimeField(verbose_name="操作时间")),
+                (
+                    "operator",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="操作人",
+                    ),
+                ),
+                (
+                    "spare_part",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_transactions",
+                        to="SparePart.sparepart",
+                        verbose_name="备件",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "已归档出入库记录",
+                "verbose_name_plural": "已归档出入库记录",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["spare_part", "-created_at"],
+                        name="archive_part_created_idx",
+                    ),
+                    models.Index(fields=["-created_at"], name="archive_created_idx"),
+                ],
+            },
+        ),
+        migrations.RunPython(partition_transactions, unpartition_transactions),
+    ]
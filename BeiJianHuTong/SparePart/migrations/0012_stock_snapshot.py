@@ -0,0 +1,66 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("sites", "0001_initial"),
+        ("SparePart", "0011_transaction_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="快照日期")),
+                ("taken_at", models.DateTimeField(verbose_name="快照时点")),
+                ("quantity", models.IntegerField(verbose_name="库存数量")),
+                (
+                    "is_month_end",
+                    models.BooleanField(default=False, verbose_name="是否月末快照"),
+                ),
+                (
+                    "site",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_snapshots",
+                        to="sites.site",
+                        verbose_name="所属场站",
+                    ),
+                ),
+                (
+                    "spare_part",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="snapshots",
+                        to="SparePart.sparepart",
+                        verbose_name="备件",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "备件库存快照",
+                "verbose_name_plural": "备件库存快照",
+                "indexes": [
+                    models.Index(
+                        fields=["spare_part", "-taken_at"],
+                        name="snapshot_part_taken_idx",
+                    ),
+                    models.Index(fields=["site", "day"], name="snapshot_site_day_idx"),
+                    models.Index(fields=["day"], name="snapshot_day_idx"),
+                ],
+                "unique_together": {("spare_part", "day")},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("SparePart", "0012_stock_snapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sparepart",
+            name="stock_adjustment",
+            field=models.IntegerField(
+                default=0, editable=False, verbose_name="流水外库存调整"
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("SparePart", "0013_stock_adjustment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sparepart",
+            name="has_thumbnails",
+            field=models.BooleanField(
+                default=False, editable=False, verbose_name="已生成缩略图"
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from SparePart.search import SEARCH_FIELDS, part_tokens
+
+
+def rebuild_search_index(apps, schema_editor):
+    """倒排索引改为同时收录汉字单字，按新切分重建（MySQL 使用 FULLTEXT，无需处理）"""
+    if schema_editor.connection.vendor == "mysql":
+        return
+    SparePart = apps.get_model("SparePart", "SparePart")
+    SparePartSearchToken = apps.get_model("SparePart", "SparePartSearchToken")
+    SparePartSearchToken.objects.all().delete()
+    batch = []
+    for part in SparePart.objects.values("id", *SEARCH_FIELDS).iterator(chunk_size=1000):
+        for token, weight in part_tokens(part).items():
+            batch.append(SparePartSearchToken(spare_part_id=part["id"], token=token, weight=weight))
+        if len(batch) >= 1000:
+            SparePartSearchToken.objects.bulk_create(batch)
+            batch = []
+    SparePartSearchToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("SparePart", "0014_has_thumbnails"),
+    ]
+
+    operations = [
+        # 回滚时保留单字词元：旧版查询不会用到它们，不影响结果
+        migrations.RunPython(rebuild_search_index, migrations.RunPython.noop),
+    ]
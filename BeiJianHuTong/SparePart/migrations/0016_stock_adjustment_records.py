@@ -0,0 +1,135 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:10
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q, Sum
+import django.db.models.deletion
+
+
+def record_baseline_adjustments(apps, schema_editor):
+    """上线前的库存与流水差额（初始库存及历史直接修改）记为待审核的调整，对账时报告而不是直接认可"""
+    SparePart = apps.get_model("SparePart", "SparePart")
+    SparePartTransaction = apps.get_model("SparePart", "SparePartTransaction")
+    SparePartOpeningBalance = apps.get_model("SparePart", "SparePartOpeningBalance")
+    StockAdjustment = apps.get_model("SparePart", "StockAdjustment")
+    SparePart.objects.update(stock_adjustment=0)
+    last_pk = 0
+    while True:
+        parts = list(
+            SparePart.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", "quantity")[:1000]
+        )
+        if not parts:
+            return
+        last_pk = parts[-1][0]
+        ids = [pk for pk, _ in parts]
+        net = {pk: 0 for pk in ids}
+        for pk, in_qty, out_qty in SparePartOpeningBalance.objects.filter(spare_part_id__in=ids).values_list(
+            "spare_part_id", "in_qty", "out_qty"
+        ):
+            net[pk] += in_qty - out_qty
+        ledger = (
+            SparePartTransaction.objects.filter(spare_part_id__in=ids)
+            .order_by().values("spare_part_id")
+            .annotate(
+                in_qty=Sum("quantity", filter=Q(transaction_type="in")),
+                out_qty=Sum("quantity", filter=Q(transaction_type="out")),
+            )
+        )
+        for row in ledger:
+            net[row["spare_part_id"]] += int(row["in_qty"] or 0) - int(row["out_qty"] or 0)
+        StockAdjustment.objects.bulk_create([
+            StockAdjustment(spare_part_id=pk, delta=quantity - net[pk], source="baseline")
+            for pk, quantity in parts if quantity != net[pk]
+        ])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("SparePart", "0015_search_unigrams"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockAdjustment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("delta", models.IntegerField(verbose_name="调整数量")),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[
+                            ("initial", "初始数量"),
+                            ("edit", "编辑"),
+                            ("import", "导入"),
+                            ("baseline", "上线前差额"),
+                        ],
+                        max_length=20,
+                        verbose_name="来源",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="调整时间"),
+                ),
+                ("approved", models.BooleanField(default=False, verbose_name="已审核")),
+                (
+                    "reviewed_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="审核时间"
+                    ),
+                ),
+                (
+                    "operator",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="stock_adjustments",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="操作人",
+                    ),
+                ),
+                (
+                    "reviewed_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="reviewed_stock_adjustments",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="审核人",
+                    ),
+                ),
+                (
+                    "spare_part",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_adjustments",
+                        to="SparePart.sparepart",
+                        verbose_name="备件",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "库存调整记录",
+                "verbose_name_plural": "库存调整记录",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["spare_part", "approved"],
+                        name="adjustment_part_approved_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(record_baseline_adjustments, migrations.RunPython.noop),
+    ]
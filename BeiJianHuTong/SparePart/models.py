@@ -1,6 +1,16 @@
-from django.db import models
+from collections import defaultdict
+from itertools import chain
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Q, Count, Sum
+from django.db.models.functions import Coalesce, TruncDate
 from django.utils import timezone
 
+from .caching import invalidate_spare_part_lists
+from .storage import get_image_storage
+from .thumbnails import delete_thumbnails, generate_thumbnails
+
 # Create your models here.
 
 class Category(models.Model):
@@ -19,6 +29,10 @@ class Category(models.Model):
         verbose_name = "备件分类"
         verbose_name_plural = "备件分类"
         ordering = ['code']
+        indexes = [
+            # CategoryViewSet.list: is_active=True ORDER BY code
+            models.Index(fields=['is_active', 'code'], name='category_active_code_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -58,8 +72,21 @@ class SparePart(models.Model):
     
     quantity = models.PositiveIntegerField(default=0, verbose_name="当前数量")
     alarm_qty = models.PositiveIntegerField(default=5, verbose_name="库存预警数量")  # 新增
+    # 库存告警标记（quantity <= alarm_qty），随 save() 同步落库，供告警优先排序走索引
+    is_alarm = models.BooleanField(default=False, editable=False, verbose_name="库存告警")
+    # 不经出入库流水设置的库存净额（创建时的初始数量、接口/后台编辑、导入），对账时计入应有库存
+    stock_adjustment = models.IntegerField(default=0, editable=False, verbose_name="流水外库存调整")
     location = models.CharField(max_length=200, blank=True, default='', verbose_name="备件位置")
-    image = models.ImageField(upload_to='spare_parts/', blank=True, null=True, verbose_name="备件图片")
+    image = models.ImageField(
+        upload_to='spare_parts/',
+        storage=get_image_storage,  # 按内容摘要去重存储
+        blank=True,
+        null=True,
+        db_index=True,  # 删除/替换图片时统计引用数
+        verbose_name="备件图片"
+    )
+    # 缩略图已生成；未生成（图片无法解析或尚未补生成）时列表返回原图地址
+    has_thumbnails = models.BooleanField(default=False, editable=False, verbose_name="已生成缩略图")
     
     # 供应商信息
     supplier = models.CharField(max_length=100, blank=True, verbose_name="供应商名称")  # 新增
@@ -111,9 +138,115 @@ class SparePart(models.Model):
         verbose_name_plural = "备件管理"
         ordering = ['site', 'name']
         unique_together = ['name', 'site']
+        indexes = [
+            # SparePartViewSet.list: 按场站/状态/分类筛选，按创建时间倒序
+            models.Index(fields=['site', 'status', '-created_at'], name='sparepart_site_status_idx'),
+            models.Index(fields=['category', '-created_at'], name='sparepart_category_idx'),
+            models.Index(fields=['-created_at'], name='sparepart_created_idx'),
+            # 告警优先排序：ORDER BY is_alarm DESC, created_at DESC
+            models.Index(fields=['site', '-is_alarm', '-created_at'], name='sparepart_site_alarm_idx'),
+            models.Index(fields=['-is_alarm', '-created_at'], name='sparepart_alarm_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.quantity}个) - {self.site.name}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_quantity = instance.__dict__.get('quantity')
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
+
+    def save(self, *args, from_ledger=False, **kwargs):
+        """保存时同步库存告警标记，新上传图片时生成缩略图，替换或清除图片后释放原图
+
+        出入库以外的保存（from_ledger=False）：新建时初始数量直接计入 stock_adjustment；
+        编辑库存时差额记为待审核的 StockAdjustment，审核通过前对账会报告该备件。
+        """
+        self.is_alarm = self.quantity <= self.alarm_qty
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'quantity', 'alarm_qty'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'is_alarm'}
+        adjustment = None
+        if not from_ledger and (update_fields is None or 'quantity' in update_fields):
+            adjustment = self.track_stock_adjustment()
+        saves_image = update_fields is None or 'image' in update_fields
+        new_image = saves_image and bool(self.image) and not self.image._committed
+        cleared_image = saves_image and not self.image and getattr(self, '_loaded_image', True)
+        old_image = None
+        if new_image or cleared_image:
+            self.has_thumbnails = False
+            if update_fields is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'has_thumbnails'}
+        if (new_image or cleared_image) and self.pk:
+            old_image = SparePart.objects.filter(pk=self.pk).values_list('image', flat=True).first()
+        super().save(*args, **kwargs)
+        self._loaded_quantity = self.quantity
+        if adjustment is not None:
+            adjustment.spare_part = self
+            adjustment.save()
+        if saves_image:
+            self._loaded_image = self.image.name or None
+        if new_image:
+            if generate_thumbnails(self.image) is not None:
+                self.has_thumbnails = True
+                SparePart.mark_thumbnails(self.image.name)
+            name, content = self.image.name, self.image.file
+            transaction.on_commit(lambda: SparePart.restore_image(name, content))
+        if old_image and old_image != self.image.name:
+            transaction.on_commit(lambda: SparePart.release_image(old_image))
+
+    def track_stock_adjustment(self):
+        """返回本次保存对应的流水外调整记录（无调整时返回 None）
+
+        新建时初始数量即流水外库存，直接计入 stock_adjustment 并记为已审核；
+        编辑时以库中当前值为准计算差额，记为待审核，stock_adjustment 不变。
+        """
+        if self._state.adding:
+            self.stock_adjustment = self.quantity
+            if not self.quantity:
+                return None
+            return StockAdjustment(
+                delta=self.quantity, source='initial', operator_id=self.created_by_id, approved=True
+            )
+        quantity = SparePart.objects.filter(pk=self.pk).values_list('quantity', flat=True).first()
+        # 未改动库存时不计差额（实例读取后的出入库会被覆盖，由对账报告为不一致）
+        edited = quantity is not None and self.quantity != getattr(self, '_loaded_quantity', quantity)
+        if not edited or self.quantity == quantity:
+            return None
+        return StockAdjustment(delta=self.quantity - quantity, source='edit', operator_id=self.updated_by_id)
+    
+    @classmethod
+    def restore_image(cls, name, content):
+        """上传提交后复查文件仍在
+
+        相同内容的文件已存在时上传不会重新写入；若此前另一事务提交的 release_image
+        在本次上传提交前判定无引用并删除了文件，这里按上传内容重新写入并补齐缩略图。
+        """
+        image = cls(image=name).image
+        if not image.storage.exists(name):
+            image.storage.save(name, content)
+        if generate_thumbnails(image) is not None:
+            cls.mark_thumbnails(name)
+
+    @classmethod
+    def mark_thumbnails(cls, name, generated=True):
+        """记录引用该图片的全部备件缩略图是否可用（列表项含缩略图地址，所在场站的列表缓存随之失效）"""
+        parts = cls.objects.filter(image=name).exclude(has_thumbnails=generated)
+        site_ids = set(parts.values_list('site_id', flat=True))
+        if site_ids:
+            parts.update(has_thumbnails=generated)
+            invalidate_spare_part_lists(site_ids)
+
+    @classmethod
+    def release_image(cls, name):
+        """图片文件不再被任何备件引用时，删除文件及其缩略图"""
+        if not name or cls.objects.filter(image=name).exists():
+            return
+        storage = cls._meta.get_field('image').storage
+        delete_thumbnails(storage, name)
+        storage.delete(name)
 
 
 class SparePartTransaction(models.Model):
@@ -159,23 +292,461 @@ class SparePartTransaction(models.Model):
         verbose_name = "备件出入库记录"
         verbose_name_plural = "备件出入库记录"
         ordering = ['-created_at']
+        indexes = [
+            # SparePartTransactionViewSet.list / by_spare_part / statistics
+            models.Index(fields=['spare_part', '-created_at'], name='transaction_part_created_idx'),
+            models.Index(fields=['transaction_type', 'created_at'], name='transaction_type_created_idx'),
+            models.Index(fields=['-created_at'], name='transaction_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.spare_part.name} {self.get_transaction_type_display()} {self.quantity}个"
     
+    def clean(self):
+        """出库数量不能超过当前库存（表单校验用，最终以 save() 加锁后的判断为准）"""
+        super().clean()
+        if (
+            not self.pk
+            and self.transaction_type == 'out'
+            and self.spare_part_id
+            and self.quantity is not None
+            and self.quantity > self.spare_part.quantity
+        ):
+            raise ValidationError(
+                {'quantity': f"库存不足：当前库存 {self.spare_part.quantity}，出库 {self.quantity}"}
+            )
+    
+    # 决定日汇总行及其计数的字段
+    ROLLUP_FIELDS = ('spare_part_id', 'transaction_type', 'quantity', 'created_at')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rollup = tuple(instance.__dict__.get(name) for name in cls.ROLLUP_FIELDS)
+        return instance
+
     def save(self, *args, **kwargs):
-        """保存时更新备件库存数量和最后使用日期"""
-        if not self.pk:  # 只在创建时执行
+        """保存时更新备件库存数量和最后使用日期
+
+        在事务中对备件行加锁（SELECT ... FOR UPDATE）后再读改写库存，
+        并发出入库不会丢失更新；库存不足时抛出 ValidationError。
+        修改已有记录的备件、类型、数量或时间时，从原日汇总行扣回旧值再累加新值。
+        """
+        if self.pk:
+            with transaction.atomic():
+                previous = self.previous_rollup()
+                super().save(*args, **kwargs)
+                current = tuple(getattr(self, name) for name in self.ROLLUP_FIELDS)
+                if previous is not None and previous != current:
+                    StockMovementDaily.record(
+                        SparePartTransaction(**dict(zip(self.ROLLUP_FIELDS, previous))), sign=-1
+                    )
+                    StockMovementDaily.record(self)
+                self._loaded_rollup = current
+            return
+        
+        with transaction.atomic():
+            spare_part = SparePart.objects.select_for_update().get(pk=self.spare_part_id)
             if self.transaction_type == 'in':
-                self.spare_part.quantity += self.quantity
-                self.spare_part.last_purchase_date = timezone.now()  # 更新最后采购日期
+                spare_part.quantity += self.quantity
+                spare_part.last_purchase_date = timezone.now()  # 更新最后采购日期
             elif self.transaction_type == 'out':
-                self.spare_part.quantity -= self.quantity
-                self.spare_part.last_use_date = timezone.now()  # 更新最后使用日期
+                if self.quantity > spare_part.quantity:
+                    raise ValidationError(
+                        {'quantity': f"库存不足：当前库存 {spare_part.quantity}，出库 {self.quantity}"}
+                    )
+                spare_part.quantity -= self.quantity
+                spare_part.last_use_date = timezone.now()  # 更新最后使用日期
             
-            self.spare_part.save(update_fields=['quantity', 'last_purchase_date', 'last_use_date'])
+            spare_part.save(
+                update_fields=['quantity', 'last_purchase_date', 'last_use_date', 'updated_at'], from_ledger=True
+            )
+            self.spare_part = spare_part
+            super().save(*args, **kwargs)
+            StockMovementDaily.record(self)  # 增量更新日汇总
+            self._loaded_rollup = tuple(getattr(self, name) for name in self.ROLLUP_FIELDS)
+
+    def previous_rollup(self):
+        """库中该记录的汇总字段值（实例由查询读出时直接取读出值）"""
+        if hasattr(self, '_loaded_rollup'):
+            return self._loaded_rollup
+        return SparePartTransaction.objects.filter(pk=self.pk).values_list(*self.ROLLUP_FIELDS).first()
+
+
+class SparePartTransactionArchive(models.Model):
+    """已归档的出入库记录
+
+    由 archive_transactions 命令从 SparePartTransaction 迁入，保留原 ID 与字段名，
+    可直接用出入库记录序列化器输出。归档前已折叠进 SparePartOpeningBalance。
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name="原记录ID")
+    spare_part = models.ForeignKey(
+        SparePart,
+        on_delete=models.CASCADE,
+        related_name='archived_transactions',
+        verbose_name="备件"
+    )
+    transaction_type = models.CharField(
+        max_length=10,
+        choices=SparePartTransaction.TRANSACTION_TYPE_CHOICES,
+        verbose_name="操作类型"
+    )
+    quantity = models.PositiveIntegerField(verbose_name="数量")
+    operator = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name="操作人"
+    )
+    reason = models.CharField(max_length=200, verbose_name="操作原因")
+    remark = models.TextField(blank=True, verbose_name="备注")
+    created_at = models.DateTimeField(verbose_name="操作时间")
+
+    class Meta:
+        verbose_name = "已归档出入库记录"
+        verbose_name_plural = "已归档出入库记录"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['spare_part', '-created_at'], name='archive_part_created_idx'),
+            models.Index(fields=['-created_at'], name='archive_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.spare_part_id} {self.get_transaction_type_display()} {self.quantity}个"
+
+
+class SparePartOpeningBalance(models.Model):
+    """期初结余：已归档流水按备件折叠后的累计出入库
+
+    as_of 之前的流水都已归档，库存 = 期初净额 + as_of 之后流水的净额（不含初始库存）。
+    """
+    spare_part = models.OneToOneField(
+        SparePart,
+        on_delete=models.CASCADE,
+        related_name='opening_balance',
+        verbose_name="备件"
+    )
+    as_of = models.DateTimeField(verbose_name="结余截止时间")
+    in_count = models.PositiveIntegerField(default=0, verbose_name="入库笔数")
+    in_qty = models.PositiveBigIntegerField(default=0, verbose_name="入库数量")
+    out_count = models.PositiveIntegerField(default=0, verbose_name="出库笔数")
+    out_qty = models.PositiveBigIntegerField(default=0, verbose_name="出库数量")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "备件期初结余"
+        verbose_name_plural = "备件期初结余"
+
+    def __str__(self):
+        return f"{self.spare_part_id} 截至{self.as_of:%Y-%m-%d} 净额{self.net_quantity}"
+
+    @property
+    def net_quantity(self):
+        return self.in_qty - self.out_qty
+
+
+class StockAdjustment(models.Model):
+    """流水外的库存调整记录（初始数量、接口/后台编辑、导入、上线前差额）
+
+    初始数量自动审核；其余记录审核通过后才计入 SparePart.stock_adjustment，
+    对账时未审核的记录会随备件一起报告。
+    """
+
+    SOURCE_CHOICES = [
+        ('initial', '初始数量'),
+        ('edit', '编辑'),
+        ('import', '导入'),
+        ('baseline', '上线前差额'),
+    ]
+
+    spare_part = models.ForeignKey(
+        SparePart,
+        on_delete=models.CASCADE,
+        related_name='stock_adjustments',
+        verbose_name="备件"
+    )
+    delta = models.IntegerField(verbose_name="调整数量")
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, verbose_name="来源")
+    operator = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_adjustments',
+        verbose_name="操作人"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="调整时间")
+    approved = models.BooleanField(default=False, verbose_name="已审核")
+    reviewed_by = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reviewed_stock_adjustments',
+        verbose_name="审核人"
+    )
+    reviewed_at = models.DateTimeField(null=True, blank=True, verbose_name="审核时间")
+
+    class Meta:
+        verbose_name = "库存调整记录"
+        verbose_name_plural = "库存调整记录"
+        ordering = ['-created_at']
+        indexes = [
+            # 对账：按备件查未审核的调整
+            models.Index(fields=['spare_part', 'approved'], name='adjustment_part_approved_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.spare_part_id} {self.get_source_display()} {self.delta:+d}"
+
+    @classmethod
+    def approve(cls, adjustments, user=None):
+        """审核通过：调整额计入备件 stock_adjustment，返回审核的记录数"""
+        with transaction.atomic():
+            pending = list(
+                adjustments.filter(approved=False).select_for_update().values_list('pk', 'spare_part_id', 'delta')
+            )
+            deltas = defaultdict(int)
+            for _, part_id, delta in pending:
+                deltas[part_id] += delta
+            for part_id, delta in deltas.items():
+                SparePart.objects.filter(pk=part_id).update(stock_adjustment=F('stock_adjustment') + delta)
+            cls.objects.filter(pk__in=[pk for pk, _, _ in pending]).update(
+                approved=True, reviewed_by=user, reviewed_at=timezone.now()
+            )
+        return len(pending)
+
+
+class StockMovementDaily(models.Model):
+    """备件出入库日汇总（每个备件每天一行），报表统计读此表而不扫描流水"""
+    
+    spare_part = models.ForeignKey(
+        SparePart,
+        on_delete=models.CASCADE,
+        related_name='daily_movements',
+        verbose_name="备件"
+    )
+    site = models.ForeignKey(
+        'sites.Site',
+        on_delete=models.CASCADE,
+        related_name='daily_movements',
+        verbose_name="所属场站"
+    )
+    day = models.DateField(verbose_name="日期")
+    
+    in_count = models.PositiveIntegerField(default=0, verbose_name="入库笔数")
+    in_qty = models.PositiveIntegerField(default=0, verbose_name="入库数量")
+    out_count = models.PositiveIntegerField(default=0, verbose_name="出库笔数")
+    out_qty = models.PositiveIntegerField(default=0, verbose_name="出库数量")
+    
+    class Meta:
+        verbose_name = "出入库日汇总"
+        verbose_name_plural = "出入库日汇总"
+        ordering = ['-day']
+        unique_together = ['spare_part', 'day']
+        indexes = [
+            models.Index(fields=['site', 'day'], name='movement_daily_site_day_idx'),
+            models.Index(fields=['day'], name='movement_daily_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.spare_part_id} {self.day} 入{self.in_qty} 出{self.out_qty}"
+    
+    @classmethod
+    def record(cls, movement, sign=1):
+        """将一条出入库记录累加到所在日期的汇总行（数据库端 F() 累加）
+
+        sign=-1 时从汇总行扣回该记录（出入库记录被修改或删除）。
+        """
+        if movement.transaction_type == 'in':
+            counters = {'in_count': sign, 'in_qty': sign * movement.quantity}
+        elif movement.transaction_type == 'out':
+            counters = {'out_count': sign, 'out_qty': sign * movement.quantity}
+        else:
+            return
         
-        super().save(*args, **kwargs)
+        day = timezone.localdate(movement.created_at)
+        increments = {name: F(name) + value for name, value in counters.items()}
+        rows = cls.objects.filter(spare_part_id=movement.spare_part_id, day=day)
+        if rows.update(**increments) or sign < 0:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    spare_part_id=movement.spare_part_id,
+                    site_id=movement.spare_part.site_id,
+                    day=day,
+                    **counters
+                )
+        except IntegrityError:
+            # 并发下另一请求已创建该日汇总行
+            rows.update(**increments)
+    
+    @classmethod
+    def record_many(cls, movements, day):
+        """批量累加同一天的出入库记录（调用方需已锁定相关备件行）"""
+        counters = defaultdict(lambda: {'in_count': 0, 'in_qty': 0, 'out_count': 0, 'out_qty': 0})
+        site_ids = {}
+        for movement in movements:
+            row = counters[movement.spare_part_id]
+            row[f'{movement.transaction_type}_count'] += 1
+            row[f'{movement.transaction_type}_qty'] += movement.quantity
+            site_ids[movement.spare_part_id] = movement.spare_part.site_id
+        if not counters:
+            return
+        
+        existing = cls.objects.filter(spare_part_id__in=counters, day=day)
+        updated = []
+        for summary in existing:
+            for name, value in counters.pop(summary.spare_part_id).items():
+                setattr(summary, name, getattr(summary, name) + value)
+            updated.append(summary)
+        cls.objects.bulk_update(updated, ['in_count', 'in_qty', 'out_count', 'out_qty'])
+        cls.objects.bulk_create([
+            cls(spare_part_id=part_id, site_id=site_ids[part_id], day=day, **row)
+            for part_id, row in counters.items()
+        ])
+    
+    @classmethod
+    def rebuild(cls, start=None, end=None, batch_size=1000):
+        """按出入库流水重建 [start, end] 日期范围内的汇总（不传则全部重建），返回写入行数
+
+        已归档的流水一并统计；归档边界为本地时间零点，同一天的流水不会分属两张表。
+        """
+        existing = cls.objects.all()
+        if start:
+            existing = existing.filter(day__gte=start)
+        if end:
+            existing = existing.filter(day__lte=end)
+
+        def grouped(model):
+            movements = model.objects.annotate(day=TruncDate('created_at'))
+            if start:
+                movements = movements.filter(day__gte=start)
+            if end:
+                movements = movements.filter(day__lte=end)
+            return (
+                movements.order_by()
+                .values('spare_part_id', 'spare_part__site_id', 'day')
+                .annotate(
+                    in_count=Count('id', filter=Q(transaction_type='in')),
+                    in_qty=Coalesce(Sum('quantity', filter=Q(transaction_type='in')), 0),
+                    out_count=Count('id', filter=Q(transaction_type='out')),
+                    out_qty=Coalesce(Sum('quantity', filter=Q(transaction_type='out')), 0),
+                )
+                .iterator(chunk_size=batch_size)
+            )
+
+        created = 0
+        with transaction.atomic():
+            existing.delete()
+            batch = []
+            for row in chain(grouped(SparePartTransactionArchive), grouped(SparePartTransaction)):
+                site_id = row.pop('spare_part__site_id')
+                batch.append(cls(site_id=site_id, **row))
+                if len(batch) >= batch_size:
+                    created += len(cls.objects.bulk_create(batch))
+                    batch = []
+            if batch:
+                created += len(cls.objects.bulk_create(batch))
+        return created
+
+class SparePartSearchToken(models.Model):
+    """备件搜索倒排索引
+
+    MySQL 使用 FULLTEXT ngram 索引，不写入本表；其他数据库由 SparePart.search 维护。
+    每个词元一行，weight 为该词元所在字段的最高权重。
+    """
+    spare_part = models.ForeignKey(
+        SparePart,
+        on_delete=models.CASCADE,
+        related_name='search_tokens',
+        verbose_name="备件"
+    )
+    token = models.CharField(max_length=64, verbose_name="词元")
+    weight = models.PositiveSmallIntegerField(default=1, verbose_name="权重")
+
+    class Meta:
+        verbose_name = "备件搜索词元"
+        verbose_name_plural = "备件搜索词元"
+        unique_together = ['spare_part', 'token']
+        indexes = [
+            models.Index(fields=['token', 'spare_part'], name='search_token_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.spare_part_id} {self.token}"
+
+
+class SparePartForecast(models.Model):
+    """备件消耗预测（由 forecast_stock 命令按出入库日汇总批量计算）"""
+    spare_part = models.OneToOneField(
+        SparePart,
+        on_delete=models.CASCADE,
+        related_name='forecast',
+        verbose_name="备件"
+    )
+    site = models.ForeignKey(
+        'sites.Site',
+        on_delete=models.CASCADE,
+        related_name='forecasts',
+        verbose_name="所属场站"
+    )
+    daily_usage = models.FloatField(default=0, verbose_name="日均消耗")
+    usage_std = models.FloatField(default=0, verbose_name="日消耗标准差")
+    lead_days = models.PositiveIntegerField(default=0, verbose_name="采购周期（天）")
+    safety_stock = models.PositiveIntegerField(default=0, verbose_name="安全库存")
+    reorder_point = models.PositiveIntegerField(default=0, verbose_name="建议补货点")
+    days_to_stockout = models.FloatField(null=True, blank=True, verbose_name="预计可用天数")  # 无消耗时为空
+    window_days = models.PositiveIntegerField(default=0, verbose_name="统计天数")
+    service_level = models.FloatField(default=0.95, verbose_name="服务水平")
+    computed_at = models.DateTimeField(verbose_name="计算时间")
+
+    class Meta:
+        verbose_name = "备件消耗预测"
+        verbose_name_plural = "备件消耗预测"
+        indexes = [
+            models.Index(fields=['site', 'days_to_stockout'], name='forecast_site_stockout_idx'),
+            models.Index(fields=['days_to_stockout'], name='forecast_stockout_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.spare_part_id} 补货点{self.reorder_point}"
+
+
+class StockSnapshot(models.Model):
+    """备件库存快照（由 snapshot_stock 命令每晚/每月末记录），时点库存查询从最近的快照起回放"""
+    spare_part = models.ForeignKey(
+        SparePart,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+        verbose_name="备件"
+    )
+    site = models.ForeignKey(
+        'sites.Site',
+        on_delete=models.CASCADE,
+        related_name='stock_snapshots',
+        verbose_name="所属场站"
+    )
+    day = models.DateField(verbose_name="快照日期")
+    taken_at = models.DateTimeField(verbose_name="快照时点")  # 快照日期次日本地零点
+    quantity = models.IntegerField(verbose_name="库存数量")
+    is_month_end = models.BooleanField(default=False, verbose_name="是否月末快照")
+
+    class Meta:
+        verbose_name = "备件库存快照"
+        verbose_name_plural = "备件库存快照"
+        unique_together = ['spare_part', 'day']
+        indexes = [
+            models.Index(fields=['spare_part', '-taken_at'], name='snapshot_part_taken_idx'),
+            models.Index(fields=['site', 'day'], name='snapshot_site_day_idx'),
+            models.Index(fields=['day'], name='snapshot_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.spare_part_id} {self.day} 库存{self.quantity}"
+
 
 # 插入样本备件数据
 # 假设 site_id = 1（北京场站），user_id = 5（admin用户）
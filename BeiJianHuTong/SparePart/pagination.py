@@ -0,0 +1,120 @@
+import base64
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+
+
+class StandardPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'limit'
+    page_size_query_description = "每页数量"
+
+
+class KeysetPagination(BasePagination):
+    """游标（keyset）分页
+
+    按 ordering 中的字段组合做 seek，不执行 OFFSET 扫描，
+    总数默认不统计（?with_total=true 时才执行 COUNT）。
+    ordering 最后一个字段必须唯一（通常为 id），以保证翻页稳定。
+    """
+    cursor_query_param = 'cursor'
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+    total_query_param = 'with_total'
+    invalid_cursor_message = "游标无效"
+
+    def __init__(self, ordering=('-created_at', '-id')):
+        self.ordering = tuple(ordering)
+
+    @classmethod
+    def is_requested(cls, request):
+        """请求中带 cursor 参数（可为空，表示第一页）即启用游标分页"""
+        return cls.cursor_query_param in request.query_params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_page_size(request)
+
+        want_total = request.query_params.get(self.total_query_param, '').lower() in ('1', 'true')
+        self.total = queryset.count() if want_total else None
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request.query_params.get(self.cursor_query_param), queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_seek_filter(position))
+
+        results = list(queryset[:self.limit + 1])
+        has_next = len(results) > self.limit
+        self.page = results[:self.limit]
+        self.next_cursor = self.encode_cursor(self.page[-1]) if has_next else None
+        return self.page
+
+    def get_page_data(self, items):
+        """保持 {code, message, data} 包装中 data 部分的结构"""
+        data = {
+            "limit": self.limit,
+            "next_cursor": self.next_cursor,
+            "items": items,
+        }
+        if self.total is not None:
+            data["total"] = self.total
+        return data
+
+    def get_seek_filter(self, position):
+        """(a, b, c) 之后的记录: a 越过, 或 a 相等且 b 越过, 或 ..."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode_cursor(self, instance):
+        values = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            values.append(value)
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor, model):
+        """游标 -> 排序字段值列表，每个值按字段类型转换（to_python），篡改或不合法的游标返回 404"""
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        position = []
+        for field, value in zip(self.ordering, values):
+            if not isinstance(value, (str, int, float, bool)):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                value = model._meta.get_field(field.lstrip('-')).to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            position.append(value)
+        return position
@@ -0,0 +1,118 @@
+from datetime import date
+
+PARTITION_MONTHS_AHEAD = 3
+MAXVALUE_PARTITION = 'pmax'
+
+
+def supports_partitioning(connection):
+    """按月 RANGE 分区只在 MySQL 上启用"""
+    return connection.vendor == 'mysql'
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'p{month:%Y%m}'
+
+
+def partition_clause(month):
+    """月分区：created_at（UTC）早于下月 1 日的行"""
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN (TO_DAYS('{add_months(month, 1):%Y-%m-%d}'))"
+
+
+def month_range(first, last):
+    month = date(first.year, first.month, 1)
+    while month <= last:
+        yield month
+        month = add_months(month, 1)
+
+
+def existing_partitions(connection, table):
+    """[(分区名, 上界日期)]，上界为 None 表示 MAXVALUE 分区；未分区时返回空列表"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION",
+            [table],
+        )
+        rows = cursor.fetchall()
+    return [
+        (name, None if name == MAXVALUE_PARTITION else add_months(parse_partition(name), 1))
+        for name, _ in rows
+    ]
+
+
+def parse_partition(name):
+    return date(int(name[1:5]), int(name[5:7]), 1)
+
+
+def partition_table(schema_editor, table, first_month, last_month):
+    """把出入库流水表改为按 created_at 月分区
+
+    MySQL 要求分区键包含在每个唯一键中，主键改为 (id, created_at)；
+    分区表不支持外键，外键约束改由应用层（Django ORM）保证。
+    """
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    for name, constraint in constraints.items():
+        if constraint['foreign_key']:
+            schema_editor.execute(f"ALTER TABLE {quote(table)} DROP FOREIGN KEY {quote(name)}")
+
+    schema_editor.execute(
+        f"ALTER TABLE {quote(table)} DROP PRIMARY KEY, ADD PRIMARY KEY ({quote('id')}, {quote('created_at')})"
+    )
+    clauses = [partition_clause(month) for month in month_range(first_month, last_month)]
+    clauses.append(f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN MAXVALUE")
+    schema_editor.execute(
+        f"ALTER TABLE {quote(table)} PARTITION BY RANGE (TO_DAYS({quote('created_at')})) ({', '.join(clauses)})"
+    )
+
+
+def unpartition_table(schema_editor, model):
+    """partition_table 的逆操作：取消分区，主键恢复为 id，重建外键约束（表未分区时不处理）"""
+    connection = schema_editor.connection
+    table = model._meta.db_table
+    if not existing_partitions(connection, table):
+        return
+    quote = connection.ops.quote_name
+    schema_editor.execute(f"ALTER TABLE {quote(table)} REMOVE PARTITIONING")
+    schema_editor.execute(f"ALTER TABLE {quote(table)} DROP PRIMARY KEY, ADD PRIMARY KEY ({quote('id')})")
+    for field in model._meta.local_fields:
+        if field.remote_field and field.db_constraint:
+            schema_editor.execute(schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s'))
+
+
+def add_future_partitions(connection, table, months_ahead=PARTITION_MONTHS_AHEAD, today=None):
+    """从 MAXVALUE 分区拆出到 months_ahead 个月后的月分区，返回新增的分区名"""
+    partitions = existing_partitions(connection, table)
+    bounded = [bound for _, bound in partitions if bound is not None]
+    if not partitions or not bounded:
+        return []
+    today = today or date.today()
+    target = add_months(date(today.year, today.month, 1), months_ahead)
+    new_months = list(month_range(max(bounded), target))
+    if not new_months:
+        return []
+    clauses = [partition_clause(month) for month in new_months]
+    clauses.append(f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN MAXVALUE")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"ALTER TABLE {connection.ops.quote_name(table)} "
+            f"REORGANIZE PARTITION {MAXVALUE_PARTITION} INTO ({', '.join(clauses)})"
+        )
+    return [partition_name(month) for month in new_months]
+
+
+def drop_partitions_before(connection, table, before):
+    """删除上界不晚于 before（UTC 日期）的分区；这些分区的行都已归档，删除分区即回收空间"""
+    names = [name for name, bound in existing_partitions(connection, table) if bound is not None and bound <= before]
+    if names:
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {connection.ops.quote_name(table)} DROP PARTITION {', '.join(names)}")
+    return names
@@ -0,0 +1,177 @@
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .caching import invalidate_spare_part_lists
+from .events import publish_stock_events, stock_event
+from .models import SparePart, SparePartOpeningBalance, SparePartTransaction, StockAdjustment
+
+RECONCILE_BATCH_SIZE = 5000
+
+
+def ledger_totals(part_ids):
+    """{备件ID: [期初结余, 流水入库, 流水出库]}
+
+    流水表按备件一条 GROUP BY 求和，已归档部分读期初结余；只返回聚合结果，不读取流水行。
+    入库、出库分别求和后在 Python 中相减（MySQL 无符号列相减为负会报错）。
+    """
+    totals = {pk: [0, 0, 0] for pk in part_ids}
+    balances = SparePartOpeningBalance.objects.filter(spare_part_id__in=part_ids)
+    for pk, in_qty, out_qty in balances.values_list('spare_part_id', 'in_qty', 'out_qty'):
+        totals[pk][0] = in_qty - out_qty
+    ledger = (
+        SparePartTransaction.objects.filter(spare_part_id__in=part_ids)
+        .order_by().values('spare_part_id')
+        .annotate(
+            in_qty=Sum('quantity', filter=Q(transaction_type='in')),
+            out_qty=Sum('quantity', filter=Q(transaction_type='out')),
+        )
+    )
+    for row in ledger:
+        totals[row['spare_part_id']][1:] = [int(row['in_qty'] or 0), int(row['out_qty'] or 0)]
+    return totals
+
+
+def pending_adjustments(part_ids):
+    """{备件ID: [未审核的调整记录]}，按时间排序"""
+    pending = {}
+    rows = (
+        StockAdjustment.objects.filter(spare_part_id__in=part_ids, approved=False)
+        .order_by('created_at', 'pk')
+        .values('pk', 'spare_part_id', 'delta', 'source', 'operator__username', 'created_at')
+    )
+    for row in rows:
+        pending.setdefault(row['spare_part_id'], []).append({
+            "id": row['pk'],
+            "delta": row['delta'],
+            "source": row['source'],
+            "operator": row['operator__username'],
+            "created_at": row['created_at'].isoformat(),
+        })
+    return pending
+
+
+def expected_quantity(totals, adjustment=0):
+    """期初结余 + 流水净额 + 已审核的流水外库存调整（初始数量、审核通过的编辑/导入）"""
+    opening, in_qty, out_qty = totals
+    return opening + in_qty - out_qty + adjustment
+
+
+class LedgerReconciler:
+    """备件库存与出入库流水对账
+
+    按主键分批读取 (id, 库存, 已审核的流水外调整)，每批一条 GROUP BY 计算应有库存并比对；
+    不一致的备件在事务中加锁后重新计算确认（排除对账期间的并发出入库）。
+    不一致分三类：pending（差额恰为未审核的调整记录，如后台改库存，列出记录待人工审核，不修正）；
+    drift（差额没有任何记录能解释，repair=True 时修正为流水与全部调整记录之和）；
+    unexplained（应有库存为负，说明有未记录的库存来源，只报告不修正，需人工核实）。
+    """
+
+    def __init__(self, repair=False, site_id=None, batch_size=RECONCILE_BATCH_SIZE):
+        self.repair = repair
+        self.site_id = site_id
+        self.batch_size = batch_size
+        self.checked = 0
+        self.drifted = 0
+        self.unexplained = 0
+        self.pending = 0
+        self.repaired = 0
+        self.net_drift = 0
+        self.started_at = timezone.now()
+
+    def run(self):
+        """逐条生成不一致的备件记录"""
+        parts = SparePart.objects.all()
+        if self.site_id is not None:
+            parts = parts.filter(site_id=self.site_id)
+        last_pk = None
+        while True:
+            batch = parts.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            rows = list(batch.values_list('pk', 'quantity', 'stock_adjustment')[:self.batch_size])
+            if not rows:
+                return
+            self.checked += len(rows)
+            last_pk = rows[-1][0]
+
+            totals = ledger_totals([pk for pk, _, _ in rows])
+            suspects = [
+                pk for pk, quantity, adjustment in rows if quantity != expected_quantity(totals[pk], adjustment)
+            ]
+            if suspects:
+                yield from self.confirm(suspects)
+
+    def confirm(self, part_ids):
+        with transaction.atomic():
+            # 出入库 save() 先锁备件行，持锁期间这些备件不会产生新的流水
+            parts = list(
+                SparePart.objects.select_for_update().filter(pk__in=part_ids).order_by('pk')
+                .only('id', 'name', 'site_id', 'quantity', 'alarm_qty', 'stock_adjustment')
+            )
+            totals = ledger_totals([part.pk for part in parts])
+            pending = pending_adjustments([part.pk for part in parts])
+            drifted, fixed = [], []
+            now = timezone.now()
+            for part in parts:
+                opening, in_qty, out_qty = totals[part.pk]
+                expected = expected_quantity(totals[part.pk], part.stock_adjustment)
+                if part.quantity == expected:
+                    continue
+                adjustments = pending.get(part.pk, [])
+                recorded = expected + sum(adjustment["delta"] for adjustment in adjustments)
+                if part.quantity == recorded:
+                    status = "pending"
+                elif expected < 0:
+                    status = "unexplained"
+                else:
+                    status = "drift"
+                item = {
+                    "spare_part_id": part.pk,
+                    "site_id": part.site_id,
+                    "name": part.name,
+                    "stored": part.quantity,
+                    "expected": expected,
+                    "drift": part.quantity - expected,
+                    "opening": opening,
+                    "ledger_in": in_qty,
+                    "ledger_out": out_qty,
+                    "adjustment": part.stock_adjustment,
+                    "pending_adjustments": adjustments,
+                    "status": status,
+                    "repaired": False,
+                }
+                if self.repair and status == "drift":
+                    # 未审核的调整仍保留在库存中，等待审核
+                    part.quantity = recorded
+                    part.is_alarm = recorded <= part.alarm_qty
+                    part.updated_at = now
+                    fixed.append(part)
+                    item["repaired"] = True
+                drifted.append(item)
+
+            if fixed:
+                SparePart.objects.bulk_update(fixed, ['quantity', 'is_alarm', 'updated_at'])
+                invalidate_spare_part_lists(part.site_id for part in fixed)
+                publish_stock_events(stock_event(part) for part in fixed)
+
+        self.drifted += len(drifted)
+        self.unexplained += sum(item["status"] == "unexplained" for item in drifted)
+        self.pending += sum(item["status"] == "pending" for item in drifted)
+        self.repaired += len(fixed)
+        self.net_drift += sum(item["drift"] for item in drifted)
+        return drifted
+
+    def summary(self):
+        return {
+            "checked": self.checked,
+            "drifted": self.drifted,
+            "unexplained": self.unexplained,
+            "pending": self.pending,
+            "repaired": self.repaired,
+            "net_drift": self.net_drift,
+            "repair": self.repair,
+            "site_id": self.site_id,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": timezone.now().isoformat(),
+        }
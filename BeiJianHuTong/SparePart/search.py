@@ -0,0 +1,135 @@
+import re
+
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Max, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+# 参与搜索的字段及权重（排序时名称命中优先于型号、供应商、描述）
+SEARCH_FIELDS = {
+    'name': 5,
+    'model': 4,
+    'supplier_code': 3,
+    'supplier': 2,
+    'description': 1,
+}
+MAX_TOKEN_LENGTH = 64
+MAX_QUERY_TERMS = 8
+
+FULLTEXT_INDEX_NAME = 'sparepart_search_ft'
+
+# 中日韩文字连续片段 / 字母数字词
+CJK_RUN = re.compile(r'[㐀-䶿一-鿿豈-﫿]+')
+WORD = re.compile(r'[0-9a-z]+')
+BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]+')
+
+
+def uses_fulltext():
+    """MySQL 使用 FULLTEXT ngram 索引，其余数据库使用倒排索引表"""
+    return connection.vendor == 'mysql'
+
+
+def tokenize(text, unigrams=False):
+    """文本 -> 词元列表
+
+    中文按二元组切分（与 MySQL ngram_token_size=2 一致），单字保留原字；
+    unigrams=True（建索引时）另收录每个汉字，单字搜索可命中词中任意位置（“轴”命中“主轴”）。
+    字母数字按词切分并转小写，型号额外保留去掉分隔符的整体形式（6205-2RS -> 62052rs）。
+    """
+    text = (text or '').lower()
+    tokens = []
+    for run in CJK_RUN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if unigrams:
+                tokens.extend(dict.fromkeys(run))
+    words = WORD.findall(text)
+    tokens.extend(words)
+    if len(words) > 1:
+        for chunk in re.split(r'\s+', text):
+            compact = ''.join(WORD.findall(chunk))
+            if compact and compact not in words:
+                tokens.append(compact)
+    return [token[:MAX_TOKEN_LENGTH] for token in tokens]
+
+
+def part_tokens(values):
+    """{字段: 文本} -> {词元: 权重}"""
+    weights = {}
+    for field, weight in SEARCH_FIELDS.items():
+        for token in tokenize(values.get(field), unigrams=True):
+            weights[token] = max(weights.get(token, 0), weight)
+    return weights
+
+
+def query_terms(text):
+    """搜索词 -> [(词元, 是否前缀匹配)]
+
+    字母数字词按前缀匹配（型号输入一半也能命中），中文单字与二元组精确匹配。
+    """
+    terms = []
+    for token in dict.fromkeys(tokenize(text)):
+        prefix = not CJK_RUN.fullmatch(token)
+        terms.append((token, prefix))
+    return terms[:MAX_QUERY_TERMS]
+
+
+def index_parts(parts):
+    """重建指定备件的倒排索引（MySQL 下为空操作）"""
+    from .models import SparePartSearchToken
+
+    if uses_fulltext():
+        return 0
+    parts = list(parts)
+    if not parts:
+        return 0
+    SparePartSearchToken.objects.filter(spare_part__in=[part.pk for part in parts]).delete()
+    rows = [
+        SparePartSearchToken(spare_part_id=part.pk, token=token, weight=weight)
+        for part in parts
+        for token, weight in part_tokens({field: getattr(part, field) for field in SEARCH_FIELDS}).items()
+    ]
+    SparePartSearchToken.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def fulltext_query(text):
+    """MySQL 布尔模式查询串：每个词都必须出现，字母数字词加 * 前缀匹配"""
+    words = BOOLEAN_OPERATORS.sub(' ', text).split()
+    return ' '.join(f'+{word}*' if word.isascii() else f'+"{word}"' for word in words)
+
+
+def no_match(queryset):
+    """搜索词切分后没有可检索的词（如全是标点）：结果为空，仍标注 search_rank 供排序"""
+    return queryset.none().annotate(search_rank=Value(0, output_field=IntegerField()))
+
+
+def search_spare_parts(queryset, text):
+    """按搜索词筛选备件并标注相关度 search_rank，所有词都需命中"""
+    if uses_fulltext():
+        query = fulltext_query(text)
+        if not query:
+            return no_match(queryset)
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        columns = ', '.join(f'{table}.{connection.ops.quote_name(field)}' for field in SEARCH_FIELDS)
+        rank = RawSQL(f'MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)', [query])
+        return queryset.annotate(search_rank=rank).filter(search_rank__gt=0)
+
+    terms = query_terms(text)
+    if not terms:
+        return no_match(queryset)
+
+    # 一次 JOIN 词元表：任一词命中的行参与分组，HAVING 要求每个词都命中，权重之和为相关度
+    matches = Q()
+    term_weights = {}
+    for index, (token, prefix) in enumerate(terms):
+        condition = Q(search_tokens__token__startswith=token) if prefix else Q(search_tokens__token=token)
+        matches |= condition
+        term_weights[f'search_term_{index}'] = Max(
+            Case(When(condition, then=F('search_tokens__weight')), default=Value(0), output_field=IntegerField())
+        )
+    queryset = queryset.filter(matches).annotate(**term_weights)
+    queryset = queryset.filter(**{f'{name}__gt': 0 for name in term_weights})
+    rank = sum((F(name) for name in term_weights), Value(0))
+    return queryset.annotate(search_rank=rank)
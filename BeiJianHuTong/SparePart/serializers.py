@@ -1,5 +1,8 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction as db_transaction
 from rest_framework import serializers
-from .models import SparePart, Category, SparePartTransaction
+from .models import SparePart, Category, SparePartTransaction, SparePartForecast
+from .thumbnails import thumbnail_urls
 
 class CategorySerializer(serializers.ModelSerializer):
     """分类序列化器"""
@@ -35,6 +38,7 @@ class SparePartTransactionSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'spare_part_name', 'transaction_type_display']
     
+    @db_transaction.atomic
     def create(self, validated_data):
         """创建出入库记录，如果备件不存在则自动创建"""
         
@@ -93,8 +97,11 @@ class SparePartTransactionSerializer(serializers.ModelSerializer):
         elif not spare_part:
             raise serializers.ValidationError("必须提供 spare_part 或 spare_part_name_input")
         
-        # 创建出入库记录
-        transaction = SparePartTransaction.objects.create(**validated_data)
+        # 创建出入库记录（库存不足时模型抛出 ValidationError）
+        try:
+            transaction = SparePartTransaction.objects.create(**validated_data)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.message_dict)
         return transaction
 
 
@@ -106,6 +113,7 @@ class SparePartSerializer(serializers.ModelSerializer):
     imageUrl = serializers.SerializerMethodField()
     alarmQty = serializers.IntegerField(source='alarm_qty')
     procurementDays = serializers.IntegerField(source='procurement_days')
+    isAlarm = serializers.BooleanField(source='is_alarm', read_only=True)
     category = CategorySerializer(read_only=True, allow_null=True)
     # ✅ 修改：使用 PrimaryKeyRelatedField 正确处理写入
     categoryId = serializers.PrimaryKeyRelatedField(
@@ -123,7 +131,7 @@ class SparePartSerializer(serializers.ModelSerializer):
         model = SparePart
         fields = [
             'id', 'name', 'model', 'description', 'location',
-            'supplier', 'supplier_code', 'quantity', 'alarmQty',
+            'supplier', 'supplier_code', 'quantity', 'alarmQty', 'isAlarm',
             'procurementDays', 'imageUrl', 'image', 'stationId', 'stationName', 'siteId', 'category',
             'categoryId', 'categoryName', 'status', 'created_by', 'created_at', 'updated_by',
             'updated_at', 'last_purchase_date', 'last_use_date'
@@ -139,4 +147,69 @@ class SparePartSerializer(serializers.ModelSerializer):
         return None
     
     def get_categoryName(self, obj):
-        return obj.category.name if obj.category else "未分类"
\ No newline at end of file
+        return obj.category.name if obj.category else "未分类"
+
+
+class SparePartListSerializer(SparePartSerializer):
+    """备件列表序列化器
+
+    列表页每行都会读取场站、分类、创建人、更新人，
+    通过 setup_eager_loading 一次 JOIN 取回，避免逐行查询。
+    列表只返回缩略图地址：imageUrl 为 medium 缩略图，thumbnails 含全部变体；
+    缩略图未生成时 imageUrl 回退为原图地址，thumbnails 为 None。
+    """
+    thumbnails = serializers.SerializerMethodField()
+    
+    class Meta(SparePartSerializer.Meta):
+        fields = SparePartSerializer.Meta.fields + ['thumbnails']
+    
+    def get_imageUrl(self, obj):
+        urls = self.get_thumbnails(obj)
+        return urls['medium'] if urls else super().get_imageUrl(obj)
+    
+    def get_thumbnails(self, obj):
+        return thumbnail_urls(obj.image) if obj.has_thumbnails else None
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('site', 'category', 'created_by', 'updated_by')
+
+
+class SparePartForecastSerializer(serializers.ModelSerializer):
+    """备件消耗预测"""
+    sparePartId = serializers.IntegerField(source='spare_part_id', read_only=True)
+    name = serializers.CharField(source='spare_part.name', read_only=True)
+    model = serializers.CharField(source='spare_part.model', read_only=True)
+    siteId = serializers.IntegerField(source='site_id', read_only=True)
+    quantity = serializers.IntegerField(source='spare_part.quantity', read_only=True)
+    alarmQty = serializers.IntegerField(source='spare_part.alarm_qty', read_only=True)
+    dailyUsage = serializers.FloatField(source='daily_usage', read_only=True)
+    usageStd = serializers.FloatField(source='usage_std', read_only=True)
+    leadDays = serializers.IntegerField(source='lead_days', read_only=True)
+    safetyStock = serializers.IntegerField(source='safety_stock', read_only=True)
+    reorderPoint = serializers.IntegerField(source='reorder_point', read_only=True)
+    daysToStockout = serializers.FloatField(source='days_to_stockout', read_only=True, allow_null=True)
+    windowDays = serializers.IntegerField(source='window_days', read_only=True)
+    serviceLevel = serializers.FloatField(source='service_level', read_only=True)
+    computedAt = serializers.DateTimeField(source='computed_at', read_only=True)
+
+    class Meta:
+        model = SparePartForecast
+        fields = [
+            'sparePartId', 'name', 'model', 'siteId', 'quantity', 'alarmQty',
+            'dailyUsage', 'usageStd', 'leadDays', 'safetyStock', 'reorderPoint',
+            'daysToStockout', 'windowDays', 'serviceLevel', 'computedAt',
+        ]
+
+
+class InventoryAsOfSerializer(serializers.ModelSerializer):
+    """时点库存（查询集须经 snapshots.inventory_as_of 标注）"""
+    sparePartId = serializers.IntegerField(source='id', read_only=True)
+    siteId = serializers.IntegerField(source='site_id', read_only=True)
+    siteName = serializers.CharField(source='site.name', read_only=True)
+    quantityAsOf = serializers.IntegerField(source='quantity_as_of', read_only=True)
+    snapshotDay = serializers.DateField(source='snapshot_day', read_only=True, allow_null=True)
+
+    class Meta:
+        model = SparePart
+        fields = ['sparePartId', 'name', 'model', 'siteId', 'siteName', 'quantityAsOf', 'quantity', 'snapshotDay']
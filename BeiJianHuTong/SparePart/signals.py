@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from BeiJianHuTong.conditional import bump_version
+from .caching import invalidate_spare_part_lists
+from .events import publish_stock_events, removed_event, stock_event
+from .models import Category, SparePart, SparePartTransaction, StockMovementDaily
+from .search import SEARCH_FIELDS, index_parts
+from .suggest import update_index
+
+
+@receiver(post_delete, sender=SparePart)
+def release_spare_part_image(sender, instance, **kwargs):
+    """删除备件后，图片无其他引用时删除文件（事务提交后执行）"""
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: SparePart.release_image(name))
+
+
+@receiver(post_delete, sender=SparePartTransaction)
+def reverse_daily_movement(sender, instance, **kwargs):
+    """删除出入库记录后从日汇总扣回，统计报表与流水保持一致"""
+    StockMovementDaily.record(instance, sign=-1)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_categories_version(sender, instance, **kwargs):
+    bump_version('categories')
+
+
+@receiver(pre_save, sender=SparePart)
+def remember_previous_site(sender, instance, update_fields=None, **kwargs):
+    """备件可能被移到其他场站，原场站的列表缓存也要失效；原名称、型号用于从联想索引中移除旧键"""
+    instance._previous_site_id = None
+    instance._previous_suggest = None
+    if instance._state.adding or (
+        update_fields is not None and not {'name', 'model', 'site'} & set(update_fields)
+    ):
+        return
+    previous = SparePart.objects.filter(pk=instance.pk).values_list('site_id', 'name', 'model').first()
+    if previous is not None:
+        instance._previous_suggest = previous
+        if update_fields is None or 'site' in update_fields:
+            instance._previous_site_id = previous[0]
+
+
+@receiver(post_save, sender=SparePart)
+def move_daily_movements(sender, instance, **kwargs):
+    """备件换场站后日汇总随之归入新场站（流水统计按备件当前场站分组）"""
+    previous_site_id = getattr(instance, '_previous_site_id', None)
+    if previous_site_id is not None and previous_site_id != instance.site_id:
+        StockMovementDaily.objects.filter(spare_part_id=instance.pk).update(site_id=instance.site_id)
+
+
+@receiver(post_save, sender=SparePart)
+@receiver(post_delete, sender=SparePart)
+def invalidate_spare_part_list_cache(sender, instance, **kwargs):
+    invalidate_spare_part_lists([instance.site_id, getattr(instance, '_previous_site_id', None)])
+
+
+@receiver(post_save, sender=SparePart)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """文本字段变化时重建该备件的搜索词元（仅更新库存等字段时跳过）"""
+    if update_fields is None or set(update_fields) & SEARCH_FIELDS.keys():
+        index_parts([instance])
+
+
+@receiver(post_save, sender=SparePart)
+def update_suggest_index(sender, instance, created=False, update_fields=None, **kwargs):
+    """名称、型号或场站变化时更新联想索引中该备件的键（事务提交后执行）"""
+    if not created and update_fields is not None and not {'name', 'model', 'site'} & set(update_fields):
+        return
+    old = getattr(instance, '_previous_suggest', None)
+    new = (instance.site_id, instance.name, instance.model)
+    if old != new:
+        part_id = instance.pk
+        transaction.on_commit(lambda: update_index(part_id, old, new))
+
+
+@receiver(post_delete, sender=SparePart)
+def remove_from_suggest_index(sender, instance, **kwargs):
+    part_id, old = instance.pk, (instance.site_id, instance.name, instance.model)
+    transaction.on_commit(lambda: update_index(part_id, old))
+
+
+@receiver(post_save, sender=SparePart)
+def publish_stock_change(sender, instance, **kwargs):
+    """推送库存变更事件（出入库在 save() 中更新备件库存，同样经过这里）"""
+    events = [stock_event(instance)]
+    previous_site_id = getattr(instance, '_previous_site_id', None)
+    if previous_site_id is not None and previous_site_id != instance.site_id:
+        events.append(removed_event(instance.pk, previous_site_id))
+    publish_stock_events(events)
+
+
+@receiver(post_delete, sender=SparePart)
+def publish_stock_removal(sender, instance, **kwargs):
+    publish_stock_events([removed_event(instance.pk, instance.site_id)])
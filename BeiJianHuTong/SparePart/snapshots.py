@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .export import iterate_in_chunks
+from .models import SparePart, SparePartTransaction, SparePartTransactionArchive, StockSnapshot
+
+SNAPSHOT_INTERVALS = ('daily', 'monthly')
+SNAPSHOT_BATCH_SIZE = 5000
+
+
+def get_snapshot_interval():
+    return getattr(settings, 'STOCK_SNAPSHOT_INTERVAL', 'daily')
+
+
+def get_daily_retention_days():
+    return getattr(settings, 'STOCK_SNAPSHOT_DAILY_RETENTION_DAYS', 90)
+
+
+def end_of_day(day):
+    """本地日期 -> 该日结束时点（次日本地零点）"""
+    following = day + timedelta(days=1)
+    return timezone.make_aware(datetime(following.year, following.month, following.day))
+
+
+def is_month_end(day):
+    return (day + timedelta(days=1)).day == 1
+
+
+def net_movement(model, **filters):
+    """OuterRef('pk') 备件在筛选范围内的净入库数量子查询（入库为正、出库为负，无记录为 0）"""
+    rows = (
+        model.objects.filter(spare_part=OuterRef('pk'), **filters)
+        .order_by().values('spare_part')
+        .annotate(net=(
+            Coalesce(Sum('quantity', filter=Q(transaction_type='in')), 0)
+            - Coalesce(Sum('quantity', filter=Q(transaction_type='out')), 0)
+        ))
+        .values('net')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def ledger_net(**filters):
+    """流水表与归档表合计的净入库数量（每个备件各一次索引范围查找）"""
+    return net_movement(SparePartTransaction, **filters) + net_movement(SparePartTransactionArchive, **filters)
+
+
+def take_snapshots(day, site_id=None, batch_size=SNAPSHOT_BATCH_SIZE):
+    """记录 day 结束时全部备件的库存，返回写入条数
+
+    当前库存减去快照时点之后的净入库即为快照库存；同一条 SQL 读取当前库存与之后的流水，
+    结果一致。同一天重复执行覆盖原快照，可用于补录历史日期。
+    """
+    taken_at = end_of_day(day)
+    parts = SparePart.objects.filter(created_at__lt=taken_at)
+    if site_id is not None:
+        parts = parts.filter(site_id=site_id)
+    rows = parts.annotate(after=ledger_net(created_at__gte=taken_at)).values_list('id', 'site_id', 'quantity', 'after')
+
+    conflict_options = {'update_conflicts': True, 'update_fields': ['site', 'taken_at', 'quantity', 'is_month_end']}
+    if connection.features.supports_update_conflicts_with_target:
+        conflict_options['unique_fields'] = ['spare_part', 'day']
+
+    month_end = is_month_end(day)
+    written = 0
+    batch = []
+    for part_id, part_site_id, quantity, after in iterate_in_chunks(rows, batch_size):
+        batch.append(StockSnapshot(
+            spare_part_id=part_id,
+            site_id=part_site_id,
+            day=day,
+            taken_at=taken_at,
+            quantity=quantity - int(after),
+            is_month_end=month_end,
+        ))
+        if len(batch) >= batch_size:
+            StockSnapshot.objects.bulk_create(batch, **conflict_options)
+            written += len(batch)
+            batch = []
+    if batch:
+        StockSnapshot.objects.bulk_create(batch, **conflict_options)
+        written += len(batch)
+    return written
+
+
+def prune_snapshots(today=None, retention_days=None):
+    """删除超过保留天数的每日快照（月末快照长期保留），返回删除条数"""
+    today = today or timezone.localdate()
+    retention_days = get_daily_retention_days() if retention_days is None else retention_days
+    deleted, _ = StockSnapshot.objects.filter(
+        is_month_end=False, day__lt=today - timedelta(days=retention_days)
+    ).delete()
+    return deleted
+
+
+def inventory_as_of(parts, at):
+    """为备件查询集标注 at 时点的库存 quantity_as_of（at 之前的出入库计入，之后的不计入）
+
+    从 at 之前最近的快照起只回放快照之后、at 之前的出入库；
+    没有更早快照的备件从当前库存倒推 at 之后的出入库。
+    同时标注 snapshot_day（所用快照日期，无快照为 None）。
+    """
+    latest = StockSnapshot.objects.filter(spare_part=OuterRef('pk'), taken_at__lte=at).order_by('-taken_at')
+    return (
+        parts.filter(created_at__lt=at)
+        .annotate(
+            snapshot_day=Subquery(latest.values('day')[:1]),
+            snapshot_at=Subquery(latest.values('taken_at')[:1]),
+            snapshot_quantity=Subquery(latest.values('quantity')[:1]),
+        )
+        .annotate(quantity_as_of=Case(
+            When(
+                snapshot_at__isnull=False,
+                then=F('snapshot_quantity') + ledger_net(created_at__gte=OuterRef('snapshot_at'), created_at__lt=at),
+            ),
+            default=F('quantity') - ledger_net(created_at__gte=at),
+            output_field=IntegerField(),
+        ))
+    )
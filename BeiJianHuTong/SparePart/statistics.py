@@ -0,0 +1,221 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import DateField, F, Q, Count, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncWeek, TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import SparePartTransaction, SparePartTransactionArchive, StockMovementDaily
+
+
+GROUP_BY_CHOICES = ('day', 'week', 'month', 'site', 'category')
+ID_PARAMS = ('spare_part_id', 'site_id', 'category_id')
+DATE_PARAMS = ('start_date', 'end_date')
+
+# 日汇总表：日期粒度的统计直接读汇总，不扫描流水
+ROLLUP = {
+    'filters': {
+        'spare_part_id': 'spare_part_id',
+        'site_id': 'site_id',
+        'category_id': 'spare_part__category_id',
+    },
+    'aggregates': {
+        'total_transactions': Coalesce(Sum(F('in_count') + F('out_count')), 0),
+        'in_number': Coalesce(Sum('in_count'), 0),
+        'in_quantity': Coalesce(Sum('in_qty'), 0),
+        'out_number': Coalesce(Sum('out_count'), 0),
+        'out_quantity': Coalesce(Sum('out_qty'), 0),
+    },
+    # 分组输出字段 -> 表达式（None 表示模型字段本身）
+    'groups': {
+        'day': {'period': F('day')},
+        'week': {'period': TruncWeek('day')},
+        'month': {'period': TruncMonth('day')},
+        'site': {'site_id': None, 'site_name': F('site__name')},
+        'category': {'category_id': F('spare_part__category_id'), 'category_name': F('spare_part__category__name')},
+    },
+}
+
+# 出入库流水：起止时间精确到时分秒时使用
+LEDGER = {
+    'filters': {
+        'spare_part_id': 'spare_part_id',
+        'site_id': 'spare_part__site_id',
+        'category_id': 'spare_part__category_id',
+    },
+    'aggregates': {
+        'total_transactions': Count('id'),
+        'in_number': Count('id', filter=Q(transaction_type='in')),
+        'in_quantity': Coalesce(Sum('quantity', filter=Q(transaction_type='in')), 0),
+        'out_number': Count('id', filter=Q(transaction_type='out')),
+        'out_quantity': Coalesce(Sum('quantity', filter=Q(transaction_type='out')), 0),
+    },
+    'groups': {
+        'day': {'period': TruncDate('created_at')},
+        'week': {'period': TruncWeek('created_at', output_field=DateField())},
+        'month': {'period': TruncMonth('created_at', output_field=DateField())},
+        'site': {'site_id': F('spare_part__site_id'), 'site_name': F('spare_part__site__name')},
+        'category': {'category_id': F('spare_part__category_id'), 'category_name': F('spare_part__category__name')},
+    },
+}
+
+
+def parse_bound(value):
+    """YYYY-MM-DD -> date；带时分秒 -> 带时区的 datetime（未带时区按当前时区）；格式无效返回 None"""
+    try:
+        day = parse_date(value)
+        if day is not None:
+            return day
+        moment = parse_datetime(value)
+    except ValueError:
+        return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def created_at_range(start, end):
+    """起止参数 -> created_at 筛选条件；只有日期时按当前时区的整天计算，包含结束日期当天"""
+    lookups = {}
+    if start is not None:
+        lookups['created_at__gte'] = start if isinstance(start, datetime) else day_start(start)
+    if end is not None:
+        if isinstance(end, datetime):
+            lookups['created_at__lte'] = end
+        else:
+            lookups['created_at__lt'] = day_start(end + timedelta(days=1))
+    return lookups
+
+
+def clean_date_range(params):
+    """读取 start_date / end_date，返回 (起, 止)；格式无效时抛出 ValueError（消息可直接返回给前端）"""
+    bounds = []
+    for name in DATE_PARAMS:
+        value = (params.get(name) or '').strip()
+        bound = parse_bound(value) if value else None
+        if value and bound is None:
+            raise ValueError(f"{name} 参数无效，格式为 YYYY-MM-DD 或 ISO 8601 时间")
+        bounds.append(bound)
+    return tuple(bounds)
+
+
+def clean_statistics_params(params):
+    """校验统计接口的查询参数，返回规范化后的 dict；参数无效时抛出 ValueError"""
+    cleaned = {}
+    for name in ID_PARAMS:
+        value = (params.get(name) or '').strip()
+        if value:
+            if not value.isdigit():
+                raise ValueError(f"{name} 参数无效，应为整数")
+            cleaned[name] = int(value)
+    cleaned['start_date'], cleaned['end_date'] = clean_date_range(params)
+    cleaned['include_archive'] = str(params.get('include_archive', '')).lower() in ('1', 'true')
+    return cleaned
+
+
+def format_statistics(row):
+    """将聚合结果转换为统计接口的响应结构"""
+    return {
+        "total_transactions": row['total_transactions'],
+        "in": {
+            "count": row['in_number'],
+            "quantity": row['in_quantity']
+        },
+        "out": {
+            "count": row['out_number'],
+            "quantity": row['out_quantity']
+        }
+    }
+
+
+def statistics_sources(params):
+    """按起止参数选择数据源并应用筛选，返回 (数据源定义, 查询集列表)
+
+    params 为 clean_statistics_params 的结果。起止日期为 YYYY-MM-DD（或未传）时读日汇总表，
+    包含结束日期当天，汇总表始终包含已归档的数据；带时分秒时回退到流水表按时间精确统计
+    （只有日期的一端仍按整天计算，与出入库列表一致），include_archive 时同时统计归档表。
+    """
+    start, end = params['start_date'], params['end_date']
+    if not any(isinstance(bound, datetime) for bound in (start, end)):
+        source, querysets = ROLLUP, [StockMovementDaily.objects.all()]
+        dates = {'day__gte': start, 'day__lte': end}
+    else:
+        source, querysets = LEDGER, [SparePartTransaction.objects.all()]
+        if params['include_archive']:
+            querysets.append(SparePartTransactionArchive.objects.all())
+        dates = created_at_range(start, end)
+
+    lookups = {lookup: params[param] for param, lookup in source['filters'].items() if param in params}
+    lookups.update({lookup: value for lookup, value in dates.items() if value is not None})
+    return source, [queryset.filter(**lookups) for queryset in querysets]
+
+
+def grouped_rows(queryset, source, group_by):
+    """单个数据源的 GROUP BY 查询"""
+    keys = source['groups'][group_by]
+    fields = [key for key, expression in keys.items() if expression is None]
+    expressions = {key: expression for key, expression in keys.items() if expression is not None}
+    return (
+        queryset.order_by()
+        .values(*fields, **expressions)
+        .annotate(**source['aggregates'])
+        .order_by(*keys)
+    )
+
+
+def sum_totals(source, results):
+    totals = dict.fromkeys(source['aggregates'], 0)
+    for result in results:
+        for name, value in result.items():
+            totals[name] += value
+    return format_statistics(totals)
+
+
+def merge_groups(source, group_by, results):
+    """合并各数据源的分组结果，总计由各分组累加"""
+    aggregates = source['aggregates']
+    keys = source['groups'][group_by]
+    totals = dict.fromkeys(aggregates, 0)
+    merged = {}
+    for rows in results:
+        for row in rows:
+            group = merged.setdefault(tuple(row[key] for key in keys), dict.fromkeys(aggregates, 0))
+            for name in aggregates:
+                group[name] += row[name]
+                totals[name] += row[name]
+
+    order = list(merged)
+    if len(results) > 1:
+        # 两个数据源的分组合并后重新排序（空值排最后）
+        order.sort(key=lambda values: [(value is None, value) for value in values])
+    groups = []
+    for values in order:
+        group = dict(zip(keys, values))
+        group.update(format_statistics(merged[values]))
+        groups.append(group)
+
+    data = format_statistics(totals)
+    data.update({"group_by": group_by, "groups": groups})
+    return data
+
+
+def transaction_statistics(params, group_by=None):
+    """出入库统计（每个数据源一条聚合查询），params 为 clean_statistics_params 的结果"""
+    source, querysets = statistics_sources(params)
+    if not group_by:
+        return sum_totals(source, [queryset.aggregate(**source['aggregates']) for queryset in querysets])
+    return merge_groups(source, group_by, [list(grouped_rows(queryset, source, group_by)) for queryset in querysets])
+
+
+async def atransaction_statistics(params, group_by=None):
+    """transaction_statistics 的异步版本（异步 ORM）"""
+    source, querysets = statistics_sources(params)
+    if not group_by:
+        return sum_totals(source, [await queryset.aaggregate(**source['aggregates']) for queryset in querysets])
+    return merge_groups(source, group_by, [
+        [row async for row in grouped_rows(queryset, source, group_by)] for queryset in querysets
+    ])
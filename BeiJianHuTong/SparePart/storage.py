@@ -0,0 +1,68 @@
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.views.static import serve
+
+from .thumbnails import THUMBNAIL_DIR
+
+# 内容寻址文件名：<目录>/<摘要前两位>/<sha256 摘要>[_变体].<扩展名>
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{64}(_\w+)?\.\w+$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """按内容 SHA-256 摘要命名的文件存储
+
+    相同内容只保存一份：再次上传同一文件时直接返回已有文件名，
+    不会像默认存储那样生成 Capture001_AUZi38u.png 之类的副本。
+    文件名随内容确定、永不改变，可以设置长期不可变缓存。
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        # 已是内容寻址名的文件保持原名；缩略图按原图路径确定名称（variant_name），同样原样保存
+        if not HASHED_NAME.search(name) and not name.startswith(f'{THUMBNAIL_DIR}/'):
+            name = self.hashed_name(name, self.content_digest(content))
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    @staticmethod
+    def content_digest(content):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        return digest.hexdigest()
+
+    @staticmethod
+    def hashed_name(name, digest):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], f'{digest}{extension}').replace('\\', '/')
+
+
+def get_image_storage():
+    """SparePart.image 使用的存储（以可调用对象传入，迁移文件中只记录引用）"""
+    return image_storage
+
+
+image_storage = ContentAddressedStorage()
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """开发环境媒体文件服务：内容寻址的文件加上不可变缓存头"""
+    response = serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if HASHED_NAME.search(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
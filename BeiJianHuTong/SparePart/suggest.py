@@ -0,0 +1,227 @@
+import heapq
+import time
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from uuid import uuid4
+from zlib import crc32
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from BeiJianHuTong.conditional import bump_version, get_version
+
+SUGGEST_CACHE_PREFIX = 'spare_parts:suggest'
+SUGGEST_LIMIT = 10
+SUGGEST_MAX_LIMIT = 50
+# 索引按键的首字符分片，一次查询只读取一个分片
+SUGGEST_SHARDS = 64
+# 构建或更新索引时持有的范围锁（秒），同一范围同时只有一个请求查库构建
+SUGGEST_LOCK_TIMEOUT = 60
+# 备件变更后更新索引时等待锁的次数与间隔（秒），仍拿不到锁则改为使该范围索引作废
+SUGGEST_LOCK_ATTEMPTS = 5
+SUGGEST_LOCK_WAIT = 0.05
+# 索引正在构建时直接查库，最多取这么多行参与排序
+SUGGEST_FALLBACK_ROWS = 200
+
+
+def get_suggest_cache_timeout():
+    return getattr(settings, 'SPARE_PART_SUGGEST_CACHE_TIMEOUT', 600)
+
+
+def suggest_keys(name, model):
+    """名称、型号及去掉分隔符的型号（6205-2RS -> 62052rs），统一小写"""
+    keys = {(name or '').strip().lower(), (model or '').strip().lower()}
+    keys.add(''.join(char for char in (model or '').lower() if char.isalnum()))
+    keys.discard('')
+    return keys
+
+
+def shard_of(key):
+    return crc32(key[0].encode()) % SUGGEST_SHARDS
+
+
+def scope_generation(site_id):
+    """索引代数：site_id 为 None 表示全部场站"""
+    return f'{SUGGEST_CACHE_PREFIX}:site:{site_id}' if site_id is not None else SUGGEST_CACHE_PREFIX
+
+
+def shard_cache_key(site_id, generation, shard):
+    # 场站版本号参与键名，场站改名后索引自动作废
+    scope = 'all' if site_id is None else site_id
+    return f"{SUGGEST_CACHE_PREFIX}:{scope}:{generation}:{get_version('sites')}:{shard}"
+
+
+@contextmanager
+def scope_lock(site_id, attempts=1):
+    """范围锁（cache.add 原子占位），产出是否拿到锁；只释放自己持有的锁"""
+    key = f'{scope_generation(site_id)}:lock'
+    token = uuid4().hex
+    acquired = False
+    for attempt in range(attempts):
+        acquired = cache.add(key, token, SUGGEST_LOCK_TIMEOUT)
+        if acquired or attempt + 1 == attempts:
+            break
+        time.sleep(SUGGEST_LOCK_WAIT)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
+
+
+def build_shards(site_id):
+    """场站（None 为全部场站）的前缀索引，按键首字符分片
+
+    每个分片：有序 (键, 备件ID) 列表、{备件ID: (名称, 型号, 场站ID)}、{场站ID: 场站名称}。
+    """
+    from .models import SparePart
+
+    shards = {shard: {'keys': [], 'parts': {}, 'sites': {}} for shard in range(SUGGEST_SHARDS)}
+    rows = SparePart.objects.order_by()
+    if site_id is not None:
+        rows = rows.filter(site_id=site_id)
+    for part_id, name, model, part_site_id, site_name in rows.values_list(
+        'id', 'name', 'model', 'site_id', 'site__name'
+    ).iterator(chunk_size=2000):
+        for key in suggest_keys(name, model):
+            shard = shards[shard_of(key)]
+            shard['keys'].append((key, part_id))
+            shard['parts'][part_id] = (name, model, part_site_id)
+            shard['sites'][part_site_id] = site_name
+    for shard in shards.values():
+        shard['keys'].sort()
+    return shards
+
+
+def get_shard(site_id, prefix):
+    """读取前缀所在分片；缓存缺失时在范围锁内整体构建该范围的全部分片
+
+    其他请求正在构建时返回 None（调用方直接查库），不会多个请求同时全表构建。
+    代数在查询数据库前读取：构建期间索引被作废（代数递增）时，写入的是旧代数的键，不会被读到。
+    """
+    shard = shard_of(prefix)
+    cached = cache.get(shard_cache_key(site_id, get_version(scope_generation(site_id)), shard))
+    if cached is not None:
+        return cached
+    with scope_lock(site_id) as locked:
+        if not locked:
+            return None
+        # 拿到锁前上一个持有者可能刚构建完成
+        generation = get_version(scope_generation(site_id))
+        cached = cache.get(shard_cache_key(site_id, generation, shard))
+        if cached is not None:
+            return cached
+        shards = build_shards(site_id)
+        cache.set_many(
+            {shard_cache_key(site_id, generation, number): data for number, data in shards.items()},
+            get_suggest_cache_timeout(),
+        )
+    return shards[shard]
+
+
+def site_name_of(site_id):
+    from sites.models import Site
+
+    return Site.objects.filter(pk=site_id).values_list('name', flat=True).first()
+
+
+def update_index(part_id, old=None, new=None):
+    """备件新增、改名称/型号/场站或删除后，只改动已缓存索引中相关键所在的分片
+
+    old、new 为变更前后的 (场站ID, 名称, 型号)，新增时 old 为 None，删除时 new 为 None。
+    未缓存的分片不处理（读取时会从数据库整体构建）；拿不到范围锁时改为使该范围索引作废。
+    """
+    for site_id in {None} | {entry[0] for entry in (old, new) if entry}:
+        removed = old if old and site_id in (None, old[0]) else None
+        added = new if new and site_id in (None, new[0]) else None
+        added_keys = suggest_keys(added[1], added[2]) if added else set()
+        shards = {shard_of(key) for key in added_keys}
+        if removed:
+            shards |= {shard_of(key) for key in suggest_keys(removed[1], removed[2])}
+        if not shards:
+            continue
+        with scope_lock(site_id, attempts=SUGGEST_LOCK_ATTEMPTS) as locked:
+            if not locked:
+                bump_version(scope_generation(site_id))
+                continue
+            generation = get_version(scope_generation(site_id))
+            cache_keys = {shard_cache_key(site_id, generation, shard): shard for shard in shards}
+            cached = cache.get_many(list(cache_keys))
+            for cache_key, data in cached.items():
+                shard = cache_keys[cache_key]
+                data['keys'] = [entry for entry in data['keys'] if entry[1] != part_id]
+                data['parts'].pop(part_id, None)
+                for key in added_keys:
+                    if shard_of(key) == shard:
+                        insort(data['keys'], (key, part_id))
+                        data['parts'][part_id] = (added[1], added[2], added[0])
+                        if added[0] not in data['sites']:
+                            data['sites'][added[0]] = site_name_of(added[0])
+            if cached:
+                cache.set_many(cached, get_suggest_cache_timeout())
+
+
+def invalidate_indexes(site_ids):
+    """批量变更后使所在场站及全部场站范围的索引作废（事务提交后执行）"""
+    site_ids = {site_id for site_id in site_ids if site_id is not None}
+
+    def bump():
+        bump_version(scope_generation(None))
+        for site_id in site_ids:
+            bump_version(scope_generation(site_id))
+
+    transaction.on_commit(bump)
+
+
+def query_candidates(site_id, prefix):
+    """索引正在构建时直接查库：名称或型号前缀匹配的备件（每行附带全部键，与索引同样排序）"""
+    from .models import SparePart
+
+    rows = SparePart.objects.filter(Q(name__istartswith=prefix) | Q(model__istartswith=prefix))
+    if site_id is not None:
+        rows = rows.filter(site_id=site_id)
+    parts, sites, keys = {}, {}, []
+    for part_id, name, model, part_site_id, site_name in rows.order_by('name', 'id').values_list(
+        'id', 'name', 'model', 'site_id', 'site__name'
+    )[:SUGGEST_FALLBACK_ROWS]:
+        parts[part_id] = (name, model, part_site_id)
+        sites[part_site_id] = site_name
+        keys.extend((key, part_id) for key in suggest_keys(name, model))
+    keys.sort()
+    return {'keys': keys, 'parts': parts, 'sites': sites}
+
+
+def suggest(site_id, text, limit=SUGGEST_LIMIT):
+    """在场站（None 为全部场站）索引的对应分片中按前缀二分查找，返回最多 limit 个备件
+
+    先取出全部前缀匹配项（每个备件取其最短的键），再按键长度、字典序取前 limit 个。
+    """
+    prefix = text.strip().lower()
+    if not prefix:
+        return []
+    shard = get_shard(site_id, prefix)
+    if shard is None:
+        shard = query_candidates(site_id, prefix)
+    keys = shard['keys']
+    position = bisect_left(keys, (prefix,))
+    best = {}
+    while position < len(keys) and keys[position][0].startswith(prefix):
+        key, part_id = keys[position]
+        if part_id not in best or (len(key), key) < (len(best[part_id]), best[part_id]):
+            best[part_id] = key
+        position += 1
+    matches = heapq.nsmallest(limit, ((len(key), key, part_id) for part_id, key in best.items()))
+
+    results = []
+    for _, _, part_id in matches:
+        name, model, part_site_id = shard['parts'][part_id]
+        results.append({
+            "id": part_id,
+            "name": name,
+            "model": model,
+            "siteId": part_site_id,
+            "siteName": shard['sites'][part_site_id],
+        })
+    return results
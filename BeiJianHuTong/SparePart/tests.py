@@ -1,3 +1,1481 @@
 from django.test import TestCase
 
 # Create your tests here.
+import asyncio
+import base64
+import csv
+import json
+import math
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import zipfile
+from datetime import datetime, time, timedelta
+from functools import partial
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import Client, RequestFactory, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from accounts.serializers import SiteTokenObtainPairSerializer
+from sites.models import Site
+from .events import get_broker
+from .export import iterate_in_chunks
+from .models import (
+    Category, SparePart, SparePartForecast, SparePartOpeningBalance, SparePartTransaction,
+    SparePartTransactionArchive, StockAdjustment, StockMovementDaily, StockSnapshot,
+)
+from .storage import IMMUTABLE_CACHE_CONTROL, serve_media
+from .suggest import get_shard, scope_generation
+from .thumbnails import THUMBNAIL_DIR, THUMBNAIL_VARIANTS, delete_thumbnails, legacy_variant_name, variant_name
+
+
+class SiteFixtureMixin:
+    """北京场站与该场站用户 tech，self.client 以该用户登录"""
+
+    can_view_all_sites = False
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.site = Site.objects.create(name="北京场站", code="BJ", address="北京")
+        cls.user = User.objects.create_user(
+            username="tech", password="pwd", site=cls.site, can_view_all_sites=cls.can_view_all_sites
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class SparePartListQueryCountTest(SiteFixtureMixin, TestCase):
+    """备件列表查询次数不随分页大小增长"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        categories = [
+            Category.objects.create(name=f"分类{i}", code=f"C{i}") for i in range(3)
+        ]
+        for i in range(30):
+            SparePart.objects.create(
+                name=f"备件{i}",
+                site=cls.site,
+                category=categories[i % 3],
+                quantity=i,
+                created_by=cls.user,
+                updated_by=cls.user,
+            )
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_query_count_is_constant(self):
+        # 1 次 COUNT + 1 次带 JOIN 的分页查询
+        for limit in (5, 20):
+            with self.assertNumQueries(2):
+                response = self.client.get("/api/spare-parts/", {"limit": limit})
+            self.assertEqual(response.status_code, 200)
+            items = response.data["data"]["items"]
+            self.assertEqual(len(items), limit)
+            self.assertEqual(items[0]["stationName"], "北京场站")
+            self.assertEqual(items[0]["created_by"], "tech")
+
+
+class KeysetPaginationTest(SiteFixtureMixin, TestCase):
+    """游标分页遍历完整且不重复"""
+
+    can_view_all_sites = True
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i in range(25):
+            part = SparePart.objects.create(
+                name=f"备件{i}", site=cls.site, quantity=10, alarm_qty=5
+            )
+            SparePartTransaction.objects.create(
+                spare_part=part, transaction_type="out", quantity=i % 10, reason="检修"
+            )
+
+    def walk(self, url):
+        seen, cursor = [], ""
+        while True:
+            response = self.client.get(url, {"cursor": cursor, "limit": 7})
+            self.assertEqual(response.status_code, 200)
+            data = response.data["data"]
+            self.assertNotIn("total", data)
+            seen.extend(item["id"] for item in data["items"])
+            cursor = data["next_cursor"]
+            if cursor is None:
+                return seen
+
+    def test_spare_parts_cursor(self):
+        ids = self.walk("/api/spare-parts/")
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(len(set(ids)), 25)
+        # 告警备件（quantity <= alarm_qty）排在前面
+        alarm_ids = set(
+            SparePart.objects.filter(quantity__lte=5).values_list("id", flat=True)
+        )
+        self.assertEqual(set(ids[:len(alarm_ids)]), alarm_ids)
+
+    def test_transactions_cursor(self):
+        ids = self.walk("/api/transactions/")
+        self.assertEqual(sorted(ids), sorted(SparePartTransaction.objects.values_list("id", flat=True)))
+
+    def test_total_is_optional(self):
+        response = self.client.get("/api/transactions/", {"cursor": "", "with_total": "true"})
+        self.assertEqual(response.data["data"]["total"], 25)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/transactions/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_tampered_cursor(self):
+        for url, values in (
+            ("/api/transactions/", ["junk", 1]),
+            ("/api/transactions/", [{"a": 1}, 1]),
+            ("/api/transactions/", [None, None]),
+            ("/api/transactions/", ["2024-01-01T00:00:00+08:00", "x"]),
+            ("/api/spare-parts/", ["junk", "2024-01-01T00:00:00+08:00", 1]),
+        ):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+            response = self.client.get(url, {"cursor": cursor})
+            self.assertEqual(response.status_code, 404, values)
+
+
+class SparePartAlarmFlagTest(SiteFixtureMixin, TestCase):
+    """is_alarm 随库存变化同步"""
+
+    can_view_all_sites = True
+
+    def test_flag_follows_transactions(self):
+        part = SparePart.objects.create(name="轴承", site=self.site, quantity=10, alarm_qty=5)
+        self.assertFalse(part.is_alarm)
+        SparePartTransaction.objects.create(spare_part=part, transaction_type="out", quantity=6, reason="检修")
+        part.refresh_from_db()
+        self.assertTrue(part.is_alarm)
+        SparePartTransaction.objects.create(spare_part=part, transaction_type="in", quantity=20, reason="采购")
+        part.refresh_from_db()
+        self.assertFalse(part.is_alarm)
+
+    def test_alarm_filter(self):
+        SparePart.objects.create(name="轴承", site=self.site, quantity=1, alarm_qty=5)
+        SparePart.objects.create(name="齿轮", site=self.site, quantity=9, alarm_qty=5)
+        response = self.client.get("/api/spare-parts/", {"alarm": "true"})
+        names = [item["name"] for item in response.data["data"]["items"]]
+        self.assertEqual(names, ["轴承"])
+
+
+class TransactionStatisticsTest(SiteFixtureMixin, TestCase):
+    """出入库统计由一条聚合查询完成"""
+
+    can_view_all_sites = True
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        other = Site.objects.create(name="张北场站", code="ZB", address="张北")
+        for site in (cls.site, other):
+            part = SparePart.objects.create(name="轴承", site=site, quantity=0)
+            SparePartTransaction.objects.create(spare_part=part, transaction_type="in", quantity=10, reason="采购")
+            SparePartTransaction.objects.create(spare_part=part, transaction_type="out", quantity=3, reason="检修")
+
+    def test_totals(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/transactions/statistics/")
+        data = response.data["data"]
+        self.assertEqual(data["total_transactions"], 4)
+        self.assertEqual(data["in"], {"count": 2, "quantity": 20})
+        self.assertEqual(data["out"], {"count": 2, "quantity": 6})
+
+    def test_group_by_site(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/transactions/statistics/", {"group_by": "site"})
+        data = response.data["data"]
+        self.assertEqual(data["in"]["quantity"], 20)
+        self.assertEqual([g["site_name"] for g in data["groups"]], ["北京场站", "张北场站"])
+        self.assertEqual(data["groups"][0]["out"], {"count": 1, "quantity": 3})
+
+    def test_filter_and_group_by_day(self):
+        response = self.client.get(
+            "/api/transactions/statistics/", {"group_by": "day", "site_id": self.site.id}
+        )
+        data = response.data["data"]
+        self.assertEqual(len(data["groups"]), 1)
+        self.assertEqual(data["total_transactions"], 2)
+
+    def test_invalid_group_by(self):
+        response = self.client.get("/api/transactions/statistics/", {"group_by": "year"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_ledger_fallback_for_datetime_range(self):
+        response = self.client.get(
+            "/api/transactions/statistics/", {"start_date": "2000-01-01T00:00:00+08:00"}
+        )
+        self.assertEqual(response.data["data"]["total_transactions"], 4)
+
+    def test_invalid_params(self):
+        for params in ({"start_date": "garbage"}, {"end_date": "2024-13-45"}, {"site_id": "abc"}):
+            response = self.client.get("/api/transactions/statistics/", params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertEqual((response.data["code"], response.data["data"]), (1, None))
+        response = self.client.get("/api/transactions/", {"start_date": "garbage"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_date_only_end_includes_whole_day(self):
+        today = timezone.localdate().isoformat()
+        response = self.client.get("/api/transactions/statistics/", {"end_date": today})
+        self.assertEqual(response.data["data"]["total_transactions"], 4)
+        # 混用日期与时间时走流水表，只有日期的一端同样按整天计算
+        response = self.client.get(
+            "/api/transactions/statistics/", {"start_date": "2000-01-01T00:00:00+08:00", "end_date": today}
+        )
+        self.assertEqual(response.data["data"]["total_transactions"], 4)
+        response = self.client.get("/api/transactions/", {"start_date": today, "end_date": today})
+        self.assertEqual(response.data["data"]["total"], 4)
+
+
+class StockMovementDailyTest(SiteFixtureMixin, TestCase):
+    """出入库日汇总增量更新与重建结果一致"""
+
+    def test_incremental_matches_rebuild(self):
+        part = SparePart.objects.create(name="轴承", site=self.site, quantity=0)
+        for qty in (5, 7):
+            SparePartTransaction.objects.create(spare_part=part, transaction_type="in", quantity=qty, reason="采购")
+        SparePartTransaction.objects.create(spare_part=part, transaction_type="out", quantity=4, reason="检修")
+
+        fields = ("spare_part_id", "site_id", "day", "in_count", "in_qty", "out_count", "out_qty")
+        incremental = list(StockMovementDaily.objects.values_list(*fields))
+        self.assertEqual(len(incremental), 1)
+        self.assertEqual(incremental[0][3:], (2, 12, 1, 4))
+
+        call_command("rebuild_stock_rollup", stdout=StringIO())
+        self.assertEqual(list(StockMovementDaily.objects.values_list(*fields)), incremental)
+
+    def test_update_and_delete_keep_rollup_in_step(self):
+        part = SparePart.objects.create(name="轴承", site=self.site, quantity=10)
+        SparePartTransaction.objects.create(spare_part=part, transaction_type="in", quantity=5, reason="采购")
+        movement = SparePartTransaction.objects.create(
+            spare_part=part, transaction_type="out", quantity=3, reason="检修"
+        )
+        today = timezone.localdate().isoformat()
+        counters = StockMovementDaily.objects.values_list("in_count", "in_qty", "out_count", "out_qty")
+
+        def totals(start):
+            data = self.client.get("/api/transactions/statistics/", {"start_date": start}).data["data"]
+            return data["total_transactions"], data["in"], data["out"]
+
+        response = self.client.patch(f"/api/transactions/{movement.pk}/", {"transaction_type": "in", "quantity": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(counters.get(), (2, 7, 0, 0))
+        # 只有日期（读日汇总）与带时间（读流水）的结果一致
+        self.assertEqual(totals(today), totals(f"{today}T00:00:00"))
+
+        self.assertEqual(self.client.delete(f"/api/transactions/{movement.pk}/").status_code, 204)
+        self.assertEqual(counters.get(), (1, 5, 0, 0))
+        self.assertEqual(totals(today), totals(f"{today}T00:00:00"))
+        self.assertEqual(totals(today), (1, {"count": 1, "quantity": 5}, {"count": 0, "quantity": 0}))
+
+    def test_moving_part_moves_rollup(self):
+        other = Site.objects.create(name="张北场站", code="ZB", address="张北")
+        part = SparePart.objects.create(name="轴承", site=self.site, quantity=0)
+        SparePartTransaction.objects.create(spare_part=part, transaction_type="in", quantity=5, reason="采购")
+        part.site = other
+        part.save()
+        self.assertEqual(StockMovementDaily.objects.get().site_id, other.pk)
+
+
+class InsufficientStockTest(SiteFixtureMixin, TestCase):
+    """出库超过库存时返回校验错误"""
+
+    def test_out_exceeding_stock_is_rejected(self):
+        part = SparePart.objects.create(name="轴承", site=self.site, quantity=3)
+        response = self.client.post("/api/transactions/", {
+            "spare_part": part.id, "transaction_type": "out", "quantity": 5, "reason": "检修"
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("quantity", response.data)
+        part.refresh_from_db()
+        self.assertEqual(part.quantity, 3)
+        self.assertFalse(SparePartTransaction.objects.exists())
+
+
+class StockRowLockTest(SiteFixtureMixin, TestCase):
+    """出入库在事务中先锁定备件行再读改写库存（不依赖数据库是否支持并发测试）"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.part = SparePart.objects.create(name="轴承", site=cls.site, quantity=30)
+
+    def test_transaction_locks_spare_part_row(self):
+        manager = SparePart.objects
+        outer_depth = len(connection.atomic_blocks)
+        lock_depths = []
+
+        def select_for_update(*args, **kwargs):
+            lock_depths.append(len(connection.atomic_blocks) - outer_depth)
+            return type(manager).select_for_update(manager, *args, **kwargs)
+
+        with mock.patch.object(manager, "select_for_update", side_effect=select_for_update):
+            with CaptureQueriesContext(connection) as queries:
+                SparePartTransaction.objects.create(spare_part=self.part, transaction_type="out", quantity=1)
+        # 加锁发生在 save() 自己开启的事务内
+        self.assertEqual(lock_depths, [1])
+        if connection.features.has_select_for_update:
+            self.assertTrue(any("FOR UPDATE" in query["sql"] for query in queries.captured_queries))
+        self.part.refresh_from_db()
+        self.assertEqual(self.part.quantity, 29)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentStockUpdateTest(TransactionTestCase):
+    """50 个并发出库请求同时操作同一备件，库存变动不丢失"""
+
+    workers = 50
+
+    def setUp(self):
+        site = Site.objects.create(name="北京场站", code="BJ", address="北京")
+        self.user = User.objects.create_user(username="admin", password="pwd", site=site)
+        self.part = SparePart.objects.create(name="轴承", site=site, quantity=30)
+
+    def run_concurrently(self, transaction_type):
+        barrier = threading.Barrier(self.workers)
+        statuses = []
+
+        def worker():
+            try:
+                client = APIClient()
+                client.force_authenticate(self.user)
+                barrier.wait()
+                response = client.post("/api/transactions/", {
+                    "spare_part": self.part.id,
+                    "transaction_type": transaction_type,
+                    "quantity": 1,
+                    "reason": "并发测试",
+                })
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    def test_concurrent_check_in(self):
+        statuses = self.run_concurrently("in")
+        self.assertEqual(statuses.count(201), self.workers)
+        self.part.refresh_from_db()
+        self.assertEqual(self.part.quantity, 30 + self.workers)
+        self.assertEqual(StockMovementDaily.objects.get().in_qty, self.workers)
+
+    def test_concurrent_check_out_never_oversells(self):
+        statuses = self.run_concurrently("out")
+        self.assertEqual(statuses.count(201), 30)
+        self.assertEqual(statuses.count(400), self.workers - 30)
+        self.part.refresh_from_db()
+        self.assertEqual(self.part.quantity, 0)
+        self.assertEqual(SparePartTransaction.objects.count(), 30)
+
+
+class BulkTransactionTest(SiteFixtureMixin, TestCase):
+    """批量出入库"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.part = SparePart.objects.create(name="轴承", site=cls.site, quantity=5)
+
+    def post(self, items, mode="atomic"):
+        return self.client.post("/api/transactions/bulk/", {"mode": mode, "items": items}, format="json")
+
+    def test_mixed_batch(self):
+        items = [
+            {"spare_part": self.part.id, "transaction_type": "out", "quantity": 2, "reason": "检修"},
+            {"spare_part_name_input": "齿轮", "spare_part_site_id": self.site.id,
+             "transaction_type": "in", "quantity": 10, "reason": "到货"},
+            {"spare_part_name_input": "齿轮", "spare_part_site_id": self.site.id,
+             "transaction_type": "out", "quantity": 4, "reason": "检修"},
+        ]
+        response = self.post(items)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["data"]["created"], 3)
+        self.part.refresh_from_db()
+        self.assertEqual(self.part.quantity, 3)
+        self.assertTrue(self.part.is_alarm)
+        gear = SparePart.objects.get(name="齿轮", site=self.site)
+        self.assertEqual(gear.quantity, 6)
+        self.assertEqual(SparePartTransaction.objects.count(), 3)
+        rollup = StockMovementDaily.objects.get(spare_part=gear)
+        self.assertEqual((rollup.in_qty, rollup.out_qty), (10, 4))
+
+    def test_atomic_mode_rolls_back_everything(self):
+        items = [
+            {"spare_part": self.part.id, "transaction_type": "in", "quantity": 1, "reason": "到货"},
+            {"spare_part": self.part.id, "transaction_type": "out", "quantity": 99, "reason": "检修"},
+        ]
+        response = self.post(items)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["data"]["errors"][0]["index"], 1)
+        self.part.refresh_from_db()
+        self.assertEqual(self.part.quantity, 5)
+        self.assertFalse(SparePartTransaction.objects.exists())
+
+    def test_best_effort_mode_keeps_valid_items(self):
+        items = [
+            {"spare_part": self.part.id, "transaction_type": "in", "quantity": 1, "reason": "到货"},
+            {"spare_part": 999999, "transaction_type": "in", "quantity": 1, "reason": "到货"},
+            {"spare_part": self.part.id, "transaction_type": "in", "reason": "到货"},
+        ]
+        response = self.post(items, mode="best_effort")
+        self.assertEqual(response.status_code, 201)
+        data = response.data["data"]
+        self.assertEqual((data["created"], data["failed"]), (1, 2))
+        self.assertEqual([error["index"] for error in data["errors"]], [1, 2])
+        self.part.refresh_from_db()
+        self.assertEqual(self.part.quantity, 6)
+
+
+class ExportTest(SiteFixtureMixin, TestCase):
+    """导出遵循列表接口的场站权限与筛选"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        other = Site.objects.create(name="张北场站", code="ZB", address="张北")
+        for i in range(5):
+            SparePart.objects.create(name=f"备件{i}", site=cls.site, quantity=i)
+        SparePart.objects.create(name="外站备件", site=other, quantity=1)
+
+    def test_csv_export_is_scoped_to_user_site(self):
+        with mock.patch("SparePart.views.iterate_in_chunks", partial(iterate_in_chunks, chunk_size=2)):
+            response = self.client.get("/api/spare-parts/export/")
+            content = b"".join(response.streaming_content).decode("utf-8-sig")
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(rows[0][:2], ["ID", "备件名称"])
+        self.assertEqual(sorted(row[1] for row in rows[1:]), [f"备件{i}" for i in range(5)])
+
+    def test_xlsx_export_is_valid_zip(self):
+        response = self.client.get("/api/spare-parts/export/", {"file_format": "xlsx", "alarm": "true"})
+        archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode()
+        self.assertEqual(sheet.count("<row>"), 1 + SparePart.objects.filter(site=self.site, is_alarm=True).count())
+
+    def test_transaction_export(self):
+        part = SparePart.objects.get(name="备件3")
+        SparePartTransaction.objects.create(spare_part=part, transaction_type="out", quantity=1, reason="检修")
+        response = self.client.get("/api/transactions/export/")
+        content = b"".join(response.streaming_content).decode("utf-8-sig")
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][6], "出库")
+
+
+class SparePartImportTest(SiteFixtureMixin, TestCase):
+    """备件目录批量导入"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = Site.objects.create(name="张北场站", code="ZB", address="张北")
+        cls.category = Category.objects.create(name="轴承类", code="BRG")
+        SparePart.objects.create(name="轴承", site=cls.site, quantity=1, alarm_qty=5, location="A1")
+
+    def upload(self, content):
+        file = SimpleUploadedFile("parts.csv", content.encode("utf-8-sig"), content_type="text/csv")
+        return self.client.post("/api/spare-parts/import/", {"file": file}, format="multipart")
+
+    def test_upsert_and_row_errors(self):
+        response = self.upload(
+            "备件名称,场站代码,分类编码,当前数量,库存预警数量\n"
+            "轴承,BJ,BRG,20,5\n"
+            "齿轮,BJ,,3,5\n"
+            "联轴器,ZB,,1,1\n"
+            "刹车片,XX,,1,1\n"
+            "滤芯,BJ,NOPE,abc,1\n"
+        )
+        self.assertEqual(response.status_code, 200)
+        report = response.data["data"]
+        self.assertEqual((report["total"], report["imported"]), (5, 2))
+        self.assertEqual([error["row"] for error in report["errors"]], [4, 5, 6])
+        self.assertEqual(set(report["errors"][2]["errors"]), {"quantity", "category_code"})
+
+        bearing = SparePart.objects.get(name="轴承", site=self.site)
+        self.assertEqual((bearing.quantity, bearing.category, bearing.location), (20, self.category, "A1"))
+        self.assertFalse(bearing.is_alarm)
+        # 导入改动的数量不经流水，记为待审核的调整；新建备件的初始数量直接计入
+        self.assertEqual(bearing.stock_adjustment, 1)
+        self.assertEqual(
+            list(bearing.stock_adjustments.values_list("delta", "source", "approved", "operator")),
+            [(19, "import", False, self.user.pk), (1, "initial", True, None)],
+        )
+        gear = SparePart.objects.get(name="齿轮", site=self.site)
+        self.assertTrue(gear.is_alarm)
+        self.assertEqual(gear.created_by, self.user)
+        self.assertFalse(SparePart.objects.filter(site=self.other).exists())
+
+    def test_blank_cells_keep_existing_values(self):
+        bearing = SparePart.objects.get(name="轴承", site=self.site)
+        bearing.category = self.category
+        bearing.status = "inactive"
+        bearing.save()
+        response = self.upload(
+            "备件名称,分类编码,当前数量,库存预警数量,状态,备件位置\n"
+            "轴承,,,8,,\n"
+            "齿轮,,,,,\n"
+        )
+        self.assertEqual(response.data["data"]["imported"], 2)
+        bearing.refresh_from_db()
+        self.assertEqual(
+            (bearing.quantity, bearing.alarm_qty, bearing.category, bearing.location, bearing.status),
+            (1, 8, self.category, "A1", "inactive"),
+        )
+        self.assertFalse(bearing.stock_adjustments.filter(source="import").exists())
+        # 新建备件的空列取默认值
+        gear = SparePart.objects.get(name="齿轮", site=self.site)
+        self.assertEqual((gear.quantity, gear.alarm_qty, gear.category), (0, 5, None))
+
+    def test_missing_name_column(self):
+        response = self.upload("model,quantity\nX,1\n")
+        self.assertEqual(response.status_code, 400)
+
+
+# 条件 GET 只在共享缓存下启用，相关测试改用文件缓存
+SHARED_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(tempfile.gettempdir(), "bjht-test-cache"),
+    }
+}
+
+
+class TemporaryMediaMixin(SiteFixtureMixin):
+    """使用临时 MEDIA_ROOT"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.media_root = media_root
+
+    def make_image(self, name="capture.png", size=(1600, 1200)):
+        buffer = BytesIO()
+        Image.new("RGBA", size, (200, 30, 30, 255)).save(buffer, "PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class ThumbnailTest(TemporaryMediaMixin, TestCase):
+    """上传图片后生成缩略图，列表只返回缩略图地址"""
+
+    def test_thumbnails_generated_on_upload(self):
+        part = SparePart.objects.create(name="轴承", site=self.site, image=self.make_image())
+        for variant, (size, _, _) in THUMBNAIL_VARIANTS.items():
+            path = os.path.join(self.media_root, variant_name(part.image.name, variant))
+            with Image.open(path) as thumbnail:
+                self.assertLessEqual(max(thumbnail.size), size)
+
+        item = self.client.get("/api/spare-parts/").data["data"]["items"][0]
+        self.assertEqual(set(item["thumbnails"]), set(THUMBNAIL_VARIANTS))
+        self.assertEqual(item["imageUrl"], item["thumbnails"]["medium"])
+        detail = self.client.get(f"/api/spare-parts/{part.id}/").data["data"]
+        self.assertEqual(detail["imageUrl"], part.image.url)
+
+    def test_unreadable_image_falls_back_to_original(self):
+        # 模型层不校验图片内容，Pillow 无法解析时不生成缩略图
+        broken = SimpleUploadedFile("broken.png", b"not an image", content_type="image/png")
+        with self.assertLogs("SparePart.thumbnails", "WARNING"):
+            part = SparePart.objects.create(name="轴承", site=self.site, image=broken)
+        part.refresh_from_db()
+        self.assertFalse(part.has_thumbnails)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, variant_name(part.image.name, "medium"))))
+
+        item = self.client.get("/api/spare-parts/").data["data"]["items"][0]
+        self.assertEqual(item["imageUrl"], part.image.url)
+        self.assertIsNone(item["thumbnails"])
+
+    def test_variant_names_keep_extension(self):
+        self.assertNotEqual(variant_name("spare_parts/a.png", "small"), variant_name("spare_parts/a.jpg", "small"))
+
+    def test_backfill_command(self):
+        part = SparePart.objects.create(name="轴承", site=self.site, image=self.make_image())
+        for variant in THUMBNAIL_VARIANTS:
+            os.remove(os.path.join(self.media_root, variant_name(part.image.name, variant)))
+        # 升级前的数据：未记录缩略图，且缩略图为旧版命名
+        SparePart.objects.filter(pk=part.pk).update(has_thumbnails=False)
+        legacy = os.path.join(self.media_root, legacy_variant_name(part.image.name, "small"))
+        with open(legacy, "wb") as file:
+            file.write(b"legacy")
+        self.assertEqual(self.client.get("/api/spare-parts/").data["data"]["items"][0]["imageUrl"], part.image.url)
+
+        call_command("generate_thumbnails", stdout=StringIO())
+        for variant in THUMBNAIL_VARIANTS:
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, variant_name(part.image.name, variant))))
+        self.assertFalse(os.path.exists(legacy))
+        item = self.client.get("/api/spare-parts/").data["data"]["items"][0]
+        self.assertEqual(item["imageUrl"], item["thumbnails"]["medium"])
+
+
+class ContentAddressedImageTest(TemporaryMediaMixin, TestCase):
+    """相同图片只存一份，按引用计数删除"""
+
+    def test_identical_uploads_share_one_blob(self):
+        first = SparePart.objects.create(name="轴承", site=self.site, image=self.make_image("Capture001.png"))
+        second = SparePart.objects.create(name="齿轮", site=self.site, image=self.make_image("Capture001.png"))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r"^spare_parts/[0-9a-f]{2}/[0-9a-f]{64}\.png$")
+        path = first.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, variant_name(path, "small"))))
+
+    def test_replacing_image_releases_unreferenced_blob(self):
+        part = SparePart.objects.create(name="轴承", site=self.site, image=self.make_image())
+        old_path = part.image.path
+        part.image = self.make_image(size=(640, 480))
+        with self.captureOnCommitCallbacks(execute=True):
+            part.save()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(part.image.path))
+
+    def test_clearing_image_releases_blob(self):
+        part = SparePart.objects.create(name="轴承", site=self.site, image=self.make_image())
+        path = part.image.path
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f"/api/spare-parts/{part.pk}/", {"image": ""}, format="multipart")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertFalse(SparePart.objects.get(pk=part.pk).image)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, variant_name(path, "small"))))
+
+    def test_upload_restores_blob_released_concurrently(self):
+        first = SparePart.objects.create(name="轴承", site=self.site, image=self.make_image())
+        path = first.image.path
+        with self.captureOnCommitCallbacks(execute=True):
+            second = SparePart.objects.create(name="齿轮", site=self.site, image=self.make_image())
+            # 另一事务删除 first 后的 release_image 在本次上传提交前执行，已删除共用的文件
+            delete_thumbnails(first.image.storage, first.image.name)
+            first.image.storage.delete(first.image.name)
+        self.assertEqual(second.image.path, path)
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, variant_name(path, "small"))))
+
+    def test_legacy_image_thumbnails_use_computed_names(self):
+        name = "spare_parts/Capture001.png"
+        os.makedirs(os.path.join(self.media_root, "spare_parts"))
+        with open(os.path.join(self.media_root, name), "wb") as file:
+            file.write(self.make_image().read())
+        part = SparePart.objects.create(name="轴承", site=self.site)
+        SparePart.objects.filter(pk=part.pk).update(image=name)
+
+        call_command("generate_thumbnails", stdout=StringIO())
+        part.refresh_from_db()
+        self.assertTrue(part.has_thumbnails)
+        paths = [os.path.join(self.media_root, variant_name(name, variant)) for variant in THUMBNAIL_VARIANTS]
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+        delete_thumbnails(part.image.storage, name)
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+        self.assertEqual(os.listdir(os.path.join(self.media_root, THUMBNAIL_DIR)), [])
+
+    def test_hashed_media_is_served_immutable(self):
+        part = SparePart.objects.create(name="轴承", site=self.site, image=self.make_image())
+        response = serve_media(RequestFactory().get("/"), part.image.name, document_root=self.media_root)
+        self.assertEqual(response["Cache-Control"], IMMUTABLE_CACHE_CONTROL)
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class ConditionalGetTest(SiteFixtureMixin, TestCase):
+    """分类列表、备件详情的 ETag 条件请求"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.category = Category.objects.create(name="轴承", code="ZC")
+        cls.part = SparePart.objects.create(name="轴承", site=cls.site, category=cls.category, quantity=10)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_category_list_not_modified_without_queries(self):
+        response = self.client.get("/api/categories/")
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/categories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.category.name = "滚动轴承"
+        self.category.save()
+        response = self.client.get("/api/categories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_detail_changes_with_stock_movement(self):
+        url = f"/api/spare-parts/{self.part.pk}/"
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        SparePartTransaction.objects.create(
+            spare_part=self.part, transaction_type="out", quantity=1, reason="维修", operator=self.user
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["quantity"], 9)
+
+    def test_detail_changes_with_username(self):
+        part = SparePart.objects.create(name="齿轮", site=self.site, created_by=self.user, updated_by=self.user)
+        url = f"/api/spare-parts/{part.pk}/"
+        etag = self.client.get(url)["ETag"]
+        self.user.username = "engineer"
+        self.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["created_by"], "engineer")
+
+        # 只更新登录时间不影响已发出的 ETag
+        etag = response["ETag"]
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=["last_login"])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_missing_detail_is_404(self):
+        self.assertEqual(self.client.get("/api/spare-parts/0/").status_code, 404)
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_disabled_without_shared_cache(self):
+        url = f"/api/spare-parts/{self.part.pk}/"
+        response = self.client.get(url)
+        self.assertNotIn("ETag", response)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH="*").status_code, 200)
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class SparePartListCacheTest(SiteFixtureMixin, TestCase):
+    """备件列表缓存：按场站代数失效，不同可见范围互不影响"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_site = Site.objects.create(name="天津场站", code="TJ", address="天津")
+        cls.admin = User.objects.create_user(username="admin", password="pwd", can_view_all_sites=True)
+        cls.part = SparePart.objects.create(name="轴承", site=cls.site, quantity=10, created_by=cls.user)
+        cls.other_part = SparePart.objects.create(name="齿轮", site=cls.other_site, quantity=10)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def quantities(self, **params):
+        response = self.client.get("/api/spare-parts/", params)
+        return {item["name"]: item["quantity"] for item in response.data["data"]["items"]}
+
+    def test_repeated_request_is_served_from_cache(self):
+        self.assertEqual(self.quantities(), {"轴承": 10})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.quantities(), {"轴承": 10})
+
+    def test_write_invalidates_own_site_only(self):
+        self.quantities()
+        with self.captureOnCommitCallbacks(execute=True):
+            SparePartTransaction.objects.create(
+                spare_part=self.part, transaction_type="out", quantity=3, reason="维修", operator=self.user
+            )
+        self.assertEqual(self.quantities(), {"轴承": 7})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SparePartTransaction.objects.create(
+                spare_part=self.other_part, transaction_type="in", quantity=1, reason="采购", operator=self.user
+            )
+        with self.assertNumQueries(0):
+            self.quantities()
+
+    def test_scope_is_part_of_key(self):
+        self.assertEqual(self.quantities(), {"轴承": 10})
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.quantities(), {"轴承": 10, "齿轮": 10})
+
+    def test_bulk_transactions_invalidate(self):
+        self.quantities()
+        self.client.post("/api/transactions/bulk/", {"items": [
+            {"spare_part": self.part.pk, "transaction_type": "in", "quantity": 5, "reason": "采购"},
+        ]}, format="json")
+        self.assertEqual(self.quantities(), {"轴承": 15})
+
+    def test_username_change_invalidates(self):
+        self.quantities()
+        self.user.username = "tech2"
+        self.user.save()
+        items = self.client.get("/api/spare-parts/").data["data"]["items"]
+        self.assertEqual(items[0]["created_by"], "tech2")
+
+    def test_thumbnail_flag_invalidates(self):
+        SparePart.objects.filter(pk=self.part.pk).update(image="spare_parts/a.png")
+        cache.clear()
+        self.client.get("/api/spare-parts/")
+        SparePart.mark_thumbnails("spare_parts/a.png")
+        items = self.client.get("/api/spare-parts/").data["data"]["items"]
+        self.assertIsNotNone(items[0]["thumbnails"])
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_process_local_cache_disables_list_cache(self):
+        # 代数递增其他进程看不到，进程内缓存下不缓存列表
+        self.quantities()
+        with CaptureQueriesContext(connection) as queries:
+            self.quantities()
+        self.assertTrue(queries.captured_queries)
+
+
+class SparePartSearchTest(SiteFixtureMixin, TestCase):
+    """备件搜索：中文二元组、型号前缀、多字段与相关度排序"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        SparePart.objects.create(name="深沟球轴承", model="6205-2RS", site=cls.site, supplier="人本集团")
+        SparePart.objects.create(name="齿轮箱油", model="MOBIL-XMP320", site=cls.site, description="适用于深沟球轴承润滑")
+        SparePart.objects.create(name="变桨电机", model="YVP-112", site=cls.site, supplier_code="SKF01")
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def search(self, text):
+        response = self.client.get("/api/spare-parts/", {"search": text})
+        return [item["name"] for item in response.data["data"]["items"]]
+
+    def test_chinese_name_ranks_above_description(self):
+        self.assertEqual(self.search("球轴承"), ["深沟球轴承", "齿轮箱油"])
+
+    def test_model_prefix(self):
+        self.assertEqual(self.search("6205"), ["深沟球轴承"])
+        self.assertEqual(self.search("mobil-x"), ["齿轮箱油"])
+        self.assertEqual(self.search("62052r"), ["深沟球轴承"])
+
+    def test_single_character_anywhere_in_word(self):
+        # 词尾的字只出现在二元组第二位（“主轴”中的“轴”）
+        self.assertEqual(self.search("油"), ["齿轮箱油"])
+        self.assertEqual(self.search("承"), ["深沟球轴承", "齿轮箱油"])
+        self.assertEqual(self.search("桨"), ["变桨电机"])
+
+    def test_supplier_fields_and_all_terms_required(self):
+        self.assertEqual(self.search("skf"), ["变桨电机"])
+        self.assertEqual(self.search("人本"), ["深沟球轴承"])
+        self.assertEqual(self.search("轴承 yvp"), [])
+
+    def test_query_without_terms(self):
+        self.assertEqual(self.search("!!!"), [])
+        response = self.client.get("/api/spare-parts/", {"search": "+-*", "cursor": ""})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["items"], [])
+
+    def test_index_follows_updates(self):
+        part = SparePart.objects.get(name="变桨电机")
+        part.name = "偏航电机"
+        part.save()
+        self.assertEqual(self.search("偏航"), ["偏航电机"])
+        self.assertEqual(self.search("变桨"), [])
+
+    def test_rebuild_command(self):
+        from .models import SparePartSearchToken
+        SparePartSearchToken.objects.all().delete()
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.search("深沟"), ["深沟球轴承", "齿轮箱油"])
+
+
+class SuggestTest(SiteFixtureMixin, TestCase):
+    """输入联想：前缀索引分片命中缓存时不查备件表，名称/型号变化后作废重建"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_site = Site.objects.create(name="天津场站", code="TJ", address="天津")
+        cls.part = SparePart.objects.create(name="深沟球轴承", model="6205-2RS", site=cls.site)
+        SparePart.objects.create(name="深沟球轴承", model="6206-2RS", site=cls.other_site)
+        SparePart.objects.create(name="齿轮箱油", model="XMP320", site=cls.site)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def suggest(self, q, **params):
+        return self.client.get("/api/spare-parts/suggest/", {"q": q, **params}).data["data"]
+
+    def test_prefix_match_on_name_and_model(self):
+        self.assertEqual(self.suggest("深沟"), [{
+            "id": self.part.pk, "name": "深沟球轴承", "model": "6205-2RS",
+            "siteId": self.site.pk, "siteName": "北京场站",
+        }])
+        self.assertEqual([item["name"] for item in self.suggest("62052")], ["深沟球轴承"])
+        self.assertEqual([item["name"] for item in self.suggest("xmp")], ["齿轮箱油"])
+
+    def test_warm_index_needs_no_queries(self):
+        self.suggest("深")
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.suggest("齿")), 1)
+
+    def test_changes_update_index_in_place(self):
+        self.suggest("深")
+        with self.captureOnCommitCallbacks(execute=True):
+            SparePart.objects.create(name="偏航电机", model="YVP-112", site=self.site)
+            self.part.name = "角接触轴承"
+            self.part.save()
+            SparePart.objects.get(name="齿轮箱油").delete()
+        # 只改动相关分片，不整体重建
+        with self.assertNumQueries(0):
+            self.assertEqual([item["name"] for item in self.suggest("偏航")], ["偏航电机"])
+            self.assertEqual([item["name"] for item in self.suggest("角接触")], ["角接触轴承"])
+            self.assertEqual(self.suggest("深沟"), [])
+            self.assertEqual(self.suggest("xmp"), [])
+
+    def test_moving_site_updates_both_scopes(self):
+        self.user.can_view_all_sites = True
+        for site_id in (self.site.pk, self.other_site.pk, ""):
+            self.suggest("深沟", site_id=site_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.part.name, self.part.site = "深沟球轴承（备用）", self.other_site
+            self.part.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.suggest("深沟", site_id=self.other_site.pk)), 2)
+            self.assertEqual(len(self.suggest("深沟", site_id=self.site.pk)), 0)
+            self.assertEqual(
+                {item["siteName"] for item in self.suggest("6205")}, {"天津场站"}
+            )
+
+    def test_index_built_before_commit_is_not_reused(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.part.name = "角接触轴承"
+            self.part.save()
+            # 提交前并发请求按旧代数构建并缓存的索引
+            self.suggest("深")
+        self.assertEqual([item["name"] for item in self.suggest("角接触")], ["角接触轴承"])
+
+    def test_all_sites_and_limit(self):
+        self.user.can_view_all_sites = True
+        with self.assertNumQueries(1):  # 全部场站共用一份索引，不逐场站读取
+            self.assertEqual(len(self.suggest("深沟")), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.suggest("深沟", limit=1)), 1)
+        self.assertEqual(len(self.suggest("深沟", site_id=self.other_site.pk)), 1)
+
+    def test_limit_keeps_shortest_matches(self):
+        SparePart.objects.create(name="联轴器", model="AAAAAAAAAA", site=self.site)
+        SparePart.objects.create(name="刹车片", model="AB", site=self.site)
+        self.assertEqual([item["model"] for item in self.suggest("a", limit=1)], ["AB"])
+
+    def test_falls_back_to_query_while_index_is_being_built(self):
+        cache.add(f"{scope_generation(self.site.pk)}:lock", "other", 60)
+        with self.assertNumQueries(1):
+            self.assertEqual([item["model"] for item in self.suggest("深沟")], ["6205-2RS"])
+        self.assertIsNone(get_shard(self.site.pk, "深"))
+
+
+class ForecastTest(SiteFixtureMixin, TestCase):
+    """消耗预测：向量化结果与逐个备件按定义计算一致"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.steady = SparePart.objects.create(name="滤芯", site=cls.site, quantity=10, procurement_days=7)
+        cls.bursty = SparePart.objects.create(name="碳刷", site=cls.site, quantity=100, procurement_days=4)
+        cls.idle = SparePart.objects.create(name="备用电机", site=cls.site, quantity=3, procurement_days=30)
+        today = timezone.localdate()
+        SparePart.objects.update(created_at=timezone.now() - timedelta(days=200))
+        cls.bursty_usage = [0] * 30
+        cls.bursty_usage[3], cls.bursty_usage[17] = 12, 6
+        rows = [
+            StockMovementDaily(spare_part=cls.steady, site=cls.site, day=today - timedelta(days=day + 1), out_qty=2)
+            for day in range(30)
+        ] + [
+            StockMovementDaily(spare_part=cls.bursty, site=cls.site, day=today - timedelta(days=day + 1), out_qty=qty)
+            for day, qty in enumerate(cls.bursty_usage) if qty
+        ]
+        StockMovementDaily.objects.bulk_create(rows)
+
+    def setUp(self):
+        super().setUp()
+        call_command("forecast_stock", "--window-days", "30", stdout=StringIO())
+
+    def test_forecast_values(self):
+        steady = SparePartForecast.objects.get(spare_part=self.steady)
+        self.assertEqual((steady.daily_usage, steady.usage_std, steady.safety_stock), (2, 0, 0))
+        self.assertEqual(steady.reorder_point, 14)
+        self.assertEqual(steady.days_to_stockout, 5)
+
+        bursty = SparePartForecast.objects.get(spare_part=self.bursty)
+        mean, std = statistics.mean(self.bursty_usage), statistics.stdev(self.bursty_usage)
+        z = statistics.NormalDist().inv_cdf(0.95)
+        self.assertAlmostEqual(bursty.daily_usage, mean, places=3)
+        self.assertAlmostEqual(bursty.usage_std, std, places=3)
+        self.assertEqual(bursty.safety_stock, math.ceil(z * std * 2))
+        self.assertEqual(bursty.reorder_point, math.ceil(mean * 4 + bursty.safety_stock))
+
+        idle = SparePartForecast.objects.get(spare_part=self.idle)
+        self.assertIsNone(idle.days_to_stockout)
+        self.assertEqual(idle.reorder_point, 0)
+
+    def test_api_lists_at_risk_first(self):
+        items = self.client.get("/api/spare-parts/forecast/").data["data"]["items"]
+        self.assertEqual([item["name"] for item in items], ["滤芯", "碳刷", "备用电机"])
+        items = self.client.get("/api/spare-parts/forecast/", {"at_risk": "true"}).data["data"]["items"]
+        self.assertEqual([item["name"] for item in items], ["滤芯"])
+
+    def test_rerun_updates_in_place(self):
+        call_command("forecast_stock", "--window-days", "30", stdout=StringIO())
+        self.assertEqual(SparePartForecast.objects.count(), 3)
+
+
+class TransferSuggestionTest(TestCase):
+    """跨场站调拨建议：按富余量排序，一次查询取回所有捐出方"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sites = [Site.objects.create(name=f"场站{i}", code=f"S{i}", address="地址") for i in range(4)]
+        cls.user = User.objects.create_user(username="tech", password="pwd", site=cls.sites[0])
+        cls.low = SparePart.objects.create(name="轴承", model="6205", site=cls.sites[0], quantity=1, alarm_qty=5)
+        SparePart.objects.create(name="齿轮", model="Z20", site=cls.sites[0], quantity=0, alarm_qty=2)
+        SparePart.objects.create(name="滤芯", model="F1", site=cls.sites[0], quantity=9, alarm_qty=2)
+        SparePart.objects.create(name="轴承", model="6205", site=cls.sites[1], quantity=8, alarm_qty=5)
+        SparePart.objects.create(name="轴承", model="6205", site=cls.sites[2], quantity=20, alarm_qty=5)
+        SparePart.objects.create(name="轴承", model="6206", site=cls.sites[3], quantity=50, alarm_qty=5)
+        SparePart.objects.create(name="齿轮", model="Z20", site=cls.sites[3], quantity=2, alarm_qty=2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_alarming_parts_of_own_site(self):
+        # 告警备件 1 次 + 捐出方 1 次
+        with self.assertNumQueries(2):
+            data = self.client.get("/api/spare-parts/availability/").data["data"]
+        by_name = {item["name"]: item for item in data}
+        self.assertEqual(set(by_name), {"轴承", "齿轮"})
+
+        bearing = by_name["轴承"]
+        self.assertEqual(bearing["shortage"], 5)
+        self.assertEqual(
+            [(donor["siteId"], donor["surplus"], donor["suggestedQty"]) for donor in bearing["donors"]],
+            [(self.sites[2].pk, 15, 5), (self.sites[1].pk, 3, 0)],
+        )
+        self.assertEqual(bearing["uncovered"], 0)
+        # 其他场站没有富余
+        self.assertEqual(by_name["齿轮"]["donors"], [])
+        self.assertEqual(by_name["齿轮"]["uncovered"], 3)
+
+    def test_single_part_and_scope(self):
+        data = self.client.get("/api/spare-parts/availability/", {"spare_part_id": self.low.pk}).data["data"]
+        self.assertEqual([item["sparePartId"] for item in data], [self.low.pk])
+
+        other = SparePart.objects.get(site=self.sites[1])
+        data = self.client.get("/api/spare-parts/availability/", {"spare_part_id": other.pk}).data["data"]
+        self.assertEqual(data, [])
+
+    def test_requires_part_or_site(self):
+        admin = User.objects.create_user(username="admin", password="pwd", can_view_all_sites=True)
+        self.client.force_authenticate(admin)
+        response = self.client.get("/api/spare-parts/availability/")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((response.data["code"], response.data["data"]), (1, None))
+
+
+class TransactionArchiveTest(SiteFixtureMixin, TestCase):
+    """早期流水归档：期初结余 + 归档表，查询可选择合并"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.part = SparePart.objects.create(name="轴承", site=cls.site, quantity=0)
+        old = timezone.now() - timedelta(days=900)
+        for offset, (kind, qty) in enumerate([("in", 10), ("out", 3), ("in", 5)]):
+            movement = SparePartTransaction.objects.create(
+                spare_part=cls.part, transaction_type=kind, quantity=qty, reason="历史", operator=cls.user
+            )
+            SparePartTransaction.objects.filter(pk=movement.pk).update(created_at=old + timedelta(days=offset))
+        cls.recent = SparePartTransaction.objects.create(
+            spare_part=cls.part, transaction_type="out", quantity=2, reason="检修", operator=cls.user
+        )
+        call_command("archive_transactions", "--months", "24", "--batch-size", "2", stdout=StringIO())
+
+    def test_old_rows_folded_into_opening_balance(self):
+        self.assertEqual(list(SparePartTransaction.objects.values_list("pk", flat=True)), [self.recent.pk])
+        self.assertEqual(SparePartTransactionArchive.objects.count(), 3)
+        balance = SparePartOpeningBalance.objects.get(spare_part=self.part)
+        self.assertEqual((balance.in_count, balance.in_qty, balance.out_count, balance.out_qty), (2, 15, 1, 3))
+        self.assertEqual(balance.net_quantity - self.recent.quantity, SparePart.objects.get(pk=self.part.pk).quantity)
+
+    def test_list_excludes_archive_by_default(self):
+        data = self.client.get("/api/transactions/").data["data"]
+        self.assertEqual(data["total"], 1)
+
+        data = self.client.get("/api/transactions/", {"include_archive": "true"}).data["data"]
+        self.assertEqual(data["total"], 4)
+        self.assertEqual([item["quantity"] for item in data["items"]], [2, 5, 3, 10])
+        self.assertEqual(data["items"][1]["spare_part_name"], "轴承")
+
+        response = self.client.get("/api/transactions/", {"include_archive": "true", "cursor": ""})
+        self.assertEqual(response.status_code, 400)
+
+    def test_statistics_include_archive(self):
+        params = {"start_date": "2000-01-01T00:00:00+08:00"}
+        data = self.client.get("/api/transactions/statistics/", params).data["data"]
+        self.assertEqual(data["total_transactions"], 1)
+        data = self.client.get("/api/transactions/statistics/", {**params, "include_archive": "true"}).data["data"]
+        self.assertEqual(data["in"], {"count": 2, "quantity": 15})
+        self.assertEqual(data["out"], {"count": 2, "quantity": 5})
+
+    def test_rollup_rebuild_counts_archived_rows(self):
+        call_command("rebuild_stock_rollup", stdout=StringIO())
+        totals = StockMovementDaily.objects.aggregate(in_qty=Sum("in_qty"), out_qty=Sum("out_qty"))
+        self.assertEqual(totals, {"in_qty": 15, "out_qty": 5})
+
+
+class StockSnapshotTest(SiteFixtureMixin, TestCase):
+    """时点库存：从最近的快照起回放，无快照时从当前库存倒推"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.part = SparePart.objects.create(name="轴承", site=cls.site, quantity=0)
+        cls.base = timezone.localdate() - timedelta(days=10)
+        SparePart.objects.update(created_at=timezone.now() - timedelta(days=400))
+        for offset, (kind, qty) in enumerate([("in", 10), ("out", 3), ("in", 5)], start=1):
+            movement = SparePartTransaction.objects.create(
+                spare_part=cls.part, transaction_type=kind, quantity=qty, reason="测试", operator=cls.user
+            )
+            noon = timezone.make_aware(datetime.combine(cls.base + timedelta(days=offset), time(12)))
+            SparePartTransaction.objects.filter(pk=movement.pk).update(created_at=noon)
+
+    def as_of(self, at):
+        items = self.client.get("/api/spare-parts/inventory-as-of/", {"at": str(at)}).data["data"]["items"]
+        return [(item["quantityAsOf"], item["snapshotDay"]) for item in items]
+
+    def test_snapshot_and_replay(self):
+        day2 = self.base + timedelta(days=2)
+        call_command("snapshot_stock", "--day", str(day2), "--interval", "daily", stdout=StringIO())
+        self.assertEqual(StockSnapshot.objects.get(spare_part=self.part, day=day2).quantity, 7)
+
+        # 快照之前：从当前库存倒推；之后：快照 + 增量
+        self.assertEqual(self.as_of(self.base), [(0, None)])
+        self.assertEqual(self.as_of(self.base + timedelta(days=1)), [(10, None)])
+        self.assertEqual(self.as_of(day2), [(7, str(day2))])
+        self.assertEqual(self.as_of(self.base + timedelta(days=3)), [(12, str(day2))])
+        morning = timezone.make_aware(datetime.combine(self.base + timedelta(days=3), time(9))).isoformat()
+        self.assertEqual(self.as_of(morning), [(7, str(day2))])
+
+        with self.assertNumQueries(2):
+            self.client.get("/api/spare-parts/inventory-as-of/", {"at": str(day2)})
+
+    def test_archived_movements_are_replayed(self):
+        day1 = self.base + timedelta(days=1)
+        call_command("snapshot_stock", "--day", str(day1), stdout=StringIO())
+        call_command("archive_transactions", "--before", str(timezone.localdate()), stdout=StringIO())
+        self.assertEqual(self.as_of(self.base + timedelta(days=3)), [(12, str(day1))])
+        self.assertEqual(self.as_of(self.base), [(0, None)])
+
+    def test_monthly_interval_and_pruning(self):
+        mid_month = (timezone.localdate() - timedelta(days=200)).replace(day=15)
+        month_end = mid_month.replace(day=1) - timedelta(days=1)
+        out = StringIO()
+        call_command("snapshot_stock", "--day", str(mid_month), "--interval", "monthly", stdout=out)
+        self.assertIn("跳过", out.getvalue())
+        call_command("snapshot_stock", "--day", str(month_end), "--interval", "monthly", stdout=StringIO())
+        # 超过保留天数的每日快照被清理，月末快照保留
+        call_command("snapshot_stock", "--day", str(mid_month), stdout=StringIO())
+        self.assertEqual(list(StockSnapshot.objects.values_list("day", "is_month_end")), [(month_end, True)])
+
+    def test_invalid_at(self):
+        response = self.client.get("/api/spare-parts/inventory-as-of/", {"at": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ReconcileStockTest(SiteFixtureMixin, TestCase):
+    """库存对账：期初结余 + 流水合计与 SparePart.quantity 比对"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+
+        def part(name, quantity=0, movements=()):
+            spare_part = SparePart.objects.create(name=name, site=cls.site, quantity=quantity)
+            for kind, qty in movements:
+                SparePartTransaction.objects.create(
+                    spare_part=spare_part, transaction_type=kind, quantity=qty, reason="测试"
+                )
+            return spare_part
+
+        cls.archived = part("滤芯", movements=[("in", 8), ("out", 1)])
+        SparePartTransaction.objects.update(created_at=timezone.now() - timedelta(days=900))
+        call_command("archive_transactions", stdout=StringIO())
+        SparePartTransaction.objects.create(spare_part=cls.archived, transaction_type="out", quantity=2, reason="检修")
+
+        cls.consistent = part("轴承", movements=[("in", 10), ("out", 3)])
+        cls.edited = part("齿轮", movements=[("in", 5)])
+        SparePart.objects.filter(pk=cls.edited.pk).update(quantity=9)  # 绕过 save() 直接改库存
+        cls.initial = part("碳刷", quantity=4, movements=[("out", 1)])  # 创建时的初始库存不经流水
+        cls.unexplained = part("电机", quantity=5, movements=[("out", 2)])
+        SparePart.objects.filter(pk=cls.unexplained.pk).update(stock_adjustment=0)  # 来源未记录的库存
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command("reconcile_stock", "--batch-size", "2", *args, stdout=out)
+        return json.loads(out.getvalue())
+
+    def test_report(self):
+        report = self.reconcile()
+        self.assertEqual(report["summary"]["checked"], 5)
+        self.assertEqual(report["summary"]["drifted"], 2)
+        self.assertEqual(report["summary"]["unexplained"], 1)
+        self.assertEqual(report["summary"]["repaired"], 0)
+        drift = {item["name"]: (item["stored"], item["expected"], item["status"]) for item in report["items"]}
+        self.assertEqual(drift, {"齿轮": (9, 5, "drift"), "电机": (3, -2, "unexplained")})
+        self.assertEqual(SparePart.objects.get(pk=self.edited.pk).quantity, 9)
+
+    def test_edit_is_reported_until_approved(self):
+        response = self.client.patch(f"/api/spare-parts/{self.initial.pk}/", {"quantity": 10}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(SparePart.objects.get(pk=self.initial.pk).stock_adjustment, 4)
+
+        report = self.reconcile("--repair")
+        item = next(item for item in report["items"] if item["name"] == "碳刷")
+        self.assertEqual(
+            (item["stored"], item["expected"], item["status"], item["repaired"]), (10, 3, "pending", False)
+        )
+        self.assertEqual(
+            [(entry["delta"], entry["source"], entry["operator"]) for entry in item["pending_adjustments"]],
+            [(7, "edit", "tech")],
+        )
+        self.assertEqual(report["summary"]["pending"], 1)
+        self.assertEqual(SparePart.objects.get(pk=self.initial.pk).quantity, 10)
+
+        self.assertEqual(StockAdjustment.approve(self.initial.stock_adjustments.all(), self.user), 1)
+        self.assertNotIn("碳刷", [item["name"] for item in self.reconcile()["items"]])
+        self.assertEqual(SparePart.objects.get(pk=self.initial.pk).stock_adjustment, 11)
+
+    def test_migration_keeps_existing_drift_for_review(self):
+        migration = import_module("SparePart.migrations.0016_stock_adjustment_records")
+        StockAdjustment.objects.all().delete()
+        migration.record_baseline_adjustments(apps, None)
+        baseline = dict(StockAdjustment.objects.values_list("spare_part__name", "delta"))
+        self.assertEqual(baseline, {"齿轮": 4, "碳刷": 4, "电机": 5})
+        self.assertFalse(StockAdjustment.objects.filter(approved=True).exists())
+        statuses = {item["name"]: item["status"] for item in self.reconcile("--repair")["items"]}
+        self.assertEqual(statuses, {"齿轮": "pending", "碳刷": "pending", "电机": "pending"})
+        self.assertEqual(SparePart.objects.get(pk=self.edited.pk).quantity, 9)
+
+    def test_repair(self):
+        report = self.reconcile("--repair")
+        self.assertEqual(report["summary"]["repaired"], 1)
+        self.assertEqual(SparePart.objects.get(pk=self.edited.pk).quantity, 5)
+        self.assertEqual(SparePart.objects.get(pk=self.initial.pk).quantity, 3)
+        self.assertEqual(SparePart.objects.get(pk=self.unexplained.pk).quantity, 3)
+
+        out = StringIO()
+        call_command("reconcile_stock", "--format", "jsonl", stdout=out)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([line.get("name") for line in lines[:-1]], ["电机"])
+        self.assertFalse(lines[0]["repaired"])
+        self.assertEqual(lines[-1]["summary"]["drifted"], 1)
+
+    def test_fail_on_drift(self):
+        with self.assertRaises(CommandError):
+            call_command("reconcile_stock", "--fail-on-drift", "--site-id", self.site.pk, stdout=StringIO())
+
+
+@override_settings(SPARE_PART_LIST_CACHE_TIMEOUT=0)
+class AsyncReadEndpointTest(SiteFixtureMixin, TestCase):
+    """异步只读接口：参数与响应同同步接口"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        other = Site.objects.create(name="张北场站", code="ZB", address="张北")
+        category = Category.objects.create(name="轴承类", code="ZC")
+        for site in (cls.site, other):
+            for i in range(3):
+                part = SparePart.objects.create(
+                    name=f"轴承{i}", model=f"620{i}", site=site, category=category, quantity=0, alarm_qty=2
+                )
+                SparePartTransaction.objects.create(
+                    spare_part=part, transaction_type="in", quantity=5 + i, reason="采购", operator=cls.user
+                )
+        cls.part = part
+        token = SiteTokenObtainPairSerializer.get_token(cls.user).access_token
+        cls.headers = {"Authorization": f"Bearer {token}"}
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    async def assert_same_as_sync(self, path, **params):
+        response = await self.async_client.get(f"/api/async{path}", params, headers=self.headers)
+        self.assertEqual(response.status_code, 200, response.content)
+        expected = await sync_to_async(
+            lambda: Client().get(f"/api/{path.lstrip('/')}", params, headers=self.headers).json()
+        )()
+        self.assertEqual(response.json(), expected)
+        return response.json()
+
+    async def test_spare_parts(self):
+        data = await self.assert_same_as_sync("/spare-parts/")
+        self.assertEqual(data["data"]["total"], 3)  # 令牌声明限定本场站
+        await self.assert_same_as_sync("/spare-parts/", search="轴承", limit=2, page=2)
+        await self.assert_same_as_sync("/spare-parts/", search="!!!")
+        await self.assert_same_as_sync("/spare-parts/", cursor="")
+        await self.assert_same_as_sync(f"/spare-parts/{self.part.pk}/")
+
+    async def test_transactions_and_statistics(self):
+        await self.assert_same_as_sync("/transactions/", transaction_type="in", limit=4)
+        await self.assert_same_as_sync("/transactions/statistics/", group_by="site")
+        await self.assert_same_as_sync("/transactions/statistics/", start_date="2000-01-01T00:00:00+08:00")
+
+    async def test_sites(self):
+        data = await self.assert_same_as_sync("/sites/")
+        self.assertEqual(len(data), 2)
+
+    @override_settings(CACHES=SHARED_CACHES)
+    async def test_not_found_and_not_modified(self):
+        response = await self.async_client.get("/api/async/spare-parts/", {"page": 9}, headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get("/api/async/spare-parts/0/", headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+        response = await self.async_client.get(f"/api/async/spare-parts/{self.part.pk}/", headers=self.headers)
+        response = await self.async_client.get(
+            f"/api/async/spare-parts/{self.part.pk}/", headers={**self.headers, "If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(CACHES=SHARED_CACHES, SPARE_PART_LIST_CACHE_TIMEOUT=60)
+    async def test_cache_calls_do_not_block_event_loop(self):
+        blocking = []
+
+        def guard(method):
+            def call(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    blocking.append(method.__name__)
+                except RuntimeError:  # 异步缓存接口在线程中执行
+                    pass
+                return method(*args, **kwargs)
+            return call
+
+        with mock.patch.object(FileBasedCache, "get", guard(FileBasedCache.get)), \
+                mock.patch.object(FileBasedCache, "set", guard(FileBasedCache.set)), \
+                mock.patch.object(FileBasedCache, "add", guard(FileBasedCache.add)):
+            for _ in range(2):
+                for path in ("/spare-parts/", f"/spare-parts/{self.part.pk}/", "/sites/", "/auth/me/"):
+                    response = await self.async_client.get(f"/api/async{path}", headers=self.headers)
+                    self.assertEqual(response.status_code, 200)
+        self.assertEqual(blocking, [])
+
+
+# 连接时长设短：每个测试读完整个流，订阅随之释放
+@override_settings(STOCK_EVENT_KEEPALIVE=0.05, STOCK_EVENT_MAX_AGE=1)
+class StockEventStreamTest(SiteFixtureMixin, TestCase):
+    """库存变更事件流：事务提交后按场站推送"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        other = Site.objects.create(name="张北场站", code="ZB", address="张北")
+        category = Category.objects.create(name="轴承类", code="ZC")
+        cls.part = SparePart.objects.create(
+            name="轴承", model="6205", site=cls.site, category=category, quantity=5, alarm_qty=2
+        )
+        cls.other_part = SparePart.objects.create(
+            name="轴承", model="6205", site=other, category=category, quantity=5, alarm_qty=2
+        )
+        cls.token = str(SiteTokenObtainPairSerializer.get_token(cls.user).access_token)
+
+    def take_out(self, part, quantity):
+        with self.captureOnCommitCallbacks(execute=True):
+            SparePartTransaction.objects.create(
+                spare_part=part, transaction_type="out", quantity=quantity, reason="维修", operator=self.user
+            )
+
+    async def open_stream(self, **params):
+        response = await self.async_client.get("/api/async/stock-events/", params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        stream = response.streaming_content
+        self.assertTrue((await anext(stream)).startswith(b"retry:"))
+        self.assertEqual(await anext(stream), b"event: resync\ndata: {}\n\n")
+        return stream
+
+    async def next_message(self, stream):
+        """下一条事件（跳过保活注释）"""
+        async for chunk in stream:
+            if not chunk.startswith(b":"):
+                return chunk
+
+    async def test_pushes_own_site_changes(self):
+        stream = await self.open_stream(token=self.token)
+        await sync_to_async(self.take_out)(self.other_part, 1)
+        await sync_to_async(self.take_out)(self.part, 3)
+        chunk = await asyncio.wait_for(self.next_message(stream), 5)
+        self.assertEqual([chunk async for chunk in stream if not chunk.startswith(b":")], [])
+        self.assertTrue(chunk.startswith(b"event: stock\n"))
+        data = json.loads(chunk.decode().split("data: ", 1)[1])
+        self.assertEqual(data, {"id": self.part.pk, "site_id": self.site.pk, "quantity": 2, "is_alarm": True})
+
+    async def test_reconnect_resyncs_changes_made_while_disconnected(self):
+        stream = await self.open_stream(token=self.token)
+        self.assertEqual([chunk async for chunk in stream if not chunk.startswith(b":")], [])
+        await sync_to_async(self.take_out)(self.part, 1)
+        # 断开期间的出库没有推送，重连后先收到 resync（open_stream 中校验），客户端据此重新拉取列表
+        stream = await self.open_stream(token=self.token)
+        await sync_to_async(self.take_out)(self.part, 1)
+        chunk = await asyncio.wait_for(self.next_message(stream), 5)
+        self.assertEqual([chunk async for chunk in stream if not chunk.startswith(b":")], [])
+        self.assertEqual(json.loads(chunk.decode().split("data: ", 1)[1])["quantity"], 3)
+
+    @override_settings(STOCK_EVENT_MAX_AGE=0.2)
+    async def test_keepalive_and_unsubscribe_on_close(self):
+        broker = get_broker()
+        subscribers = len(broker.subscribers)
+        stream = await self.open_stream(token=self.token)
+        self.assertEqual(len(broker.subscribers), subscribers + 1)
+        chunks = [chunk async for chunk in stream]
+        self.assertTrue(chunks)
+        self.assertTrue(all(chunk == b": keepalive\n\n" for chunk in chunks))
+        self.assertEqual(len(broker.subscribers), subscribers)
+
+    async def test_requires_token(self):
+        response = await self.async_client.get("/api/async/stock-events/")
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get("/api/async/stock-events/", {"token": "invalid"})
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,86 @@
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = 'spare_parts/thumbs'
+
+# 变体名 -> (最长边像素, 格式, 扩展名)
+THUMBNAIL_VARIANTS = {
+    'small': (160, 'JPEG', 'jpg'),
+    'medium': (480, 'JPEG', 'jpg'),
+    'webp': (480, 'WEBP', 'webp'),
+}
+
+
+def variant_name(name, variant):
+    """原图存储路径 -> 缩略图存储路径（由原图路径确定，无需查库或访问存储）
+
+    保留原图扩展名（a.png -> a_png_small.jpg），a.png 与 a.jpg 的缩略图互不覆盖。
+    """
+    base, extension = os.path.splitext(os.path.basename(name))
+    if extension:
+        base = f'{base}_{extension[1:].lower()}'
+    return f'{THUMBNAIL_DIR}/{base}_{variant}.{THUMBNAIL_VARIANTS[variant][2]}'
+
+
+def legacy_variant_name(name, variant):
+    """旧版缩略图路径（不含原图扩展名），仅供补生成命令清理"""
+    base = os.path.splitext(os.path.basename(name))[0]
+    return f'{THUMBNAIL_DIR}/{base}_{variant}.{THUMBNAIL_VARIANTS[variant][2]}'
+
+
+def thumbnail_urls(image):
+    """ImageField 文件 -> {变体名: URL}，无图片时返回 None
+
+    调用方需确认缩略图已生成（SparePart.has_thumbnails）。
+    """
+    if not image:
+        return None
+    return {variant: image.storage.url(variant_name(image.name, variant)) for variant in THUMBNAIL_VARIANTS}
+
+
+def delete_thumbnails(storage, name):
+    for variant in THUMBNAIL_VARIANTS:
+        storage.delete(variant_name(name, variant))
+
+
+def generate_thumbnails(image, force=False):
+    """用 Pillow 生成全部缩略图变体，返回生成的数量；图片无法解析时记录日志并返回 None"""
+    storage = image.storage
+    targets = {variant: variant_name(image.name, variant) for variant in THUMBNAIL_VARIANTS}
+    if not force:
+        targets = {variant: path for variant, path in targets.items() if not storage.exists(path)}
+    if not targets:
+        return 0
+
+    try:
+        with storage.open(image.name, 'rb') as file:
+            source = ImageOps.exif_transpose(Image.open(file))
+            source.load()
+    except (OSError, UnidentifiedImageError):
+        logger.warning("无法生成缩略图: %s", image.name, exc_info=True)
+        return None
+
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA' if 'A' in source.getbands() else 'RGB')
+
+    for variant, path in targets.items():
+        size, image_format, _ = THUMBNAIL_VARIANTS[variant]
+        thumbnail = source.copy()
+        thumbnail.thumbnail((size, size), Image.LANCZOS)
+        if image_format == 'JPEG' and thumbnail.mode == 'RGBA':
+            # JPEG 不支持透明通道，铺白底
+            background = Image.new('RGB', thumbnail.size, (255, 255, 255))
+            background.paste(thumbnail, mask=thumbnail.getchannel('A'))
+            thumbnail = background
+        buffer = BytesIO()
+        thumbnail.save(buffer, image_format, quality=80, optimize=True)
+        if storage.exists(path):
+            storage.delete(path)
+        storage.save(path, ContentFile(buffer.getvalue()))
+    return len(targets)
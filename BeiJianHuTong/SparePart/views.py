@@ -1,17 +1,42 @@
 from django.shortcuts import render, get_object_or_404
-from django.db.models import F, Case, When, Value, BooleanField
-from rest_framework import viewsets, permissions, status
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import exceptions, viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
-from .models import SparePart, Category, SparePartTransaction
-from .serializers import SparePartSerializer, CategorySerializer, SparePartTransactionSerializer
 
+from BeiJianHuTong.conditional import conditional_get, get_version, make_etag
+from .models import SparePart, Category, SparePartTransaction, SparePartTransactionArchive, SparePartForecast
+from .caching import cached_list, visible_site_id
+from .archive import CombinedLedger
+from .availability import MAX_DONORS, transfer_suggestions
+from .bulk import BULK_MODES, BULK_MAX_ITEMS, bulk_create_transactions
+from .export import EXPORT_FORMATS, export_response, iterate_in_chunks
+from .importer import SparePartImporter
+from .pagination import StandardPagination, KeysetPagination
+from .search import search_spare_parts
+from .snapshots import end_of_day, inventory_as_of
+from .suggest import SUGGEST_LIMIT, SUGGEST_MAX_LIMIT, suggest as suggest_parts
+from .statistics import (
+    GROUP_BY_CHOICES, clean_date_range, clean_statistics_params, created_at_range, transaction_statistics,
+)
+from .serializers import (
+    SparePartSerializer, SparePartListSerializer, CategorySerializer, SparePartTransactionSerializer,
+    SparePartForecastSerializer, InventoryAsOfSerializer,
+)
 
-class StandardPagination(PageNumberPagination):
-    page_size = 20
-    page_size_query_param = 'limit'
-    page_size_query_description = "每页数量"
+
+def keyset_list(view, queryset, ordering):
+    """游标分页列表响应（保持 {code, message, data} 格式）"""
+    paginator = KeysetPagination(ordering=ordering)
+    page = paginator.paginate_queryset(queryset, view.request, view=view)
+    serializer = view.get_serializer(page, many=True)
+    return Response({
+        "code": 0,
+        "message": "success",
+        "data": paginator.get_page_data(serializer.data)
+    })
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -21,7 +46,14 @@ class CategoryViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def list(self, request, *args, **kwargs):
-        """获取所有分类（自定义响应格式）"""
+        """获取所有分类（自定义响应格式，支持 ETag 条件请求）"""
+        version = get_version('categories')
+        return conditional_get(
+            request, make_etag('categories', version), version // 1000,
+            lambda: self.render_list(request),
+        )
+
+    def render_list(self, request):
         queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         return Response({
@@ -59,9 +91,9 @@ class SparePartTransactionViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardPagination
     
-    def list(self, request, *args, **kwargs):
-        """获取出入库记录列表"""
-        queryset = self.filter_queryset(self.get_queryset())
+    def filter_list_queryset(self, queryset):
+        """列表与导出共用的筛选条件"""
+        request = self.request
         
         # 按备件筛选
         spare_part_id = request.query_params.get('spare_part_id')
@@ -73,13 +105,36 @@ class SparePartTransactionViewSet(viewsets.ModelViewSet):
         if transaction_type:
             queryset = queryset.filter(transaction_type=transaction_type)
         
-        # 按时间范围筛选
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-        if start_date:
-            queryset = queryset.filter(created_at__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(created_at__lte=end_date)
+        # 按时间范围筛选（只有日期时包含结束日期当天，与统计接口一致）
+        try:
+            start, end = clean_date_range(request.query_params)
+        except ValueError as exc:
+            raise exceptions.ParseError(str(exc))
+        return queryset.filter(**created_at_range(start, end))
+    
+    def include_archive(self):
+        """?include_archive=true 时同时查询已归档的流水"""
+        return self.request.query_params.get('include_archive', '').lower() in ('1', 'true')
+
+    def list(self, request, *args, **kwargs):
+        """获取出入库记录列表（默认只查流水表，?include_archive=true 合并归档表）"""
+        queryset = self.filter_list_queryset(self.filter_queryset(self.get_queryset()))
+        
+        if self.include_archive():
+            if KeysetPagination.is_requested(request):
+                return Response({
+                    "code": 1,
+                    "message": "include_archive 不支持游标分页，请使用 page 分页",
+                    "data": None
+                }, status=status.HTTP_400_BAD_REQUEST)
+            queryset = CombinedLedger(
+                queryset.select_related('spare_part', 'operator'),
+                self.filter_list_queryset(SparePartTransactionArchive.objects.select_related('spare_part', 'operator')),
+            )
+
+        # 游标分页：?cursor= 时按 (created_at, id) seek
+        if KeysetPagination.is_requested(request):
+            return keyset_list(self, queryset, ('-created_at', '-id'))
         
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -117,6 +172,77 @@ class SparePartTransactionViewSet(viewsets.ModelViewSet):
             "data": SparePartTransactionSerializer(transaction, context={'request': request}).data
         }, status=status.HTTP_201_CREATED)
     
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """导出出入库记录（?file_format=csv|xlsx，筛选条件同列表接口）"""
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response({
+                "code": 1,
+                "message": f"file_format 参数无效，可选值: {', '.join(EXPORT_FORMATS)}",
+                "data": None
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.filter_list_queryset(self.get_queryset()).values_list(
+            'id', 'created_at', 'spare_part_id', 'spare_part__name', 'spare_part__model',
+            'spare_part__site__name', 'transaction_type', 'quantity', 'operator__username',
+            'reason', 'remark'
+        )
+        type_display = dict(SparePartTransaction.TRANSACTION_TYPE_CHOICES)
+        rows = (
+            row[:6] + (type_display.get(row[6], row[6]),) + row[7:]
+            for row in iterate_in_chunks(queryset)
+        )
+        header = ['ID', '操作时间', '备件ID', '备件名称', '备件型号', '所属场站', '操作类型', '数量', '操作人', '操作原因', '备注']
+        return export_response('出入库记录', header, rows, file_format)
+    
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """批量出入库
+
+        请求体: {"mode": "atomic" | "best_effort", "items": [出入库记录, ...]}
+        atomic（默认）任一条失败则全部不写入；best_effort 写入所有有效记录。
+        """
+        mode = request.data.get('mode', 'atomic')
+        items = request.data.get('items')
+        if mode not in BULK_MODES:
+            return Response({
+                "code": 1,
+                "message": f"mode 参数无效，可选值: {', '.join(BULK_MODES)}",
+                "data": None
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(items, list) or not items:
+            return Response({
+                "code": 1,
+                "message": "items 必须为非空列表",
+                "data": None
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > BULK_MAX_ITEMS:
+            return Response({
+                "code": 1,
+                "message": f"单次最多提交 {BULK_MAX_ITEMS} 条记录",
+                "data": None
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        created, errors, parts = bulk_create_transactions(items, request.user, mode)
+        data = {
+            "created": created,
+            "failed": len(errors),
+            "errors": errors,
+            "spare_parts": parts
+        }
+        if not created:
+            return Response({
+                "code": 1,
+                "message": "批量出入库失败",
+                "data": data
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "code": 0,
+            "message": "部分成功" if errors else "创建成功",
+            "data": data
+        }, status=status.HTTP_201_CREATED)
+    
     @action(detail=False, methods=['get'])
     def by_spare_part(self, request):
         """获取指定备件的所有出入库记录"""
@@ -130,6 +256,11 @@ class SparePartTransactionViewSet(viewsets.ModelViewSet):
         
         spare_part = get_object_or_404(SparePart, id=spare_part_id)
         transactions = spare_part.transactions.all()
+        if self.include_archive():
+            transactions = CombinedLedger(
+                transactions.select_related('spare_part', 'operator'),
+                spare_part.archived_transactions.select_related('spare_part', 'operator'),
+            )
         
         page = self.paginate_queryset(transactions)
         if page is not None:
@@ -167,35 +298,31 @@ class SparePartTransactionViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        """获取出入库统计数据"""
-        spare_part_id = request.query_params.get('spare_part_id')
-        
-        if spare_part_id:
-            transactions = SparePartTransaction.objects.filter(spare_part_id=spare_part_id)
-        else:
-            transactions = SparePartTransaction.objects.all()
-        
-        # 统计入库和出库
-        in_count = transactions.filter(transaction_type='in').count()
-        out_count = transactions.filter(transaction_type='out').count()
-        
-        in_qty = sum([t.quantity for t in transactions.filter(transaction_type='in')])
-        out_qty = sum([t.quantity for t in transactions.filter(transaction_type='out')])
+        """获取出入库统计数据（单条聚合查询）
+
+        支持参数: spare_part_id, site_id, category_id, start_date, end_date,
+        group_by=day|week|month|site|category, include_archive=true
+        """
+        group_by = request.query_params.get('group_by')
+        if group_by and group_by not in GROUP_BY_CHOICES:
+            return Response({
+                "code": 1,
+                "message": f"group_by 参数无效，可选值: {', '.join(GROUP_BY_CHOICES)}",
+                "data": None
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            params = clean_statistics_params(request.query_params)
+        except ValueError as exc:
+            return Response({
+                "code": 1,
+                "message": str(exc),
+                "data": None
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             "code": 0,
             "message": "success",
-            "data": {
-                "total_transactions": transactions.count(),
-                "in": {
-                    "count": in_count,
-                    "quantity": in_qty
-                },
-                "out": {
-                    "count": out_count,
-                    "quantity": out_qty
-                }
-            }
+            "data": transaction_statistics(params, group_by)
         })
 
 
@@ -206,9 +333,20 @@ class SparePartViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardPagination
     
-    def list(self, request, *args, **kwargs):
-        """获取备件列表（分页）"""
-        queryset = self.filter_queryset(self.get_queryset())
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return SparePartListSerializer
+        return super().get_serializer_class()
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = SparePartListSerializer.setup_eager_loading(queryset)
+        return queryset
+    
+    def filter_list_queryset(self, queryset):
+        """列表与导出共用的筛选条件（含场站权限控制）"""
+        request = self.request
         
         # 支持按分类筛选
         category_id = request.query_params.get('category_id')
@@ -221,28 +359,44 @@ class SparePartViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(site_id=site_id)
         
         # 权限控制：如果用户不能查看所有场站，则强制只能查看自己场站的备件
-        if not request.user.can_view_all_sites and request.user.site:
-            queryset = queryset.filter(site=request.user.site)
+        # 使用 site_id 判断，避免再查一次场站表
+        if not request.user.can_view_all_sites and request.user.site_id:
+            queryset = queryset.filter(site_id=request.user.site_id)
 
         # 支持按状态筛选
         status_filter = request.query_params.get('status')
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        # 支持搜索
-        search = request.query_params.get('search')
+        # 支持搜索（名称、型号、描述、供应商；MySQL 走 FULLTEXT ngram 索引，其他数据库走倒排索引表）
+        search = request.query_params.get('search', '').strip()
         if search:
-            queryset = queryset.filter(name__icontains=search) | queryset.filter(model__icontains=search)
+            queryset = search_spare_parts(queryset, search)
+        
+        # 支持按告警状态筛选
+        alarm = request.query_params.get('alarm')
+        if alarm:
+            queryset = queryset.filter(is_alarm=alarm.lower() in ('1', 'true'))
+        return queryset
+    
+    def list(self, request, *args, **kwargs):
+        """获取备件列表（分页，按场站代数缓存，写入备件或出入库后自动失效）"""
+        return cached_list(request, lambda: self.render_list(request))
+
+    def render_list(self, request):
+        queryset = self.filter_list_queryset(self.filter_queryset(self.get_queryset()))
         
         # 优先显示库存告警的备件
-        # 告警条件: quantity <= alarm_qty
-        queryset = queryset.annotate(
-            is_alarm=Case(
-                When(quantity__lte=F('alarm_qty'), then=Value(True)),
-                default=Value(False),
-                output_field=BooleanField()
-            )
-        ).order_by('-is_alarm', '-created_at')
+        # 告警条件: quantity <= alarm_qty（is_alarm 为落库字段，排序可走索引）
+        queryset = queryset.order_by('-is_alarm', '-created_at')
+
+        # 游标分页：?cursor= 时按 (is_alarm, created_at, id) seek
+        if KeysetPagination.is_requested(request):
+            return keyset_list(self, queryset, ('-is_alarm', '-created_at', '-id'))
+
+        # 搜索时按相关度排序（游标分页仍按上面的固定顺序）
+        if request.query_params.get('search', '').strip():
+            queryset = queryset.order_by('-search_rank', '-is_alarm', '-created_at')
 
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -266,8 +420,232 @@ class SparePartViewSet(viewsets.ModelViewSet):
             "data": serializer.data
         })
     
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """导出备件（?file_format=csv|xlsx，筛选与场站权限同列表接口）"""
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response({
+                "code": 1,
+                "message": f"file_format 参数无效，可选值: {', '.join(EXPORT_FORMATS)}",
+                "data": None
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.filter_list_queryset(self.get_queryset()).values_list(
+            'id', 'name', 'model', 'category__name', 'site__name', 'quantity', 'alarm_qty',
+            'is_alarm', 'location', 'supplier', 'supplier_code', 'procurement_days', 'status',
+            'last_purchase_date', 'last_use_date', 'created_at', 'updated_at'
+        )
+        status_display = dict(SparePart.STATUS_CHOICES)
+        rows = (
+            row[:7] + ('是' if row[7] else '否',) + row[8:12] + (status_display.get(row[12], row[12]),) + row[13:]
+            for row in iterate_in_chunks(queryset)
+        )
+        header = [
+            'ID', '备件名称', '备件型号', '备件分类', '所属场站', '当前数量', '库存预警数量',
+            '库存告警', '备件位置', '供应商名称', '供应商编码', '采购周期（天）', '状态',
+            '最后采购日期', '最后使用日期', '创建时间', '更新时间'
+        ]
+        return export_response('备件', header, rows, file_format)
+    
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """输入联想：按名称/型号前缀返回前 N 个备件（?q=&limit=，场站权限同列表接口）
+
+        只返回 id、名称、型号、场站，数据来自缓存中的前缀索引分片（本场站或全部场站），不查询备件表。
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', SUGGEST_LIMIT)), 1), SUGGEST_MAX_LIMIT)
+        except ValueError:
+            limit = SUGGEST_LIMIT
+
+        return Response({
+            "code": 0,
+            "message": "success",
+            "data": suggest_parts(visible_site_id(request), request.query_params.get('q', ''), limit)
+        })
+
+    @action(detail=False, methods=['get'])
+    def forecast(self, request):
+        """备件消耗预测（由 forecast_stock 命令每晚计算）
+
+        ?site_id= / ?spare_part_id= 筛选，?at_risk=true 只返回采购周期内将断货的备件；
+        按预计可用天数升序，无消耗的备件排在最后。场站权限同列表接口。
+        """
+        queryset = SparePartForecast.objects.select_related('spare_part')
+        site_id = request.query_params.get('site_id')
+        if site_id:
+            queryset = queryset.filter(site_id=site_id)
+        if not request.user.can_view_all_sites and request.user.site_id:
+            queryset = queryset.filter(site_id=request.user.site_id)
+        spare_part_id = request.query_params.get('spare_part_id')
+        if spare_part_id:
+            queryset = queryset.filter(spare_part_id=spare_part_id)
+        if request.query_params.get('at_risk', '').lower() in ('1', 'true'):
+            queryset = queryset.filter(days_to_stockout__lte=F('lead_days'))
+        queryset = queryset.order_by(F('days_to_stockout').asc(nulls_last=True), 'spare_part_id')
+
+        page = self.paginate_queryset(queryset)
+        serializer = SparePartForecastSerializer(page, many=True)
+        return Response({
+            "code": 0,
+            "message": "success",
+            "data": {
+                "total": self.paginator.page.paginator.count,
+                "page": self.paginator.page.number,
+                "limit": self.paginator.get_page_size(request),
+                "items": serializer.data
+            }
+        })
+
+    @action(detail=False, methods=['get'], url_path='inventory-as-of')
+    def inventory_as_of(self, request):
+        """时点库存（盘点、月结）
+
+        ?at=YYYY-MM-DD 表示该日结束时，也可传带时分秒的时间；?site_id= / ?category_id= / ?spare_part_id= 筛选。
+        每个备件从 at 之前最近的库存快照起只回放之后的出入库。场站权限同列表接口。
+        """
+        value = request.query_params.get('at', '')
+        try:
+            day = parse_date(value)
+            at = end_of_day(day) if day else parse_datetime(value)
+        except ValueError:
+            at = None
+        if at is None:
+            return Response({
+                "code": 1,
+                "message": "at 参数格式应为 YYYY-MM-DD 或 ISO 8601 时间",
+                "data": None
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+
+        queryset = SparePart.objects.select_related('site')
+        if not request.user.can_view_all_sites and request.user.site_id:
+            queryset = queryset.filter(site_id=request.user.site_id)
+        for param, lookup in (('site_id', 'site_id'), ('category_id', 'category_id'), ('spare_part_id', 'id')):
+            if request.query_params.get(param):
+                queryset = queryset.filter(**{lookup: request.query_params[param]})
+        queryset = inventory_as_of(queryset, at).order_by('id')
+
+        page = self.paginate_queryset(queryset)
+        serializer = InventoryAsOfSerializer(page, many=True)
+        return Response({
+            "code": 0,
+            "message": "success",
+            "data": {
+                "at": at,
+                "total": self.paginator.page.paginator.count,
+                "page": self.paginator.page.number,
+                "limit": self.paginator.get_page_size(request),
+                "items": serializer.data
+            }
+        })
+
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        """跨场站调拨建议
+
+        ?spare_part_id= 查询单个备件，否则查询场站（?site_id=，默认本人场站）所有告警备件；
+        返回其他场站同名同型号、库存高于预警值的备件，按富余量降序，并给出建议调拨数量。
+        无“查看所有场站”权限的用户只能为本场站查询。
+        """
+        try:
+            max_donors = min(max(int(request.query_params.get('max_donors', MAX_DONORS)), 1), 50)
+        except ValueError:
+            max_donors = MAX_DONORS
+
+        needy = SparePart.objects.all()
+        if not request.user.can_view_all_sites and request.user.site_id:
+            needy = needy.filter(site_id=request.user.site_id)
+
+        spare_part_id = request.query_params.get('spare_part_id')
+        site_id = request.query_params.get('site_id') or request.user.site_id
+        if spare_part_id:
+            needy = needy.filter(pk=spare_part_id)
+        elif site_id:
+            # 按 (site, is_alarm) 索引取本场站告警备件
+            needy = needy.filter(site_id=site_id, is_alarm=True)
+        else:
+            return Response({
+                "code": 1,
+                "message": "请指定 spare_part_id 或 site_id",
+                "data": None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "code": 0,
+            "message": "success",
+            "data": transfer_suggestions(needy.order_by('name', 'id'), max_donors=max_donors)
+        })
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_parts(self, request):
+        """批量导入备件目录（CSV/XLSX，按 名称+场站 upsert）
+
+        文件无 site_code 列时导入到 siteId 指定的场站或当前用户场站；
+        不能查看所有场站的用户只能导入到自己的场站。
+        """
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({
+                "code": 1,
+                "message": "请上传文件（file）",
+                "data": None
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        site_id = request.data.get('siteId')
+        if site_id:
+            from sites.models import Site
+            default_site = get_object_or_404(Site, id=site_id)
+        else:
+            default_site = request.user.site
+        allowed_site_ids = None
+        if not request.user.can_view_all_sites:
+            allowed_site_ids = {request.user.site_id}
+        
+        importer = SparePartImporter(
+            user=request.user, default_site=default_site, allowed_site_ids=allowed_site_ids
+        )
+        try:
+            report = importer.run(upload.file, upload.name)
+        except ValueError as exc:
+            return Response({
+                "code": 1,
+                "message": str(exc),
+                "data": None
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            "code": 0,
+            "message": "导入完成" if not report['errors'] else "导入完成（部分行有错误）",
+            "data": report
+        })
+    
     def retrieve(self, request, *args, **kwargs):
-        """获取单个备件"""
+        """获取单个备件（支持 ETag 条件请求）
+
+        校验值由备件 updated_at 与分类、场站、用户（创建人、更新人用户名）版本号组成，
+        未变更时只查询一次 updated_at，不加载关联、不序列化。
+        """
+        try:
+            updated_at = self.get_queryset().filter(pk=kwargs['pk']).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError):
+            updated_at = None
+        if updated_at is None:
+            return self.render_detail(request)
+        categories_version = get_version('categories')
+        sites_version = get_version('sites')
+        users_version = get_version('users')
+        etag = make_etag(
+            'part', kwargs['pk'], int(updated_at.timestamp() * 1000), categories_version, sites_version, users_version
+        )
+        last_modified = max(
+            int(updated_at.timestamp()), categories_version // 1000, sites_version // 1000, users_version // 1000
+        )
+        return conditional_get(request, etag, last_modified, lambda: self.render_detail(request))
+
+    def render_detail(self, request):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
         return Response({
@@ -0,0 +1,9 @@
+from BeiJianHuTong.asyncapi import async_api_view, render_json
+from .authentication import CachedJWTAuthentication
+from .views import user_payload
+
+
+@async_api_view(authentication_class=CachedJWTAuthentication)
+async def me(request):
+    """当前登录用户信息（异步版本，响应同 /api/auth/me/；用户连同场站走认证缓存）"""
+    return render_json(user_payload(request.user))
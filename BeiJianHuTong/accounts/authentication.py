@@ -0,0 +1,137 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from BeiJianHuTong.conditional import aget_version, bump_version, get_version
+from .tokens import SiteTokenUser, has_permission_claims
+
+USER_CACHE_PREFIX = 'accounts:user'
+
+
+def get_user_cache_timeout():
+    return getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60)
+
+
+def user_generation(user_id):
+    return f'{USER_CACHE_PREFIX}:{user_id}'
+
+
+def token_version(validated_token):
+    """令牌版本：签发时间 iat，登录或刷新得到的新令牌对应新的缓存条目"""
+    return validated_token.get('iat', 0)
+
+
+def user_cache_key(user_id, version):
+    """用户 ID + 该用户的缓存代数（用户/场站变更时递增）+ 令牌版本"""
+    return f'{USER_CACHE_PREFIX}:{user_id}:{get_version(user_generation(user_id))}:{version}'
+
+
+async def auser_cache_key(user_id, version):
+    """user_cache_key 的异步版本"""
+    return f'{USER_CACHE_PREFIX}:{user_id}:{await aget_version(user_generation(user_id))}:{version}'
+
+
+def invalidate_cached_users(user_ids):
+    for user_id in user_ids:
+        bump_version(user_generation(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """带缓存的 JWT 认证
+
+    用户连同所属场站、权限标记按 (用户 ID, 令牌版本) 缓存一段时间（AUTH_USER_CACHE_TIMEOUT 秒），
+    缓存命中时认证不查库，request.user.site 也不会再触发查询。
+    用户或场站保存/删除时由 accounts.signals 递增该用户的缓存代数，已缓存的条目全部作废。
+    """
+
+    def get_request_token(self, request):
+        """从 Authorization 头取出并校验访问令牌，未携带时返回 None"""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return self.get_validated_token(raw_token)
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from exc
+
+    def check_user(self, user, validated_token):
+        if getattr(api_settings, 'CHECK_USER_IS_ACTIVE', True) and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if getattr(api_settings, 'CHECK_REVOKE_TOKEN', False):
+            from rest_framework_simplejwt.utils import get_md5_hash_password
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        key = user_cache_key(user_id, token_version(validated_token))
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = self.user_model.objects.select_related('site').get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist as exc:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from exc
+            cache.set(key, user, get_user_cache_timeout())
+        return self.check_user(user, validated_token)
+
+    async def aget_user(self, validated_token):
+        """get_user 的异步版本：缓存读写用异步缓存接口，未命中时用异步 ORM 查询"""
+        user_id = self.get_user_id(validated_token)
+        key = await auser_cache_key(user_id, token_version(validated_token))
+        user = await cache.aget(key)
+        if user is None:
+            try:
+                user = await self.user_model.objects.select_related('site').aget(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist as exc:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from exc
+            await cache.aset(key, user, get_user_cache_timeout())
+        return self.check_user(user, validated_token)
+
+    async def aauthenticate(self, request):
+        """authenticate 的异步版本，供原生异步视图使用"""
+        validated_token = self.get_request_token(request)
+        if validated_token is None:
+            return None
+        return await self.aget_user(validated_token), validated_token
+
+
+class ClaimsJWTAuthentication(CachedJWTAuthentication):
+    """只读请求直接使用令牌中的权限声明，完全不查数据库
+
+    GET/HEAD/OPTIONS 且令牌带有权限声明时返回 SiteTokenUser；
+    写请求和旧令牌仍按 CachedJWTAuthentication 取完整用户。
+    权限声明在令牌刷新时更新，停用用户的只读访问到访问令牌过期为止。
+    """
+
+    def authenticate(self, request):
+        validated_token = self.get_request_token(request)
+        if validated_token is None:
+            return None
+        if request.method in SAFE_METHODS and has_permission_claims(validated_token):
+            return SiteTokenUser(validated_token), validated_token
+        return self.get_user(validated_token), validated_token
+
+    async def aauthenticate(self, request):
+        validated_token = self.get_request_token(request)
+        if validated_token is None:
+            return None
+        if request.method in SAFE_METHODS and has_permission_claims(validated_token):
+            return SiteTokenUser(validated_token), validated_token
+        return await self.aget_user(validated_token), validated_token
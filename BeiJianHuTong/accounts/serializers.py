@@ -0,0 +1,28 @@
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import User
+from .tokens import add_permission_claims
+
+
+class SiteTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """登录：令牌中带上场站与权限标记"""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_permission_claims(super().get_token(user), user)
+
+
+class SiteTokenRefreshSerializer(TokenRefreshSerializer):
+    """刷新：按用户当前权限重新写入访问令牌声明，权限变更在刷新后生效"""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]}).first()
+        if user is None or not user.is_active:
+            raise AuthenticationFailed("用户不存在或已停用", code="user_inactive")
+        data['access'] = str(add_permission_claims(access, user))
+        return data
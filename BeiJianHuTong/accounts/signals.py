@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from BeiJianHuTong.conditional import bump_version
+from sites.models import Site
+from .authentication import invalidate_cached_users
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    invalidate_cached_users([instance.pk])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_users_version(sender, instance, update_fields=None, **kwargs):
+    """备件详情含创建人、更新人用户名，用户名可能变化时使其 ETag 失效（仅更新登录时间等字段时跳过）"""
+    if update_fields is None or 'username' in update_fields:
+        bump_version('users')
+
+
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Site)
+def invalidate_site_users_cache(sender, instance, **kwargs):
+    """缓存的用户对象带有场站，场站变更后清除该场站所有用户的缓存"""
+    invalidate_cached_users(User.objects.filter(site_id=instance.pk).values_list('pk', flat=True))
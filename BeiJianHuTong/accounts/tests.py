@@ -1,3 +1,139 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import Client, TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from SparePart.models import SparePart
+from sites.models import Site
+from .models import User
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    """认证用户缓存：命中时不查库，用户/场站保存后失效"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.site = Site.objects.create(name="一号风场", code="S01", address="地址")
+        cls.user = User.objects.create_user(username="tech", password="pwd", site=cls.site)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def test_cached_user_needs_no_queries(self):
+        with self.assertNumQueries(1):
+            self.client.get("/api/auth/me/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/auth/me/")
+        self.assertEqual(response.data["site"], "一号风场")
+
+    def test_user_save_invalidates_cache(self):
+        self.client.get("/api/auth/me/")
+        self.user.can_view_all_sites = True
+        self.user.save()
+        response = self.client.get("/api/auth/me/")
+        self.assertTrue(response.data["can_view_all_sites"])
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 401)
+
+    def test_new_token_resolves_user_again(self):
+        self.client.get("/api/auth/me/")
+        token = AccessToken.for_user(self.user)
+        token.set_iat(at_time=token.current_time - timedelta(minutes=1))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/api/auth/me/").status_code, 200)
+
+    def test_site_save_invalidates_cache(self):
+        self.client.get("/api/auth/me/")
+        self.site.name = "二号风场"
+        self.site.save()
+        response = self.client.get("/api/auth/me/")
+        self.assertEqual(response.data["site"], "二号风场")
+
+
+class PermissionClaimsTest(TestCase):
+    """访问令牌携带权限声明：只读请求不查用户表，刷新令牌后权限变更生效"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.site = Site.objects.create(name="一号风场", code="S01", address="地址")
+        cls.other_site = Site.objects.create(name="二号风场", code="S02", address="地址")
+        cls.user = User.objects.create_user(username="tech", password="pwd", site=cls.site)
+        for site in (cls.site, cls.other_site):
+            SparePart.objects.create(
+                name=f"轴承-{site.code}", model="6205", location="A1", site=site, quantity=10, alarm_qty=2
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post("/api/auth/login/", {"username": "tech", "password": "pwd"}, format="json")
+        return response.data
+
+    def list_sites(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        response = self.client.get("/api/spare-parts/")
+        return {int(item["stationId"]) for item in response.data["data"]["items"]}
+
+    def test_access_token_carries_claims(self):
+        token = AccessToken(self.login()["access"])
+        self.assertEqual(token["site_id"], self.site.id)
+        self.assertFalse(token["can_view_all_sites"])
+        self.assertTrue(token["can_edit_own_site"])
+
+    def test_read_request_without_user_query(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login()['access']}")
+        # 仅 COUNT 与分页查询，没有用户/场站查询
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/spare-parts/")
+        self.assertEqual(response.data["data"]["total"], 1)
+
+    def test_refresh_picks_up_permission_change(self):
+        tokens = self.login()
+        self.assertEqual(self.list_sites(tokens["access"]), {self.site.id})
+
+        self.user.can_view_all_sites = True
+        self.user.save()
+        self.client.credentials()
+        refreshed = self.client.post("/api/auth/refresh/", {"refresh": tokens["refresh"]}, format="json").data
+        self.assertEqual(self.list_sites(refreshed["access"]), {self.site.id, self.other_site.id})
+
+    def test_token_without_claims_falls_back_to_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        response = self.client.get("/api/spare-parts/")
+        self.assertEqual(response.data["data"]["total"], 1)
+
+
+class AsyncMeTest(TestCase):
+    """异步 me 接口：响应与同步接口一致，未认证返回 401"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.site = Site.objects.create(name="一号风场", code="S01", address="地址")
+        cls.user = User.objects.create_user(username="tech", password="pwd", site=cls.site)
+
+    def setUp(self):
+        cache.clear()
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    async def test_matches_sync_view(self):
+        response = await self.async_client.get("/api/async/auth/me/", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        expected = await sync_to_async(lambda: Client().get("/api/auth/me/", headers=self.headers).json())()
+        self.assertEqual(response.json(), expected)
+
+    async def test_unauthenticated_and_write(self):
+        response = await self.async_client.get("/api/async/auth/me/")
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("Bearer", response["WWW-Authenticate"])
+        response = await self.async_client.post("/api/async/auth/me/", headers=self.headers)
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,51 @@
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.models import TokenUser
+
+# 写入令牌的权限声明，缺少任一项的旧令牌回退为查库认证
+PERMISSION_CLAIMS = ('site_id', 'can_edit_own_site', 'can_view_all_sites', 'can_manage_users')
+
+
+def add_permission_claims(token, user):
+    """把场站与权限标记写入令牌"""
+    token['username'] = user.get_username()
+    token['site_id'] = user.site_id
+    token['can_edit_own_site'] = user.can_edit_own_site
+    token['can_view_all_sites'] = user.can_view_all_sites
+    token['can_manage_users'] = user.can_manage_users
+    return token
+
+
+def has_permission_claims(token):
+    return all(claim in token for claim in PERMISSION_CLAIMS)
+
+
+class SiteTokenUser(TokenUser):
+    """由访问令牌声明构造的轻量用户，不查数据库
+
+    提供视图做场站范围判断所需的属性；没有 site 对象、email 等字段，
+    需要完整用户（如写入 created_by）的请求应使用数据库中的 User。
+    """
+
+    @cached_property
+    def site_id(self):
+        return self.token.get('site_id')
+
+    @cached_property
+    def can_edit_own_site(self):
+        return self.token.get('can_edit_own_site', False)
+
+    @cached_property
+    def can_view_all_sites(self):
+        return self.token.get('can_view_all_sites', False)
+
+    @cached_property
+    def can_manage_users(self):
+        return self.token.get('can_manage_users', False)
+
+    def can_edit_spare_part(self, spare_part):
+        """与 User.can_edit_spare_part 一致"""
+        if not self.can_edit_own_site:
+            return False
+        if self.can_view_all_sites:
+            return True
+        return self.site_id == spare_part.site_id
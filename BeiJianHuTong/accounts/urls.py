@@ -1,13 +1,14 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from . import views
+from .serializers import SiteTokenObtainPairSerializer, SiteTokenRefreshSerializer
 
 urlpatterns = [
     # 登录接口 - 获取 access_token 和 refresh_token
-    path("login/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path("login/", TokenObtainPairView.as_view(serializer_class=SiteTokenObtainPairSerializer), name="token_obtain_pair"),
     
     # 刷新令牌接口 - 用 refresh_token 获取新的 access_token
-    path("refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("refresh/", TokenRefreshView.as_view(serializer_class=SiteTokenRefreshSerializer), name="token_refresh"),
     
     # 获取当前登录用户信息
     path("me/", views.MeView.as_view(), name="user_me"),
@@ -2,26 +2,33 @@ from django.shortcuts import render
 from rest_framework import permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
+
+from .authentication import CachedJWTAuthentication
 # Create your views here.
 
+
+def user_payload(user):
+    """当前用户信息（同步与异步 me 接口共用）"""
+    return {
+        "id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "site": user.site.name if user.site else None,
+        "site_id": user.site.id if user.site else None,
+        "can_edit_own_site": user.can_edit_own_site,
+        "can_view_all_sites": user.can_view_all_sites,
+        "can_manage_users": user.can_manage_users,
+    }
+
+
 class MeView(APIView):
     """获取当前登录用户信息的视图"""
+    # 需要 email、场站名称等完整信息，不使用令牌声明用户
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        user_data = {
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "site": user.site.name if user.site else None,
-            "site_id": user.site.id if user.site else None,
-            "can_edit_own_site": user.can_edit_own_site,
-            "can_view_all_sites": user.can_view_all_sites,
-            "can_manage_users": user.can_manage_users,
-            
-        }
-        return Response(user_data)
+        return Response(user_payload(request.user))
 
 class LogoutView(APIView):
     """用户登出视图"""
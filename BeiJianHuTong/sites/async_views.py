@@ -0,0 +1,15 @@
+from BeiJianHuTong.asyncapi import async_api_view, render_json
+from BeiJianHuTong.conditional import aconditional_get, aget_version, make_etag
+from .models import Site
+from .serializers import SiteSerializer
+
+
+@async_api_view()
+async def site_list(request):
+    """场站列表（异步版本，响应同 /api/sites/，支持 ETag 条件请求）"""
+    async def render():
+        sites = [site async for site in Site.objects.all()]
+        return render_json(SiteSerializer(sites, many=True).data)
+
+    version = await aget_version('sites')
+    return await aconditional_get(request._request, make_etag('sites', version), version // 1000, render)
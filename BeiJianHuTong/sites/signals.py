@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from BeiJianHuTong.conditional import bump_version
+from .models import Site
+
+
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Site)
+def bump_sites_version(sender, instance, **kwargs):
+    bump_version('sites')
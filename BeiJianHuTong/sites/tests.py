@@ -1,3 +1,46 @@
 from django.test import TestCase
 
 # Create your tests here.
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from .models import Site
+
+
+# 条件 GET 只在共享缓存下启用
+@override_settings(CACHES={
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(tempfile.gettempdir(), "bjht-test-cache"),
+    }
+})
+class SiteConditionalGetTest(TestCase):
+    """场站列表 ETag：未变更时不查库返回 304，保存场站后失效"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.site = Site.objects.create(name="北京场站", code="BJ", address="北京")
+        cls.user = User.objects.create_user(username="tech", password="pwd", site=cls.site)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_not_modified(self):
+        response = self.client.get("/api/sites/")
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/sites/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Site.objects.create(name="天津场站", code="TJ", address="天津")
+        response = self.client.get("/api/sites/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
@@ -1,5 +1,7 @@
 from django.shortcuts import render
 from rest_framework import viewsets, permissions
+
+from BeiJianHuTong.conditional import conditional_get, get_version, make_etag
 from .models import Site
 from .serializers import SiteSerializer
 
@@ -10,3 +12,18 @@ class SiteViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Site.objects.all()
     serializer_class = SiteSerializer
     permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request, *args, **kwargs):
+        """场站列表（支持 ETag 条件请求，未变更时不查库直接返回 304）"""
+        version = get_version('sites')
+        return conditional_get(
+            request, make_etag('sites', version), version // 1000,
+            lambda: super(SiteViewSet, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        version = get_version('sites')
+        return conditional_get(
+            request, make_etag('site', kwargs['pk'], version), version // 1000,
+            lambda: super(SiteViewSet, self).retrieve(request, *args, **kwargs),
+        )